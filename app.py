@@ -20,9 +20,11 @@ register_callback(lambda msg: st.session_state['chat_history'].append({'role': '
 
 import app.agents.login_agent.agente_login as agent_login
 from app.agents.booking_agent.agente_agendamento import AgenteAgendamentos
-from app.agents.health_plan_agent.agent_plano import graph as graph_plano
+from app.agents.health_plan_agent.agent_plano import stream_response as stream_plano
 from app.llm_factory import get_llm_provider
 from app.agents.health_plan_agent.agent_plano import init_llm as init_plano
+from app.router import route_message
+from app.config import ROUTING_MODE
 
 
 
@@ -82,6 +84,24 @@ def classify_intent(user_message: str) -> str:
         logger.error("Erro na classificação: %s", e)
     return "desconhecido"
 
+
+def route_user_message(user_message: str) -> tuple:
+    """
+    Retorna (intenção, estado inicial do agente de plano).
+    No modo "single", uma única chamada estruturada já traz relevância e consulta
+    reescrita, e o grafo do plano pula seus nós de validação e reescrita.
+    """
+    if ROUTING_MODE == "single":
+        decision = route_message(llm, user_message)
+        if decision is not None:
+            plano_state = {
+                'query': user_message,
+                'is_relevant': decision.is_relevant,
+                'rewritten_query': decision.rewritten_query,
+            }
+            return decision.intent, plano_state
+    return classify_intent(user_message), {'query': user_message}
+
 # ──────────────────────────────────────────────────────────────────────────────
 # 🔎 Consulta paciente
 # ──────────────────────────────────────────────────────────────────────────────
@@ -137,7 +157,23 @@ if not st.session_state['chat_history']:
 # ──────────────────────────────────────────────────────────────────────────────
 # 💬 Interface de chat
 # ──────────────────────────────────────────────────────────────────────────────
+def render_chat():
+    for msg in st.session_state['chat_history']:
+        with st.chat_message(msg['role']):
+            st.write(msg['content'])
+
+
+def stream_plano_safe(plano_state: dict):
+    try:
+        yield from stream_plano(plano_state)
+    except Exception as e:
+        logger.error("Erro no agente de plano: %s", e)
+        yield ' Erro ao consultar o plano.'
+
+
 chat_placeholder = st.container()
+# Indica se o chat já foi renderizado durante o streaming de uma resposta
+chat_rendered = False
 
 # Input do usuário
 user_input = st.chat_input("Você:")
@@ -197,13 +233,14 @@ if user_input:
     # 🏠 Fluxo PRINCIPAL
     # ------------------------------------------------------------
     elif st.session_state['mode'] == 'main':
-        intent = classify_intent(user_input)
+        intent, plano_state = route_user_message(user_input)
         if intent == 'plano':
-            try:
-                res = graph_plano.invoke({'query': user_input})
-                resp = res.get('response', '')
-            except Exception:
-                resp = ' Erro ao consultar o plano.'
+            # Renderiza o histórico e exibe a resposta token a token
+            with chat_placeholder:
+                render_chat()
+                with st.chat_message('assistant'):
+                    resp = st.write_stream(stream_plano_safe(plano_state))
+            chat_rendered = True
             st.session_state['chat_history'].append({'role': 'assistant', 'content': f' {resp}'})
 
         elif intent == 'agendamento':
@@ -256,7 +293,6 @@ if user_input:
 # ──────────────────────────────────────────────────────────────────────────────
 # 🖥️ Renderiza todo o chat
 # ──────────────────────────────────────────────────────────────────────────────
-with chat_placeholder:
-    for msg in st.session_state['chat_history']:
-        with st.chat_message(msg['role']):
-            st.write(msg['content'])
+if not chat_rendered:
+    with chat_placeholder:
+        render_chat()
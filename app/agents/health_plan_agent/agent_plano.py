@@ -1,14 +1,15 @@
 # agent_rag_router.py
 
-from typing import TypedDict, Literal
+from typing import AsyncIterator, Iterator, TypedDict, Literal
 
 from langchain_core.runnables import Runnable, RunnableLambda
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import PromptTemplate
 from langgraph.graph import StateGraph, END
+from langgraph.config import get_stream_writer
 
 from langsmith.run_helpers import traceable
-from app.agents.health_plan_agent.tools.rag.pipeline.rag_pipeline import RAGPipeline, init_llm as init_rag_llm
+from app.agents.health_plan_agent.tools.rag.pipeline.rag_pipeline import get_pipeline, init_llm as init_rag_llm
 
 from app.llm_factory import get_llm_provider
 
@@ -16,6 +17,7 @@ from app.llm_factory import get_llm_provider
 class AgentState(TypedDict):
     query: str
     is_relevant: bool
+    rewritten_query: str
     response: str
 
 # === NÓ 1: Validação de relevância da query ===
@@ -25,6 +27,8 @@ Pergunta: {query}
 Responda apenas com "Sim" ou "Não"."""
 )
 
+_llm_provider = None
+
 def init_llm(llm_provider):
     """
     Inicializa o LLM a ser usado pelo pipeline RAG.
@@ -46,22 +50,51 @@ def validate_query_fn(state: AgentState) -> AgentState:
         "is_relevant": result.strip().lower().startswith("sim")
     }
 
-validate_query: Runnable = RunnableLambda(validate_query_fn)
+async def avalidate_query_fn(state: AgentState) -> AgentState:
+
+    llm = _llm_provider or get_llm_provider('openai')
+    chain = validate_prompt | llm | StrOutputParser()
+    result = await chain.ainvoke({"query": state["query"]})
+
+    return {
+        **state,
+        "is_relevant": result.strip().lower().startswith("sim")
+    }
+
+validate_query: Runnable = RunnableLambda(validate_query_fn, afunc=avalidate_query_fn)
 
 # === NÓ 2: Executa RAG se relevante ===
+# Os tokens da resposta são emitidos pelo stream writer do LangGraph; com
+# graph.stream(..., stream_mode="custom") eles chegam ao chamador à medida que são gerados.
 @traceable(name="RunRAG")
 def run_rag_fn(state: AgentState) -> AgentState:
-    pipeline = RAGPipeline()
-    resposta = pipeline.run(state["query"])
-    return {**state, "response": resposta}
-
-run_rag: Runnable = RunnableLambda(run_rag_fn)
+    pipeline = get_pipeline(llm=_llm_provider)
+    writer = get_stream_writer()
+    partes = []
+    for token in pipeline.stream(state["query"], rewritten_query=state.get("rewritten_query")):
+        writer(token)
+        partes.append(token)
+    return {**state, "response": "".join(partes)}
+
+@traceable(name="RunRAGAsync")
+async def arun_rag_fn(state: AgentState) -> AgentState:
+    pipeline = get_pipeline(llm=_llm_provider)
+    writer = get_stream_writer()
+    partes = []
+    async for token in pipeline.astream(state["query"], rewritten_query=state.get("rewritten_query")):
+        writer(token)
+        partes.append(token)
+    return {**state, "response": "".join(partes)}
+
+run_rag: Runnable = RunnableLambda(run_rag_fn, afunc=arun_rag_fn)
 
 # === NÓ 3: Resposta padrão se não for relevante ===
 def no_data_response_fn(state: AgentState) -> AgentState:
+    resposta = "Desculpe, não encontrei informações relacionadas a essa pergunta na nossa base de dados de planos de saúde."
+    get_stream_writer()(resposta)
     return {
         **state,
-        "response": "Desculpe, não encontrei informações relacionadas a essa pergunta na nossa base de dados de planos de saúde."
+        "response": resposta
     }
 
 no_data_response: Runnable = RunnableLambda(no_data_response_fn)
@@ -70,13 +103,23 @@ no_data_response: Runnable = RunnableLambda(no_data_response_fn)
 def route_based_on_validation(state: AgentState) -> Literal["run_rag", "no_data"]:
     return "run_rag" if state["is_relevant"] else "no_data"
 
+def route_entry(state: AgentState) -> Literal["validate", "run_rag", "no_data"]:
+    # Pula a validação quando o roteador de chamada única já informou a relevância
+    if state.get("is_relevant") is None:
+        return "validate"
+    return route_based_on_validation(state)
+
 # === Construção do grafo ===
 graph_builder = StateGraph(AgentState)
 graph_builder.add_node("validate", validate_query)
 graph_builder.add_node("run_rag", run_rag)
 graph_builder.add_node("no_data", no_data_response)
 
-graph_builder.set_entry_point("validate")
+graph_builder.set_conditional_entry_point(route_entry, {
+    "validate": "validate",
+    "run_rag": "run_rag",
+    "no_data": "no_data",
+})
 graph_builder.add_conditional_edges("validate", route_based_on_validation, {
     "run_rag": "run_rag",
     "no_data": "no_data",
@@ -86,6 +129,23 @@ graph_builder.add_edge("no_data", END)
 
 graph = graph_builder.compile()
 
+
+def stream_response(state: AgentState) -> Iterator[str]:
+    """
+    Executa o grafo e devolve a resposta em fragmentos, à medida que o LLM gera.
+    """
+    for token in graph.stream(state, stream_mode="custom"):
+        yield token
+
+
+async def astream_response(state: AgentState) -> AsyncIterator[str]:
+    """
+    Versão assíncrona de stream_response (graph.astream); use graph.ainvoke
+    para obter apenas a resposta final.
+    """
+    async for token in graph.astream(state, stream_mode="custom"):
+        yield token
+
 # === Execução do Agente ===
 if __name__ == "__main__":
     import sys
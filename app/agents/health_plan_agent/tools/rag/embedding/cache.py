@@ -0,0 +1,291 @@
+"""
+cache.py
+
+Two-tier, content-addressed cache for embedding vectors.
+
+* Tier 1: in-process LRU (``OrderedDict``) for hot queries. Vectors are held
+  as packed float32 bytes (~6 KB for 1536 dimensions instead of ~49 KB as a
+  list of floats) and every read returns a fresh list.
+* Tier 2: persistent SQLite table shared by every process on the host, so
+  re-ingests and repeated queries survive restarts without API round trips.
+
+Entries are keyed by ``(model, dimension, sha256(text))``; changing the
+embedding model or dimension therefore never returns stale vectors. Disk hits
+only record their access time in memory; the ``last_used`` updates are written
+in batches (with the next insert, or every ``_TOUCH_FLUSH_INTERVAL`` hits).
+"""
+
+# =======================
+# Imports and Dependencies
+# =======================
+
+import atexit
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import (
+    EMBEDDING_CACHE_ENABLED,
+    EMBEDDING_CACHE_MAX_ROWS,
+    EMBEDDING_CACHE_MEMORY_SIZE,
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_DIM,
+    EMBEDDING_MODEL,
+)
+from app.agents.health_plan_agent.tools.rag.utils.logger import get_logger
+
+# =======================
+# Logger Initialization
+# =======================
+
+logger = get_logger(__name__)
+
+_CacheKey = Tuple[str, int, str]
+
+# Number of inserts between checks of the persistent tier size
+_PRUNE_INTERVAL = 1000
+# Pending last_used updates written in one transaction
+_TOUCH_FLUSH_INTERVAL = 256
+
+
+def content_hash(text: str) -> str:
+    """Return the SHA-256 hex digest of *text*."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _to_blob(vector: List[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _from_blob(blob: bytes) -> List[float]:
+    values = array("f")
+    values.frombytes(blob)
+    return values.tolist()
+
+
+# =======================
+# Cache Implementation
+# =======================
+
+class EmbeddingCache:
+    """
+    Thread-safe embedding cache with an LRU memory tier and a SQLite disk tier.
+    """
+
+    def __init__(
+        self,
+        path: str = EMBEDDING_CACHE_PATH,
+        model: str = EMBEDDING_MODEL,
+        dim: int = EMBEDDING_DIM,
+        memory_size: int = EMBEDDING_CACHE_MEMORY_SIZE,
+        max_rows: int = EMBEDDING_CACHE_MAX_ROWS,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        path : str
+            SQLite file backing the persistent tier.
+        model : str
+            Embedding model name (part of the cache key).
+        dim : int
+            Embedding dimension (part of the cache key).
+        memory_size : int
+            Maximum number of vectors kept in memory.
+        max_rows : int
+            Maximum number of vectors kept on disk; least recently used rows
+            are deleted beyond this limit.
+        """
+        self.model = model
+        self.dim = int(dim)
+        self.memory_size = memory_size
+        self.max_rows = max_rows
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[_CacheKey, bytes]" = OrderedDict()
+        # key -> last disk hit time, not yet written to last_used
+        self._touched: Dict[_CacheKey, float] = {}
+        self._inserts_since_prune = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.memory_evictions = 0
+        self.disk_evictions = 0
+
+        Path(path).expanduser().parent.mkdir(parents=True, exist_ok=True)
+        self.path = str(Path(path).expanduser())
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, dim, content_hash)
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used_idx ON embeddings (last_used)"
+        )
+        self._conn.commit()
+
+    def _key(self, text: str) -> _CacheKey:
+        return (self.model, self.dim, content_hash(text))
+
+    def _remember(self, key: _CacheKey, blob: bytes) -> None:
+        # Must be called with the lock held
+        self._memory[key] = blob
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+            self.memory_evictions += 1
+
+    def get(self, text: str) -> Optional[List[float]]:
+        """
+        Return the cached embedding for *text*, or None on a miss.
+        """
+        key = self._key(text)
+        with self._lock:
+            blob = self._memory.get(key)
+            if blob is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return _from_blob(blob)
+
+            row = self._conn.execute(
+                "SELECT vector FROM embeddings WHERE model = ? AND dim = ? AND content_hash = ?",
+                key,
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            blob = bytes(row[0])
+            self._touched[key] = time.time()
+            if len(self._touched) >= _TOUCH_FLUSH_INTERVAL:
+                self._write_touched()
+                self._conn.commit()
+            self._remember(key, blob)
+            self.disk_hits += 1
+            return _from_blob(blob)
+
+    def put(self, text: str, vector: List[float]) -> None:
+        """
+        Store *vector* as the embedding of *text* in both tiers.
+        """
+        if not vector:
+            return
+        key = self._key(text)
+        blob = _to_blob(vector)
+        with self._lock:
+            self._remember(key, blob)
+            self._touched.pop(key, None)
+            self._write_touched()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO embeddings (model, dim, content_hash, vector, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (*key, blob, time.time()),
+            )
+            self._conn.commit()
+            self._inserts_since_prune += 1
+            if self._inserts_since_prune >= _PRUNE_INTERVAL:
+                self._prune()
+
+    def _write_touched(self) -> None:
+        # Must be called with the lock held; the caller commits
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND dim = ? AND content_hash = ?",
+                [(used, *key) for key, used in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def flush(self) -> None:
+        """Write the pending ``last_used`` updates of disk hits."""
+        with self._lock:
+            self._write_touched()
+            self._conn.commit()
+
+    def _prune(self) -> None:
+        # Must be called with the lock held (pending touches were written by put)
+        self._inserts_since_prune = 0
+        (rows,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        excess = rows - self.max_rows
+        if excess <= 0:
+            return
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE rowid IN "
+            "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,),
+        )
+        self._conn.commit()
+        self.disk_evictions += excess
+        logger.info("Cache de embeddings podado", extra={"removed_rows": excess})
+
+    def clear(self) -> None:
+        """Remove every cached vector for the current model and dimension."""
+        with self._lock:
+            self._memory.clear()
+            self._touched.clear()
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE model = ? AND dim = ?", (self.model, self.dim)
+            )
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return hit/miss counters and the occupancy of both tiers.
+        """
+        with self._lock:
+            (disk_rows,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "model": self.model,
+                "dim": self.dim,
+                "memory_size": len(self._memory),
+                "memory_max_size": self.memory_size,
+                "disk_rows": disk_rows,
+                "disk_max_rows": self.max_rows,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_evictions": self.memory_evictions,
+                "disk_evictions": self.disk_evictions,
+            }
+
+
+# =======================
+# Public API
+# =======================
+
+_embedding_cache: Optional[EmbeddingCache] = None
+_embedding_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """
+    Return the process-wide embedding cache, or None when disabled in config.
+    """
+    global _embedding_cache
+    if not EMBEDDING_CACHE_ENABLED:
+        return None
+    if _embedding_cache is None:
+        with _embedding_cache_lock:
+            if _embedding_cache is None:
+                _embedding_cache = EmbeddingCache()
+                # Pending last_used updates would otherwise be lost at exit
+                atexit.register(_embedding_cache.flush)
+                logger.info(
+                    "Cache de embeddings inicializado",
+                    extra={"path": _embedding_cache.path, "model": _embedding_cache.model},
+                )
+    return _embedding_cache
@@ -2,19 +2,48 @@
 embedder.py
 
 This module is responsible for generating text embeddings using the LangChain
-wrapper for OpenAI embeddings (text-embedding-3-small model).
+wrapper for OpenAI embeddings (text-embedding-3-small model). text-embedding-3
+models are asked for ``EMBEDDING_DIM`` dimensions, so the API returns vectors
+already truncated and renormalized (e.g. 256/512/768). Vectors are
+memoized in a two-tier (memory + SQLite) cache keyed by content hash, model
+and dimension; see ``embedding.cache``.
+
+``generate_embeddings`` packs texts into requests capped by token count and
+sends up to ``EMBEDDING_CONCURRENCY`` of them at once, each retried with
+rate-limit-aware backoff.
 """
 
 # =======================
 # Imports and Dependencies
 # =======================
 
-from typing import List
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import openai
+from tenacity import (
+    RetryCallState,
+    retry,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_exponential,
+    wait_random_exponential,
+)
 from langchain_openai import OpenAIEmbeddings
 
-from app.config import OPENAI_API_KEY, LLM_PROVIDER
+from app.config import (
+    OPENAI_API_KEY,
+    LLM_PROVIDER,
+    EMBEDDING_BATCH_MAX_TEXTS,
+    EMBEDDING_BATCH_MAX_TOKENS,
+    EMBEDDING_CONCURRENCY,
+    EMBEDDING_DIM,
+    EMBEDDING_MODEL,
+)
+from app.agents.health_plan_agent.tools.rag.embedding.cache import get_embedding_cache
 from app.agents.health_plan_agent.tools.rag.utils.logger import get_logger
+from app.agents.health_plan_agent.tools.rag.utils.tokens import count_tokens
 
 # =======================
 # Logger Initialization
@@ -26,13 +55,24 @@ logger = get_logger(__name__)
 # Embedding Client Setup
 # =======================
 
-if LLM_PROVIDER.lower() == "openai":
-    embeddings_client = OpenAIEmbeddings(
-        model="text-embedding-3-small",
+def _embeddings_client(**kwargs: Any) -> OpenAIEmbeddings:
+    return OpenAIEmbeddings(
+        model=EMBEDDING_MODEL,
         openai_api_key=OPENAI_API_KEY,
+        # Older models (text-embedding-ada-002) reject the dimensions parameter
+        dimensions=EMBEDDING_DIM if EMBEDDING_MODEL.startswith("text-embedding-3") else None,
+        **kwargs,
     )
+
+
+if LLM_PROVIDER.lower() == "openai":
+    embeddings_client = _embeddings_client()
+    # The batch path retries with its own backoff (_batch_retry); SDK retries
+    # underneath would multiply the attempts per batch under sustained 429s
+    batch_embeddings_client = _embeddings_client(max_retries=0)
 else:
     embeddings_client = None
+    batch_embeddings_client = None
 
 # =======================
 # Internal Helper Function
@@ -65,7 +105,8 @@ def _request_embedding(text: str) -> List[float]:
 
 def generate_embedding(text: str) -> List[float]:
     """
-    Generate an embedding vector for the given input text.
+    Generate an embedding vector for the given input text, serving it from the
+    embedding cache when the same content was embedded before.
 
     Parameters
     ----------
@@ -100,12 +141,21 @@ def generate_embedding(text: str) -> List[float]:
         logger.error(error_msg)
         raise NotImplementedError(error_msg)
 
+    cache = get_embedding_cache()
+    if cache is not None:
+        cached = cache.get(text)
+        if cached is not None:
+            logger.debug("Embedding servido pelo cache", extra={"vector_length": len(cached)})
+            return cached
+
     try:
         vector = _request_embedding(text)
         logger.debug(
             "Embedding gerado com sucesso",
             extra={"vector_length": len(vector)},
         )
+        if cache is not None:
+            cache.put(text, vector)
         return vector
     except Exception as e:
         logger.error(
@@ -113,3 +163,250 @@ def generate_embedding(text: str) -> List[float]:
             extra={"error": str(e)},
         )
         raise
+
+
+@retry(
+    retry=retry_if_exception_type(Exception),
+    wait=wait_exponential(multiplier=1, min=1, max=60),
+    stop=stop_after_attempt(3),
+)
+async def _arequest_embedding(text: str) -> List[float]:
+    """
+    Async variant of ``_request_embedding`` (LangChain's aembed_query with retries).
+    """
+    return await embeddings_client.aembed_query(text)
+
+
+async def agenerate_embedding(text: str) -> List[float]:
+    """
+    Async counterpart of ``generate_embedding``; shares the same embedding cache.
+
+    Parameters
+    ----------
+    text : str
+        Text input to generate the embedding for.
+
+    Returns
+    -------
+    List[float]
+        A float list representing the text embedding.
+    """
+    if not text:
+        logger.warning(
+            "Texto vazio recebido para embedding; retornando vetor vazio"
+        )
+        return []
+
+    if LLM_PROVIDER.lower() != "openai" or embeddings_client is None:
+        error_msg = f"Embedding provider '{LLM_PROVIDER}' não implementado"
+        logger.error(error_msg)
+        raise NotImplementedError(error_msg)
+
+    # The SQLite tier blocks (a disk hit commits its access time), so it runs off the loop
+    cache = get_embedding_cache()
+    if cache is not None:
+        cached = await asyncio.to_thread(cache.get, text)
+        if cached is not None:
+            return cached
+
+    try:
+        vector = await _arequest_embedding(text)
+    except Exception as e:
+        logger.error(
+            "Falha ao gerar embedding",
+            extra={"error": str(e)},
+        )
+        raise
+    if cache is not None:
+        await asyncio.to_thread(cache.put, text, vector)
+    return vector
+
+
+# Transient failures worth retrying for a batch (429, timeouts, connection drops, 5xx)
+_RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+_backoff = wait_random_exponential(multiplier=1, max=60)
+
+
+def _retry_after(error: Optional[BaseException]) -> Optional[float]:
+    # Seconds requested by the server in the Retry-After header of a 429 response
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def _wait_batch(retry_state: RetryCallState) -> float:
+    # Honour Retry-After on rate limits; otherwise jittered exponential backoff,
+    # which also keeps concurrent batches from retrying in lockstep
+    delay = _retry_after(retry_state.outcome.exception())
+    return min(delay, 60.0) if delay is not None else _backoff(retry_state)
+
+
+def _log_backoff(retry_state: RetryCallState) -> None:
+    logger.warning(
+        "Falha transitória no lote de embeddings; aguardando nova tentativa",
+        extra={
+            "attempt": retry_state.attempt_number,
+            "wait_seconds": round(retry_state.next_action.sleep, 2),
+            "error": type(retry_state.outcome.exception()).__name__,
+        },
+    )
+
+
+_batch_retry = retry(
+    retry=retry_if_exception_type(_RETRYABLE_ERRORS),
+    wait=_wait_batch,
+    stop=stop_after_attempt(6),
+    before_sleep=_log_backoff,
+    reraise=True,
+)
+
+
+@_batch_retry
+def _request_embeddings(texts: List[str]) -> List[List[float]]:
+    """
+    Internal helper that embeds several texts in one request (embed_documents) with retries.
+    """
+    return batch_embeddings_client.embed_documents(texts)
+
+
+@_batch_retry
+async def _arequest_embeddings(texts: List[str]) -> List[List[float]]:
+    """
+    Async variant of ``_request_embeddings``.
+    """
+    return await batch_embeddings_client.aembed_documents(texts)
+
+
+def _token_batches(texts: List[str]) -> List[List[str]]:
+    # Greedy packing in input order, capped by EMBEDDING_BATCH_MAX_TOKENS and EMBEDDING_BATCH_MAX_TEXTS
+    batches: List[List[str]] = []
+    current: List[str] = []
+    tokens = 0
+    for text in texts:
+        size = count_tokens(text, EMBEDDING_MODEL)
+        if current and (tokens + size > EMBEDDING_BATCH_MAX_TOKENS or len(current) >= EMBEDDING_BATCH_MAX_TEXTS):
+            batches.append(current)
+            current, tokens = [], 0
+        current.append(text)
+        tokens += size
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _cached_batch(texts: List[str]) -> Tuple[List[Optional[List[float]]], Dict[str, List[int]]]:
+    # Serve what the cache has; return the results list and the distinct texts still missing
+    if LLM_PROVIDER.lower() != "openai" or embeddings_client is None:
+        error_msg = f"Embedding provider '{LLM_PROVIDER}' não implementado"
+        logger.error(error_msg)
+        raise NotImplementedError(error_msg)
+
+    cache = get_embedding_cache()
+    results: List[Optional[List[float]]] = [None] * len(texts)
+    missing: Dict[str, List[int]] = {}
+    for idx, text in enumerate(texts):
+        if not text:
+            results[idx] = []
+            continue
+        cached = cache.get(text) if cache is not None else None
+        if cached is not None:
+            results[idx] = cached
+        else:
+            missing.setdefault(text, []).append(idx)
+    return results, missing
+
+
+def _fill_batch(
+    results: List[Optional[List[float]]],
+    missing: Dict[str, List[int]],
+    texts: List[str],
+    vectors: List[List[float]],
+) -> None:
+    # Store freshly embedded vectors in the cache and place them at every position of their text
+    cache = get_embedding_cache()
+    for text, vector in zip(texts, vectors):
+        if cache is not None:
+            cache.put(text, vector)
+        for idx in missing[text]:
+            results[idx] = vector
+
+
+def generate_embeddings(texts: List[str]) -> List[List[float]]:
+    """
+    Generate embeddings for several texts with as few requests as possible.
+
+    Cached texts are served from the embedding cache and duplicates are sent
+    once; empty texts map to empty vectors. The remaining texts are packed into
+    token-capped batches, up to ``EMBEDDING_CONCURRENCY`` of which are in flight
+    at a time; each batch retries on its own with rate-limit-aware backoff and
+    is cached as soon as it completes, so a failed run resumes cheaply.
+
+    Parameters
+    ----------
+    texts : List[str]
+        Texts to embed.
+
+    Returns
+    -------
+    List[List[float]]
+        One vector per input text, in order.
+    """
+    results, missing = _cached_batch(texts)
+    batches = _token_batches(list(missing))
+    logger.info(
+        "Gerando embeddings em lote",
+        extra={"provider": LLM_PROVIDER, "texts": len(texts), "requested": len(missing), "batches": len(batches)},
+    )
+    if not batches:
+        return results
+    try:
+        if len(batches) == 1:
+            _fill_batch(results, missing, batches[0], _request_embeddings(batches[0]))
+        else:
+            with ThreadPoolExecutor(max_workers=min(EMBEDDING_CONCURRENCY, len(batches))) as executor:
+                for batch, vectors in zip(batches, executor.map(_request_embeddings, batches)):
+                    _fill_batch(results, missing, batch, vectors)
+    except Exception as e:
+        logger.error("Falha ao gerar embeddings em lote", extra={"error": str(e)})
+        raise
+    return results
+
+
+async def agenerate_embeddings(texts: List[str]) -> List[List[float]]:
+    """
+    Async counterpart of ``generate_embeddings``; cache reads and writes run in
+    worker threads so the event loop never waits on SQLite.
+    """
+    results, missing = await asyncio.to_thread(_cached_batch, texts)
+    batches = _token_batches(list(missing))
+    if not batches:
+        return results
+    semaphore = asyncio.Semaphore(EMBEDDING_CONCURRENCY)
+
+    async def run(batch: List[str]) -> None:
+        async with semaphore:
+            vectors = await _arequest_embeddings(batch)
+        await asyncio.to_thread(_fill_batch, results, missing, batch, vectors)
+
+    try:
+        await asyncio.gather(*(run(batch) for batch in batches))
+    except Exception as e:
+        logger.error("Falha ao gerar embeddings em lote", extra={"error": str(e)})
+        raise
+    return results
+
+
+def embedding_cache_stats() -> Dict[str, Any]:
+    """
+    Return statistics of the embedding cache (empty dict when disabled).
+    """
+    cache = get_embedding_cache()
+    return cache.stats() if cache is not None else {}
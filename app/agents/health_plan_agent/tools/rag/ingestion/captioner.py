@@ -0,0 +1,117 @@
+"""
+captioner.py
+
+Optional captioning stage for image items (IMAGE_CAPTIONING).
+
+Image items coming from ``pdf_loader`` only reference an image in the
+``ImageStore``. This stage asks the configured LLM (LLM_PROVIDER) for a short
+description of each distinct image and turns the item into a text item, so the
+caption is cleaned, chunked and embedded like the rest of the page. Captions
+are stored by image hash: repeated images are captioned once per store, and
+images described as decorative (logos, borders) are dropped. Other items pass
+through unchanged; without this stage (or when the provider has no chat model,
+which is checked once per run) the cleaner discards image items.
+"""
+
+import base64
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from langchain_core.messages import HumanMessage
+
+from app.config import LLM_PROVIDER
+from app.agents.health_plan_agent.tools.rag.ingestion.image_store import ImageStore, get_image_store
+from app.agents.health_plan_agent.tools.rag.utils.logger import get_logger
+
+# Logger Initialization
+logger = get_logger(__name__)
+
+_DECORATIVE = "DECORATIVA"
+
+CAPTION_PROMPT = (
+    "Descreva objetivamente, em português e em até 3 frases, esta imagem extraída de um "
+    "documento de plano de saúde, transcrevendo textos e valores relevantes que aparecem nela. "
+    f"Se for apenas um logotipo, assinatura ou elemento decorativo, responda somente '{_DECORATIVE}'."
+)
+
+
+@lru_cache(maxsize=1)
+def _caption_llm() -> Any:
+    # Import tardio: a fábrica configura tracing e só é necessária com legendas ativas
+    from app.llm_factory import get_llm_provider
+
+    return get_llm_provider(LLM_PROVIDER)
+
+
+def describe_image(data: bytes) -> str:
+    """
+    Return the LLM description of the PNG image *data* ('' for decorative images).
+    """
+    image_url = "data:image/png;base64," + base64.b64encode(data).decode("ascii")
+    message = HumanMessage(content=[
+        {"type": "text", "text": CAPTION_PROMPT},
+        {"type": "image_url", "image_url": {"url": image_url}},
+    ])
+    caption = str(_caption_llm().invoke([message]).content).strip()
+    return "" if caption.strip(" .'\"").upper() == _DECORATIVE else caption
+
+
+def _caption(store: ImageStore, digest: str) -> Optional[str]:
+    caption = store.get_caption(digest)
+    if caption is not None:
+        return caption
+    try:
+        caption = describe_image(store.get(digest))
+    except Exception as e:
+        # Não grava a falha: a imagem é legendada novamente na próxima ingestão
+        logger.warning("Falha ao legendar imagem", extra={"image_hash": digest, "error": str(e)})
+        return None
+    store.put_caption(digest, caption)
+    return caption
+
+
+def caption_images(
+    items: Iterable[Dict[str, Any]],
+    store: Optional[ImageStore] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Replace image items with text items holding their caption.
+
+    Parameters
+    ----------
+    items : Iterable[Dict[str, Any]]
+        Items from the extraction stage; image items carry 'image_hash' in their metadata.
+    store : Optional[ImageStore]
+        Store holding the images and captions (default: ``get_image_store()``).
+
+    Yields
+    ------
+    Dict[str, Any]
+        Non-image items unchanged, and one text item per captioned image whose
+        metadata keeps type 'image', 'image_index' and 'image_hash'.
+    """
+    try:
+        llm = _caption_llm()
+    except Exception as e:
+        llm, error = None, str(e)
+    else:
+        error = f"LLM_PROVIDER '{LLM_PROVIDER}' sem suporte a legendas"
+    if llm is None:
+        # Uma única advertência em vez de uma falha por imagem; o cleaner descarta as imagens
+        logger.warning("Legendas de imagens desativadas", extra={"provider": LLM_PROVIDER, "error": error})
+        yield from items
+        return
+
+    store = store or get_image_store()
+    captioned = 0
+    for item in items:
+        if item.get("type") != "image":
+            yield item
+            continue
+        digest = item.get("metadata", {}).get("image_hash")
+        caption = _caption(store, digest) if digest else None
+        if not caption:
+            continue
+        captioned += 1
+        yield {"type": "text", "content": caption, "metadata": item["metadata"].copy()}
+    logger.info("Legendas de imagens geradas", extra={"captioned_images": captioned})
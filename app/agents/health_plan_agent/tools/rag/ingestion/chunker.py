@@ -4,7 +4,7 @@ chunker.py
 Splits cleaned documents into manageable chunks while retaining and annotating metadata.
 """
 
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, Iterator, List
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from app.config import CHUNK_SIZE, CHUNK_OVERLAP
 from app.agents.health_plan_agent.tools.rag.utils.logger import get_logger
@@ -13,25 +13,22 @@ from app.agents.health_plan_agent.tools.rag.utils.logger import get_logger
 logger = get_logger(__name__)
 
 # Chunking Functionality
-def chunk_documents(documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def iter_chunks(documents: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
     """
-    Splits cleaned text documents into fixed-size chunks while preserving and annotating metadata.
+    Streaming counterpart of ``chunk_documents``: yields the chunks of each
+    document as soon as it is split.
 
     Parameters
     ----------
-    documents : List[Dict[str, Any]]
-        A list of dictionaries with 'content' (str) and 'metadata' (dict).
+    documents : Iterable[Dict[str, Any]]
+        Dictionaries with 'content' (str) and 'metadata' (dict).
 
-    Returns
-    -------
-    List[Dict[str, Any]]
-        A list of dictionaries each containing:
-        - 'content': str, chunked text
-        - 'metadata': dict, extended with:
-            * 'chunk_index': index of the chunk
-            * 'chunk_count': total number of chunks
+    Yields
+    ------
+    Dict[str, Any]
+        Chunks with 'content' and 'metadata' extended with 'chunk_index' and 'chunk_count'.
     """
-    logger.info("Iniciando chunking de documentos", extra={"total_documents": len(documents)})
+    logger.info("Iniciando chunking de documentos")
 
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=CHUNK_SIZE,
@@ -39,7 +36,7 @@ def chunk_documents(documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         length_function=len
     )
 
-    chunked_docs: List[Dict[str, Any]] = []
+    total_documents = 0
     total_chunks = 0
 
     for doc in documents:
@@ -52,13 +49,34 @@ def chunk_documents(documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
             chunk_metadata = metadata.copy()
             chunk_metadata["chunk_index"] = idx
             chunk_metadata["chunk_count"] = chunk_count
-            chunked_docs.append({"content": chunk, "metadata": chunk_metadata})
+            yield {"content": chunk, "metadata": chunk_metadata}
 
+        total_documents += 1
         total_chunks += chunk_count
         logger.debug("Documento fragmentado", extra={
             "file": metadata.get("file_name"),
             "chunks_generated": chunk_count
         })
 
-    logger.info("Chunking concluído", extra={"total_chunks": total_chunks})
-    return chunked_docs
\ No newline at end of file
+    logger.info("Chunking concluído", extra={"total_documents": total_documents, "total_chunks": total_chunks})
+
+
+def chunk_documents(documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Splits cleaned text documents into fixed-size chunks while preserving and annotating metadata.
+
+    Parameters
+    ----------
+    documents : List[Dict[str, Any]]
+        A list of dictionaries with 'content' (str) and 'metadata' (dict).
+
+    Returns
+    -------
+    List[Dict[str, Any]]
+        A list of dictionaries each containing:
+        - 'content': str, chunked text
+        - 'metadata': dict, extended with:
+            * 'chunk_index': index of the chunk
+            * 'chunk_count': total number of chunks
+    """
+    return list(iter_chunks(documents))
@@ -1,12 +1,20 @@
 """
 cleaner.py
 
-Loads and sanitizes documents from various formats, converting them to Markdown format.
-
+Sanitizes documents and converts them to Markdown.
+
+Items produced upstream (per-page text and tables extracted by ``pdf_loader``,
+text files read by ``loader``) are normalized from their in-memory 'content';
+the disk is only read for raw documents that were not decoded yet (``.docx``,
+or a PDF that did not go through the extraction stage). Image items only
+reference a file in the image store ('image_hash' / 'image_path') and carry no
+text, so they are skipped; captioned images reach the cleaner as text items.
 """
 
+import hashlib
+import re
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional
 from PyPDF2 import PdfReader
 import mammoth
 from app.agents.health_plan_agent.tools.rag.utils.logger import get_logger
@@ -63,26 +71,73 @@ def load_other_text(path: Path) -> Optional[str]:
                        extra={"file": str(path), "suffix": suffix})
         return None
 
-# Document Cleaning Function
-def clean_documents(documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+# Normalization Functions
+_EXTRA_BLANK_LINES = re.compile(r"\n{3,}")
+_TRAILING_SPACES = re.compile(r"[ \t]+\n")
+
+
+def normalize_text(text: str) -> str:
     """
-    Cleans, normalizes, deduplicates, and converts documents to Markdown.
+    Normalizes extracted text: unifies line endings, drops NUL characters (not
+    accepted by Postgres text columns), trailing spaces and runs of blank lines.
 
     Parameters
     ----------
-    documents : List[Dict[str, Any]]
-        List of dictionaries with 'metadata' including 'file_path'.
+    text : str
+        Raw extracted text.
 
     Returns
     -------
-    List[Dict[str, Any]]
+    str
+        Normalized text.
+    """
+    text = text.replace("\r\n", "\n").replace("\r", "\n").replace("\x00", "")
+    text = _TRAILING_SPACES.sub("\n", text)
+    return _EXTRA_BLANK_LINES.sub("\n\n", text).strip()
+
+
+def _document_text(doc: Dict[str, Any], path_obj: Path) -> Optional[str]:
+    # In-memory content when the upstream stages already produced text; disk otherwise
+    suffix = path_obj.suffix.lower()
+    if doc.get("type") in {"text", "table"}:
+        return doc.get("content") or ""
+    if suffix in {".md", ".txt"} and isinstance(doc.get("content"), str):
+        return doc["content"]
+    if not path_obj.is_file():
+        logger.warning("Ignorando arquivo inexistente ou inválido",
+                       extra={"file": str(path_obj)})
+        return None
+    if suffix == ".pdf":
+        return load_pdf_text(path_obj)
+    markdown_text = load_other_text(path_obj)
+    if markdown_text is None:
+        raise DocumentCleanerError(f"Formato não suportado: {suffix}")
+    return markdown_text
+
+
+# Document Cleaning Functions
+def iter_clean_documents(documents: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """
+    Streaming counterpart of ``clean_documents``: cleans documents one at a time.
+
+    Duplicates are detected by a SHA-256 digest of the normalized text, so the
+    memory used for deduplication does not grow with the documents' size.
+
+    Parameters
+    ----------
+    documents : Iterable[Dict[str, Any]]
+        Raw documents or extracted items ('type', 'content'), with 'metadata'
+        including 'file_path' or 'path'.
+
+    Yields
+    ------
+    Dict[str, Any]
         Cleaned and Markdown-formatted documents.
     """
-    logger.info("Iniciando limpeza e conversão de documentos",
-                extra={"total_documents": len(documents)})
+    logger.info("Iniciando limpeza e conversão de documentos")
 
-    cleaned_docs: List[Dict[str, Any]] = []
-    seen_contents: set[str] = set()
+    seen_digests: set[bytes] = set()
+    cleaned = 0
 
     for doc in documents:
         metadata = doc.get("metadata", {}).copy()
@@ -92,34 +147,52 @@ def clean_documents(documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
                            extra={"metadata": metadata})
             continue
 
-        path_obj = Path(file_path)
-        if not path_obj.is_file():
-            logger.warning("Ignorando arquivo inexistente ou inválido",
-                           extra={"file": file_path})
+        item_type = doc.get("type")
+        if item_type == "image":
             continue
+        if item_type:
+            metadata.setdefault("type", item_type)
 
         try:
-            suffix = path_obj.suffix.lower()
-            if suffix == ".pdf":
-                markdown_text = load_pdf_text(path_obj)
-            else:
-                markdown_text = load_other_text(path_obj)
-                if markdown_text is None:
-                    raise DocumentCleanerError(f"Formato não suportado: {suffix}")
+            markdown_text = _document_text(doc, Path(file_path))
         except Exception as exc:
             logger.warning("Erro ao processar documento, ignorando",
                            extra={"file": file_path, "error": str(exc)})
             continue
+        if markdown_text is None:
+            continue
+        markdown_text = normalize_text(markdown_text)
+        if not markdown_text:
+            continue
 
-        if markdown_text in seen_contents:
-            logger.debug("Conteúdo duplicado, ignorando", extra={"file": file_path})
+        digest = hashlib.sha256(markdown_text.encode("utf-8")).digest()
+        if digest in seen_digests:
+            logger.debug("Conteúdo duplicado, ignorando",
+                         extra={"file": file_path, "page": metadata.get("page_number")})
             continue
 
-        seen_contents.add(markdown_text)
-        cleaned_docs.append({"content": markdown_text, "metadata": metadata})
+        seen_digests.add(digest)
+        cleaned += 1
         logger.debug("Documento limpo e convertido para Markdown",
                      extra={"file": file_path, "length": len(markdown_text)})
+        yield {"content": markdown_text, "metadata": metadata}
 
     logger.info("Limpeza e conversão concluídas",
-                extra={"cleaned_documents": len(cleaned_docs)})
-    return cleaned_docs
\ No newline at end of file
+                extra={"cleaned_documents": cleaned})
+
+
+def clean_documents(documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Cleans, normalizes, deduplicates, and converts documents to Markdown.
+
+    Parameters
+    ----------
+    documents : List[Dict[str, Any]]
+        Raw documents or extracted items, with 'metadata' including 'file_path' or 'path'.
+
+    Returns
+    -------
+    List[Dict[str, Any]]
+        Cleaned and Markdown-formatted documents.
+    """
+    return list(iter_clean_documents(documents))
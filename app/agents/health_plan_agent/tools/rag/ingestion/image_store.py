@@ -0,0 +1,65 @@
+"""
+image_store.py
+
+Content-addressed on-disk store for images extracted from PDFs.
+
+Each image is written once under ``IMAGE_STORE_DIR/<hash[:2]>/<hash>.png``,
+keyed by the SHA-256 of its PNG bytes, so an image repeated across pages and
+files (logos, stamps, letterheads) is stored a single time. Pipeline items only
+carry the hash and path; the bytes are read back by the stages that need them
+(captioning). Captions are stored next to the image (``<hash>.txt``) so each
+distinct image is captioned at most once.
+"""
+
+import hashlib
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+from app.config import IMAGE_STORE_DIR
+
+
+class ImageStore:
+    """Images (and their captions) stored by content hash under *root*."""
+
+    def __init__(self, root: str = IMAGE_STORE_DIR) -> None:
+        self.root = Path(root).expanduser().resolve()
+
+    def path_for(self, digest: str, suffix: str = ".png") -> Path:
+        """Path of the file stored for *digest*."""
+        return self.root / digest[:2] / f"{digest}{suffix}"
+
+    def _write(self, path: Path, data: bytes) -> None:
+        # Write-then-rename: concurrent extraction processes may store the same image
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    def put(self, data: bytes) -> str:
+        """Store the PNG *data* (if not stored yet) and return its SHA-256 hex digest."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path_for(digest)
+        if not path.exists():
+            self._write(path, data)
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        """Return the PNG bytes stored for *digest*."""
+        return self.path_for(digest).read_bytes()
+
+    def get_caption(self, digest: str) -> Optional[str]:
+        """Caption stored for *digest*; None when the image was never captioned."""
+        path = self.path_for(digest, ".txt")
+        return path.read_text(encoding="utf-8") if path.exists() else None
+
+    def put_caption(self, digest: str, caption: str) -> None:
+        """Store *caption* for *digest* (an empty caption marks a decorative image)."""
+        self._write(self.path_for(digest, ".txt"), caption.encode("utf-8"))
+
+
+@lru_cache(maxsize=None)
+def get_image_store(root: str = IMAGE_STORE_DIR) -> ImageStore:
+    """Return the process-wide image store for *root*."""
+    return ImageStore(root)
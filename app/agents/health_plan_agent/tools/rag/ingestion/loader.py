@@ -9,11 +9,17 @@ here – that is handled by ``ingestion.cleaner`` and subsequent steps.
 
 Key features
 ------------
-* Recursively discovers files in the target directory.
-* Reads each file in binary mode, then decodes to UTF-8 (gracefully handling
-  decoding errors).
-* Collects essential metadata: absolute path, file name, size (bytes) and last
-  modification timestamp.
+* Recursively discovers files in the target directory, filtered by include /
+  exclude globs and a maximum size (``INGEST_INCLUDE``, ``INGEST_EXCLUDE``,
+  ``INGEST_MAX_FILE_MB``).
+* ``iter_files`` yields lightweight descriptors built from ``stat()`` only
+  (optionally with a SHA-256 content hash); ``iter_documents(lazy=True)``
+  yields them instead of reading the files, leaving each format to the stage
+  that parses it (``pdf_loader`` for PDFs, ``cleaner`` for DOCX and text).
+* Otherwise reads each file in binary mode, then decodes to UTF-8 (gracefully
+  handling decoding errors).
+* Collects essential metadata: absolute path, file name, size (bytes), suffix
+  and last modification timestamp.
 ...
 * Raises ``DocumentLoaderError`` for unreadable or empty files (continues
   processing other files).
@@ -34,21 +40,35 @@ Examples
 
 from __future__ import annotations
 
+import hashlib
 import logging
 from datetime import datetime
+from fnmatch import fnmatch
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, Iterator, List, Sequence
 
-from app.config import settings
+from app.config import INGEST_EXCLUDE, INGEST_INCLUDE, INGEST_MAX_FILE_MB, settings
 from app.agents.health_plan_agent.tools.rag.utils.logger import get_logger
 
 logger: logging.Logger = get_logger(__name__)
 
 
+_HASH_BLOCK_SIZE = 1 << 20
+
+
 class DocumentLoaderError(Exception):
     """Raised when a document cannot be loaded or is invalid."""
 
 
+def file_hash(path: Path) -> str:
+    """Return the SHA-256 hex digest of the file at *path*, read in blocks."""
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        for block in iter(lambda: fh.read(_HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
 def _read_file(path: Path) -> str:
     """Read *path* and return UTF-8 text, replacing undecodable bytes."""
     try:
@@ -61,29 +81,56 @@ def _read_file(path: Path) -> str:
         raise DocumentLoaderError(f"Failed reading {path}: {exc}") from exc
 
 
-def _collect_metadata(path: Path, size: int) -> Dict[str, Any]:
-    """Return a metadata dictionary for *path*."""
-    stat = path.stat()
+def _collect_metadata(path: Path, stat: Any) -> Dict[str, Any]:
+    """Return a metadata dictionary for *path* from its ``stat()`` result."""
     return {
         "file_name": path.name,
         "path": str(path.resolve()),
-        "size_bytes": size,
+        "suffix": path.suffix.lower(),
+        "size_bytes": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
         "modified_at": datetime.fromtimestamp(stat.st_mtime).isoformat(),
     }
 
 
-def load_documents(data_dir: Path | str | None = None) -> List[Dict[str, Any]]:
-    """Load every file under *data_dir* and return a list of document objects.
+def _matches(path: Path, base_dir: Path, patterns: Sequence[str]) -> bool:
+    """Whether *path* (relative to *base_dir*, or its name) matches any glob."""
+    try:
+        relative = path.relative_to(base_dir).as_posix()
+    except ValueError:
+        relative = path.as_posix()
+    return any(fnmatch(relative, pattern) or fnmatch(path.name, pattern) for pattern in patterns)
+
+
+def iter_files(
+    data_dir: Path | str | None = None,
+    paths: Iterable[Path | str] | None = None,
+    include: Sequence[str] = INGEST_INCLUDE,
+    exclude: Sequence[str] = INGEST_EXCLUDE,
+    max_size_mb: float = INGEST_MAX_FILE_MB,
+    with_hash: bool = False,
+) -> Iterator[Dict[str, Any]]:
+    """Yield a lightweight descriptor per file of *data_dir*, without reading it.
 
     Parameters
     ----------
     data_dir
         Base directory to search.  If *None*, ``settings.DATA_DIR`` is used.
+    paths
+        Describe only these files instead of every file under *data_dir*.
+    include, exclude
+        Globs matched against the path relative to *data_dir* and against the
+        file name; a file must match an *include* glob and no *exclude* glob.
+    max_size_mb
+        Skip files larger than this (0 disables the limit).
+    with_hash
+        Add the SHA-256 ``content_hash`` to the metadata (reads the file).
 
-    Returns
-    -------
-    List[Dict[str, Any]]
-        Each dict has keys: ``content`` (str) and ``metadata`` (dict).
+    Yields
+    ------
+    Dict[str, Any]
+        Dicts with ``content`` set to None and ``metadata`` (file name,
+        absolute path, suffix, size, mtime and optional content hash).
 
     Raises
     ------
@@ -95,13 +142,72 @@ def load_documents(data_dir: Path | str | None = None) -> List[Dict[str, Any]]:
     if not base_dir.is_dir():
         raise FileNotFoundError(f"{base_dir} is not a directory")
 
-    logger.info("Starting document load", extra={"data_dir": str(base_dir)})
-
-    documents: List[Dict[str, Any]] = []
-
-    for path in base_dir.rglob("*"):
+    max_bytes = int(max_size_mb * (1 << 20))
+    candidates = (Path(p) for p in paths) if paths is not None else base_dir.rglob("*")
+    for path in candidates:
         if not path.is_file():
             continue  # skip sub-directories
+        if not _matches(path, base_dir, include) or _matches(path, base_dir, exclude):
+            continue
+
+        stat = path.stat()
+        if stat.st_size == 0:
+            logger.warning("Skipping empty file", extra={"path": str(path)})
+            continue
+        if max_bytes and stat.st_size > max_bytes:
+            logger.warning(
+                "Skipping file above the size limit",
+                extra={"path": str(path), "size_bytes": stat.st_size, "max_bytes": max_bytes},
+            )
+            continue
+
+        meta = _collect_metadata(path, stat)
+        if with_hash:
+            meta["content_hash"] = file_hash(path)
+        yield {"content": None, "metadata": meta}
+
+
+def iter_documents(
+    data_dir: Path | str | None = None,
+    paths: Iterable[Path | str] | None = None,
+    lazy: bool = False,
+) -> Iterator[Dict[str, Any]]:
+    """Yield the documents of *data_dir* one file at a time.
+
+    Streaming counterpart of ``load_documents``: only the file being yielded is
+    held in memory.
+
+    Parameters
+    ----------
+    data_dir
+        Base directory to search.  If *None*, ``settings.DATA_DIR`` is used.
+    paths
+        Load only these files instead of every file under *data_dir* (used by
+        incremental ingestion to read just the changed files).
+    lazy
+        Yield the ``iter_files`` descriptors (``content`` None) instead of
+        reading and decoding each file.
+
+    Yields
+    ------
+    Dict[str, Any]
+        Dicts with keys ``content`` (str, or None when *lazy*) and ``metadata`` (dict).
+
+    Raises
+    ------
+    FileNotFoundError
+        If the provided directory does not exist or is not a directory.
+    """
+    logger.info("Starting document load", extra={"data_dir": str(data_dir or settings.DATA_DIR), "lazy": lazy})
+
+    total = 0
+    for descriptor in iter_files(data_dir, paths):
+        meta: Dict[str, Any] = descriptor["metadata"]
+        path = Path(meta["path"])
+        if lazy:
+            total += 1
+            yield descriptor
+            continue
 
         try:
             content: str = _read_file(path)
@@ -112,8 +218,7 @@ def load_documents(data_dir: Path | str | None = None) -> List[Dict[str, Any]]:
             )
             continue
 
-        meta: Dict[str, Any] = _collect_metadata(path, size=len(content.encode("utf-8")))
-        documents.append({"content": content, "metadata": meta})
+        total += 1
 
         logger.debug(
             "Loaded file",
@@ -123,6 +228,35 @@ def load_documents(data_dir: Path | str | None = None) -> List[Dict[str, Any]]:
                 "modified_at": meta["modified_at"],
             },
         )
+        yield {"content": content, "metadata": meta}
+
+    logger.info("Completed document load", extra={"total_files": total})
+
 
-    logger.info("Completed document load", extra={"total_files": len(documents)})
-    return documents
+def load_documents(
+    data_dir: Path | str | None = None,
+    paths: Iterable[Path | str] | None = None,
+    lazy: bool = False,
+) -> List[Dict[str, Any]]:
+    """Load every file under *data_dir* and return a list of document objects.
+
+    Parameters
+    ----------
+    data_dir
+        Base directory to search.  If *None*, ``settings.DATA_DIR`` is used.
+    paths
+        Load only these files instead of every file under *data_dir*.
+    lazy
+        Return file descriptors instead of the decoded contents.
+
+    Returns
+    -------
+    List[Dict[str, Any]]
+        Each dict has keys: ``content`` (str) and ``metadata`` (dict).
+
+    Raises
+    ------
+    FileNotFoundError
+        If the provided directory does not exist or is not a directory.
+    """
+    return list(iter_documents(data_dir, paths, lazy=lazy))
@@ -0,0 +1,154 @@
+"""
+manifest.py
+
+Ingestion manifest for incremental runs.
+
+The ``ingest_manifest`` table (see ``vectorstore.db.ensure_manifest_table``)
+stores, per ingested file, its size, modification time and SHA-256 content
+hash. ``plan_ingestion`` compares the files discovered under the data directory
+by ``loader.iter_files`` (which applies the include/exclude globs and size
+limit) with it:
+
+* same size and mtime → unchanged, without reading the file;
+* stat changed but same content hash → unchanged (only the stat is refreshed);
+* otherwise → changed, the file is re-processed;
+* manifest entries under the directory whose file is gone → deleted.
+"""
+
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import text
+
+from app.agents.health_plan_agent.tools.rag.ingestion.loader import file_hash, iter_files
+from app.agents.health_plan_agent.tools.rag.vectorstore.db import engine, ensure_manifest_table
+from app.agents.health_plan_agent.tools.rag.utils.logger import get_logger
+
+# Logger Initialization
+logger = get_logger(__name__)
+
+@dataclass
+class FileState:
+    """State of a file on disk, as recorded in the manifest."""
+    path: str
+    size_bytes: int
+    mtime_ns: int
+    content_hash: Optional[str] = None
+
+
+@dataclass
+class IngestPlan:
+    """Files to re-process and paths to forget in an incremental run."""
+    changed: List[FileState] = field(default_factory=list)
+    deleted: List[str] = field(default_factory=list)
+    unchanged: int = 0
+
+
+def _load_manifest(base_dir: Path) -> Dict[str, FileState]:
+    prefix = str(base_dir).rstrip(os.sep) + os.sep
+    with engine.begin() as conn:
+        ensure_manifest_table(conn)
+        rows = conn.execute(
+            text(
+                "SELECT path, size_bytes, mtime_ns, content_hash FROM ingest_manifest "
+                "WHERE starts_with(path, :prefix)"
+            ),
+            {"prefix": prefix},
+        ).all()
+    return {row.path: FileState(row.path, row.size_bytes, row.mtime_ns, row.content_hash) for row in rows}
+
+
+def plan_ingestion(base_dir: Path, full: bool = False) -> IngestPlan:
+    """
+    Compare the files under *base_dir* with the manifest.
+
+    Parameters
+    ----------
+    base_dir : Path
+        Resolved data directory.
+    full : bool
+        Treat every file as changed (full re-ingestion).
+
+    Returns
+    -------
+    IngestPlan
+        Changed files (with their content hash) and deleted paths.
+    """
+    recorded = _load_manifest(base_dir)
+    plan = IngestPlan()
+    refreshed: List[FileState] = []
+    seen = set()
+
+    for descriptor in iter_files(base_dir):
+        meta = descriptor["metadata"]
+        state = FileState(meta["path"], meta["size_bytes"], meta["mtime_ns"])
+        seen.add(state.path)
+        previous = recorded.get(state.path)
+        if not full and previous is not None and (previous.size_bytes, previous.mtime_ns) == (
+            state.size_bytes,
+            state.mtime_ns,
+        ):
+            plan.unchanged += 1
+            continue
+
+        state.content_hash = file_hash(Path(state.path))
+        if not full and previous is not None and previous.content_hash == state.content_hash:
+            # Touched but identical: refresh the stat so the next run skips the hash too
+            refreshed.append(state)
+            plan.unchanged += 1
+            continue
+        plan.changed.append(state)
+
+    plan.deleted = sorted(set(recorded) - seen)
+    if refreshed:
+        record_ingested(refreshed)
+    logger.info(
+        "Plano de ingestão incremental",
+        extra={"changed": len(plan.changed), "unchanged": plan.unchanged, "deleted": len(plan.deleted)},
+    )
+    return plan
+
+
+def record_ingested(states: Iterable[FileState], chunk_counts: Optional[Dict[str, int]] = None) -> None:
+    """
+    Upsert *states* into the manifest, with the number of chunks stored per path.
+    Entries whose chunk count is not given keep the recorded one.
+    """
+    params = [
+        {
+            "path": state.path,
+            "content_hash": state.content_hash,
+            "size_bytes": state.size_bytes,
+            "mtime_ns": state.mtime_ns,
+            "chunk_count": None if chunk_counts is None else chunk_counts.get(state.path, 0),
+        }
+        for state in states
+    ]
+    if not params:
+        return
+    with engine.begin() as conn:
+        ensure_manifest_table(conn)
+        conn.execute(
+            text("""
+                INSERT INTO ingest_manifest (path, content_hash, size_bytes, mtime_ns, chunk_count)
+                VALUES (:path, :content_hash, :size_bytes, :mtime_ns, COALESCE(:chunk_count, 0))
+                ON CONFLICT (path) DO UPDATE SET
+                    content_hash = EXCLUDED.content_hash,
+                    size_bytes = EXCLUDED.size_bytes,
+                    mtime_ns = EXCLUDED.mtime_ns,
+                    chunk_count = COALESCE(:chunk_count, ingest_manifest.chunk_count),
+                    ingested_at = now()
+            """),
+            params,
+        )
+
+
+def forget_paths(paths: List[str]) -> None:
+    """Remove *paths* from the manifest."""
+    if not paths:
+        return
+    with engine.begin() as conn:
+        ensure_manifest_table(conn)
+        conn.execute(text("DELETE FROM ingest_manifest WHERE path = ANY(:paths)"), {"paths": paths})
@@ -7,23 +7,39 @@ Extrai conteúdos multimodais (texto, tabelas e imagens) de PDFs complexos,
 devolvendo uma lista de “document items” compatíveis com o pipeline de RAG.
 
 Cada item é um dict com:
-- 'content': str (para texto ou representação textual de tabela) ou base64 de imagem
+- 'content': str (para texto ou representação textual de tabela); vazio para imagens
 - 'type': 'text' | 'table' | 'image'
 - 'metadata': dict com chaves:
     * file_name, path, page_number
     * para tabelas: table_index
-    * para imagens: image_index, xref
+    * para imagens: image_index, xref, image_hash, image_path
+
+As imagens são gravadas uma única vez no ``ImageStore`` (endereçado pelo SHA-256
+do PNG): os itens levam apenas a referência, e logotipos repetidos em várias
+páginas ou arquivos ocupam um único arquivo.
+
+As tabelas de cada faixa de páginas são extraídas numa única chamada
+(PDF_TABLE_ENGINE): o tabula processa a faixa inteira de uma vez e cada tabela é
+associada à sua página pelo 'page_number' da saída JSON; o motor "pymupdf" usa
+``page.find_tables`` no próprio processo, sem JVM. Se a chamada da faixa falhar,
+ela é refeita em faixas menores e, por fim, página a página.
+
+Com mais de um worker, os PDFs — e faixas de PDF_PAGES_PER_TASK páginas dos PDFs
+grandes — são extraídos em paralelo num pool de processos; os itens saem sempre
+na ordem dos documentos e das páginas, independente da ordem de conclusão.
 """
 
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Tuple, Union
 
-import base64
-
-import fitz  # PyMuPDF para texto e imagens
-import pandas as pd
-import tabula  # para extração de tabelas em DataFrame
+import fitz  # PyMuPDF para texto, imagens e tabelas (motor "pymupdf")
+import tabula  # para extração de tabelas (motor "tabula")
 
+from app.config import PDF_PAGES_PER_TASK, PDF_TABLE_ENGINE, PDF_WORKERS
+from app.agents.health_plan_agent.tools.rag.ingestion.image_store import get_image_store
 from app.agents.health_plan_agent.tools.rag.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -32,54 +48,145 @@ logger = get_logger(__name__)
 DocumentItem = Dict[str, Any]
 
 
-def _encode_image(pix: fitz) -> str:
+def _png_bytes(pix: fitz.Pixmap) -> bytes:
     """
-    Recebe um Pixmap do PyMuPDF e retorna uma string base64 do PNG.
+    Recebe um Pixmap do PyMuPDF e retorna os bytes do PNG.
     """
-    buf = pix.tobytes(output="png")
-    return base64.b64encode(buf).decode("utf-8")
+    if pix.n - pix.alpha >= 4:
+        # CMYK e outros espaços de cor sem suporte em PNG são convertidos para RGB
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+    return pix.tobytes(output="png")
+
 
+def _table_text(rows: List[List[Any]]) -> str:
+    # Linhas da tabela em texto tabular simples, células separadas por " | "
+    lines = [" | ".join("" if cell is None else str(cell).strip() for cell in row) for row in rows]
+    return "\n".join(line for line in lines if line.strip(" |")).strip()
 
-def load_pdf(path: Path) -> List[DocumentItem]:
+
+def _read_tables(doc: Any, path: Path, start: int, stop: int, engine: str) -> Dict[int, List[str]]:
+    # Uma chamada do motor para a faixa [start, stop); exceções sobem para extract_tables
+    tables: Dict[int, List[str]] = {}
+    if engine == "pymupdf":
+        for pno in range(start, stop):
+            for table in doc[pno].find_tables().tables:
+                tables.setdefault(pno, []).append(_table_text(table.extract()))
+    elif engine == "tabula":
+        # Uma única execução da JVM para a faixa inteira; o JSON traz a página de cada tabela
+        results = tabula.read_pdf(
+            str(path),
+            pages=f"{start + 1}-{stop}",
+            multiple_tables=True,
+            output_format="json",
+        )
+        for table in results:
+            rows = [[cell.get("text") for cell in row] for row in table.get("data", [])]
+            tables.setdefault(int(table["page_number"]) - 1, []).append(_table_text(rows))
+    return tables
+
+
+def extract_tables(
+    doc: Any,
+    path: Path,
+    start: int,
+    stop: int,
+    engine: str = PDF_TABLE_ENGINE,
+    pages_per_task: int = PDF_PAGES_PER_TASK,
+) -> Dict[int, List[str]]:
+    """
+    Extrai as tabelas das páginas [start, stop) de *doc* (aberto em *path*).
+
+    A faixa é lida numa única chamada; se ela falhar, é refeita em faixas de
+    *pages_per_task* páginas (ou página a página, se a faixa já não for maior
+    que isso), de modo que uma página problemática não descarta as tabelas do
+    restante do documento.
+
+    Parameters
+    ----------
+    doc : fitz.Document
+        Documento aberto pelo PyMuPDF (usado pelo motor "pymupdf").
+    path : Path
+        Caminho do PDF (usado pelo motor "tabula").
+    start, stop : int
+        Faixa de páginas, base 0, fim exclusivo.
+    engine : str
+        "tabula", "pymupdf" ou "none".
+    pages_per_task : int
+        Tamanho das faixas usadas quando a chamada para a faixa inteira falha.
+
+    Returns
+    -------
+    Dict[int, List[str]]
+        Textos das tabelas por índice de página (base 0), na ordem de extração.
+    """
+    if engine == "none" or stop <= start:
+        return {}
+    if engine not in ("tabula", "pymupdf"):
+        logger.warning("PDF_TABLE_ENGINE inválido; tabelas ignoradas", extra={"file": str(path), "engine": engine})
+        return {}
+    try:
+        tables = _read_tables(doc, path, start, stop, engine)
+    except Exception as e:
+        logger.warning(
+            "Falha ao extrair tabelas",
+            extra={"file": str(path), "pages": f"{start + 1}-{stop}", "engine": engine, "error": str(e)}
+        )
+        if stop - start <= 1:
+            return {}
+        # Refaz em faixas menores; cada uma que falhar ainda cai para página a página
+        step = pages_per_task if stop - start > pages_per_task > 1 else 1
+        tables = {}
+        for sub_start in range(start, stop, step):
+            tables.update(extract_tables(doc, path, sub_start, min(sub_start + step, stop), engine, pages_per_task=1))
+    return {pno: [t for t in texts if t] for pno, texts in tables.items()}
+
+
+def load_pdf(path: Path, workers: int = 1) -> List[DocumentItem]:
     """
     Para cada página do PDF em *path*, extrai:
       1. Texto bruto (via page.get_text())
-      2. Cada tabela (via tabula.read_pdf → DataFrame → Markdown-like)
+      2. Cada tabela (via ``extract_tables``, uma chamada por faixa de páginas)
       3. Cada imagem inline (via page.get_images)
-    Retorna lista de dicts DocumentItem.
+    Retorna lista de dicts DocumentItem. Com *workers* > 1, as faixas de páginas
+    são extraídas em paralelo (ver ``extract_items``).
     """
-    logger.info("Carregando PDF multimodal", extra={"file": str(path)})
+    if workers > 1:
+        document = {"content": "", "metadata": {"path": str(path)}}
+        return list(extract_items([document], workers=workers))
+    with fitz.open(str(path)) as doc:
+        return _extract_pages(str(path), 0, doc.page_count)
+
+
+def _extract_pages(file_path: str, start: int, stop: int) -> List[DocumentItem]:
+    # Extrai as páginas [start, stop) de um PDF; função de módulo para rodar no pool de processos
+    path = Path(file_path)
+    logger.info("Carregando PDF multimodal", extra={"file": str(path), "pages": f"{start + 1}-{stop}"})
     docs: List[DocumentItem] = []
-    doc = fitz.open(str(path))
-    for pno in range(len(doc)):
-        page = doc[pno]
-        meta_base = {
-            "file_name": path.name,
-            "path": str(path.resolve()),
-            "page_number": pno + 1,
-        }
-
-        # 1. Texto
-        text = page.get_text().strip()
-        if text:
-            docs.append({
-                "type": "text",
-                "content": text,
-                "metadata": meta_base.copy()
-            })
-
-        # 2. Tabelas
-        try:
-            # Extrai todas as tabelas da página
-            df_list: List[pd.DataFrame] = tabula.read_pdf(
-                str(path),
-                pages=pno + 1,
-                multiple_tables=True,
-                pandas_options={"dtype": str},
-            )
-            for idx, df in enumerate(df_list):
-                # Converte DataFrame em texto tabular simples
-                table_txt = df.to_csv(sep=" | ", index=False).strip()
+    store = get_image_store()
+    # xref → hash: a mesma imagem (ex.: logotipo) é convertida uma única vez por faixa
+    image_hashes: Dict[int, str] = {}
+    with fitz.open(str(path)) as doc:
+        stop = min(stop, len(doc))
+        tables = extract_tables(doc, path, start, stop)
+        for pno in range(start, stop):
+            page = doc[pno]
+            meta_base = {
+                "file_name": path.name,
+                "path": str(path.resolve()),
+                "page_number": pno + 1,
+            }
+
+            # 1. Texto
+            text = page.get_text().strip()
+            if text:
+                docs.append({
+                    "type": "text",
+                    "content": text,
+                    "metadata": meta_base.copy()
+                })
+
+            # 2. Tabelas (já extraídas para a faixa inteira)
+            for idx, table_txt in enumerate(tables.get(pno, [])):
                 md = meta_base.copy()
                 md["type"] = "table"
                 md["table_index"] = idx
@@ -88,36 +195,100 @@ def load_pdf(path: Path) -> List[DocumentItem]:
                     "content": table_txt,
                     "metadata": md
                 })
-        except Exception as e:
-            logger.warning(
-                "Falha ao extrair tabela",
-                extra={"file": str(path), "page": pno + 1, "error": str(e)}
-            )
-
-        # 3. Imagens
-        for img_index, img in enumerate(page.get_images(full=True)):
-            xref = img[0]
-            try:
-                pix = fitz.Pixmap(doc, xref)
-                b64 = _encode_image(pix)
-                md = meta_base.copy()
-                md["type"] = "image"
-                md["image_index"] = img_index
-                md["xref"] = xref
-                docs.append({
-                    "type": "image",
-                    "content": b64,
-                    "metadata": md
-                })
-                pix = None  # libera memória
-            except Exception as e:
-                logger.warning(
-                    "Falha ao extrair imagem",
-                    extra={"file": str(path), "page": pno + 1, "xref": xref, "error": str(e)}
-                )
+
+            # 3. Imagens
+            for img_index, img in enumerate(page.get_images(full=True)):
+                xref = img[0]
+                try:
+                    if xref not in image_hashes:
+                        pix = fitz.Pixmap(doc, xref)
+                        image_hashes[xref] = store.put(_png_bytes(pix))
+                        pix = None  # libera memória
+                    digest = image_hashes[xref]
+                    md = meta_base.copy()
+                    md["type"] = "image"
+                    md["image_index"] = img_index
+                    md["xref"] = xref
+                    md["image_hash"] = digest
+                    md["image_path"] = str(store.path_for(digest))
+                    docs.append({
+                        "type": "image",
+                        "content": "",
+                        "metadata": md
+                    })
+                except Exception as e:
+                    logger.warning(
+                        "Falha ao extrair imagem",
+                        extra={"file": str(path), "page": pno + 1, "xref": xref, "error": str(e)}
+                    )
 
     logger.info(
         "Extração multimodal concluída",
-        extra={"file": str(path), "items_extracted": len(docs)}
+        extra={"file": str(path), "pages": f"{start + 1}-{stop}", "items_extracted": len(docs)}
     )
     return docs
+
+
+def _page_ranges(path: str, pages_per_task: int) -> List[Tuple[int, int]]:
+    with fitz.open(path) as doc:
+        total = doc.page_count
+    step = max(pages_per_task, 1)
+    return [(start, min(start + step, total)) for start in range(0, total, step)]
+
+
+def extract_items(
+    documents: Iterable[Dict[str, Any]],
+    workers: int = PDF_WORKERS,
+    pages_per_task: int = PDF_PAGES_PER_TASK,
+) -> Iterator[DocumentItem]:
+    """
+    Expande os PDFs de *documents* em itens multimodais; os demais documentos
+    passam inalterados.
+
+    Parameters
+    ----------
+    documents : Iterable[Dict[str, Any]]
+        Documentos com 'metadata' contendo 'path'.
+    workers : int
+        Processos do pool de extração; 1 extrai serialmente neste processo.
+    pages_per_task : int
+        Tamanho das faixas de páginas em que cada PDF é dividido.
+
+    Yields
+    ------
+    DocumentItem
+        Itens na ordem dos documentos e, dentro de cada PDF, das páginas. No
+        máximo 2 * workers tarefas ficam em andamento, o que limita a memória.
+    """
+    if workers <= 1:
+        for document in documents:
+            path = document["metadata"].get("path", "")
+            if Path(path).suffix.lower() == ".pdf":
+                yield from load_pdf(Path(path))
+            else:
+                yield document
+        return
+
+    # Fila em ordem de entrada: listas prontas (não-PDF) ou tarefas do pool
+    pending: Deque[Union[List[DocumentItem], "Future[List[DocumentItem]]"]] = deque()
+    max_pending = 2 * workers
+
+    def drain(limit: int) -> Iterator[DocumentItem]:
+        while len(pending) > limit:
+            head = pending.popleft()
+            yield from head if isinstance(head, list) else head.result()
+
+    # "spawn": extract_items roda numa thread de prefetch ao lado de outras threads
+    # vivas, e um fork herdaria locks (logging, filas) presos por elas. Os workers
+    # reimportam este módulo; _extract_pages e seus argumentos (str, int) são picklable
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        for document in documents:
+            path = document["metadata"].get("path", "")
+            if Path(path).suffix.lower() == ".pdf":
+                for start, stop in _page_ranges(path, pages_per_task):
+                    pending.append(pool.submit(_extract_pages, path, start, stop))
+                    yield from drain(max_pending)
+            else:
+                pending.append([document])
+                yield from drain(max_pending)
+        yield from drain(0)
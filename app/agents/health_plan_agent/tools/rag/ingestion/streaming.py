@@ -0,0 +1,111 @@
+"""
+streaming.py
+
+Building blocks of the streaming ingestion pipeline: bounded queues between
+stages, fixed-size batching and peak-RSS measurement.
+
+Each stage is a generator; ``prefetch`` runs a stage on a background thread and
+hands its items over through a bounded queue, so stages overlap (PDF parsing,
+embedding requests and upserts run concurrently) while at most ``maxsize``
+items wait between two stages. Memory therefore depends on the buffer sizes,
+not on the size of the corpus.
+"""
+
+import queue
+import sys
+import threading
+from itertools import islice
+from typing import Any, Iterable, Iterator, List, TypeVar
+
+from app.config import INGEST_QUEUE_SIZE
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+class _Failure:
+    """Exception raised by a producer thread, forwarded to the consumer."""
+
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
+
+def prefetch(items: Iterable[T], maxsize: int = INGEST_QUEUE_SIZE, name: str = "ingest-stage") -> Iterator[T]:
+    """
+    Iterate *items* on a background thread, buffering at most *maxsize* items.
+
+    The producer blocks while the buffer is full, so a slow consumer bounds the
+    memory held by the stage. Exceptions raised by the producer are re-raised
+    in the consumer; closing the consumer stops the producer.
+
+    Parameters
+    ----------
+    items : Iterable[T]
+        Stage to run in the background (usually a generator).
+    maxsize : int
+        Maximum number of items waiting in the buffer.
+    name : str
+        Thread name (shows up in logs and stack dumps).
+
+    Yields
+    ------
+    T
+        Items of *items*, in order.
+    """
+    buffer: "queue.Queue[Any]" = queue.Queue(maxsize=max(maxsize, 1))
+    stop = threading.Event()
+
+    def put(item: Any) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in items:
+                if not put(item):
+                    return
+            put(_DONE)
+        except BaseException as exc:  # forwarded to the consumer
+            put(_Failure(exc))
+
+    thread = threading.Thread(target=produce, name=name, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+
+
+def batched(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    """Group *items* into lists of at most *size* elements."""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, max(size, 1)))
+        if not batch:
+            return
+        yield batch
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of the current process, in MiB."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        import psutil
+
+        return psutil.Process().memory_info().peak_wset / (1 << 20)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in KiB on Linux
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
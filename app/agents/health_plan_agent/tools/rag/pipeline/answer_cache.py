@@ -0,0 +1,263 @@
+# pipeline/answer_cache.py
+
+"""
+pipeline.answer_cache
+
+Semantic answer cache placed in front of the RAG pipeline. Incoming queries are
+embedded and compared (cosine similarity) against previously answered queries;
+when a match above the configured threshold exists, the stored answer is returned
+without calling any LLM.
+
+Every entry is stamped with the corpus version recorded by the ingestion
+pipeline (see ``vectorstore.db.bump_corpus_version``), so a re-ingest invalidates
+cached answers automatically.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.config import (
+    SEMANTIC_CACHE_ENABLED,
+    SEMANTIC_CACHE_MAX_SIZE,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_VERSION_TTL,
+)
+from app.agents.health_plan_agent.tools.rag.vectorstore.db import get_corpus_version
+from app.agents.health_plan_agent.tools.rag.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class _CacheEntry:
+    query: str
+    answer: str
+    corpus_version: int
+
+
+class SemanticAnswerCache:
+    """
+    Thread-safe, size-bounded semantic cache of RAG answers.
+
+    Query embeddings are kept L2-normalized in a preallocated matrix so a lookup
+    is a single vectorized dot product. Eviction is least-recently-used.
+    """
+
+    def __init__(
+        self,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        max_size: int = SEMANTIC_CACHE_MAX_SIZE,
+        version_ttl: float = SEMANTIC_CACHE_VERSION_TTL,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        threshold : float
+            Minimum cosine similarity for a cached query to count as a hit.
+        max_size : int
+            Maximum number of cached answers.
+        version_ttl : float
+            Seconds between corpus version checks against the database.
+        """
+        if max_size <= 0:
+            raise ValueError("max_size must be positive")
+        self.threshold = threshold
+        self.max_size = max_size
+        self.version_ttl = version_ttl
+
+        self._lock = threading.Lock()
+        # slot -> entry, ordered from least to most recently used
+        self._entries: "OrderedDict[int, _CacheEntry]" = OrderedDict()
+        self._matrix: Optional[np.ndarray] = None
+        self._valid = np.zeros(max_size, dtype=bool)
+        self._free_slots: List[int] = list(range(max_size - 1, -1, -1))
+
+        self._corpus_version: Optional[int] = None
+        self._version_checked_at = 0.0
+        # Time of the last failed version check; lookups bypass the cache until version_ttl passes
+        self._version_failed_at: Optional[float] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    # -- corpus version -------------------------------------------------
+
+    def _current_version(self) -> Optional[int]:
+        now = time.monotonic()
+        if self._corpus_version is not None and now - self._version_checked_at < self.version_ttl:
+            return self._corpus_version
+        if self._version_failed_at is not None and now - self._version_failed_at < self.version_ttl:
+            return None
+        try:
+            version = get_corpus_version()
+        except Exception as e:
+            self._version_failed_at = now
+            logger.warning(
+                "Could not read corpus version; bypassing answer cache",
+                extra={"error": str(e), "retry_in_seconds": self.version_ttl},
+            )
+            return None
+
+        with self._lock:
+            if version != self._corpus_version:
+                self._purge_stale(version)
+            self._corpus_version = version
+            self._version_checked_at = now
+            self._version_failed_at = None
+        return version
+
+    def _purge_stale(self, version: int) -> None:
+        stale = [slot for slot, entry in self._entries.items() if entry.corpus_version != version]
+        for slot in stale:
+            self._release(slot)
+        if stale:
+            self.invalidations += len(stale)
+            logger.info(
+                "Answer cache invalidated by new corpus version",
+                extra={"corpus_version": version, "dropped": len(stale)},
+            )
+
+    # -- slot management ------------------------------------------------
+
+    def _release(self, slot: int) -> None:
+        del self._entries[slot]
+        self._valid[slot] = False
+        self._free_slots.append(slot)
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> Optional[np.ndarray]:
+        arr = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(arr))
+        if arr.ndim != 1 or norm == 0.0:
+            return None
+        return arr / norm
+
+    # -- public API -----------------------------------------------------
+
+    def lookup(self, vector: List[float]) -> Optional[str]:
+        """
+        Return the cached answer for the most similar query, if above threshold.
+
+        Parameters
+        ----------
+        vector : List[float]
+            Embedding of the incoming query.
+
+        Returns
+        -------
+        Optional[str]
+            Cached answer, or None on a miss.
+        """
+        version = self._current_version()
+        query_vec = self._normalize(vector)
+        if version is None or query_vec is None:
+            return None
+
+        with self._lock:
+            if self._matrix is None or not self._entries or self._matrix.shape[1] != query_vec.shape[0]:
+                self.misses += 1
+                return None
+
+            scores = self._matrix @ query_vec
+            scores[~self._valid] = -np.inf
+            slot = int(np.argmax(scores))
+            score = float(scores[slot])
+            if score < self.threshold:
+                self.misses += 1
+                return None
+
+            entry = self._entries[slot]
+            self._entries.move_to_end(slot)
+            self.hits += 1
+
+        logger.info("Answer cache hit", extra={"similarity": score, "cached_query": entry.query})
+        return entry.answer
+
+    def store(self, query: str, vector: List[float], answer: str) -> None:
+        """
+        Cache *answer* for *query*, stamped with the current corpus version.
+
+        Parameters
+        ----------
+        query : str
+            Original user query.
+        vector : List[float]
+            Embedding of *query*.
+        answer : str
+            Answer produced by the pipeline.
+        """
+        version = self._current_version()
+        query_vec = self._normalize(vector)
+        if version is None or query_vec is None or not answer:
+            return
+
+        with self._lock:
+            if self._matrix is None or self._matrix.shape[1] != query_vec.shape[0]:
+                # First entry (or embedding dimension changed): (re)allocate storage
+                self._matrix = np.zeros((self.max_size, query_vec.shape[0]), dtype=np.float32)
+                for slot in list(self._entries):
+                    self._release(slot)
+
+            if not self._free_slots:
+                lru_slot = next(iter(self._entries))
+                self._release(lru_slot)
+                self.evictions += 1
+
+            slot = self._free_slots.pop()
+            self._matrix[slot] = query_vec
+            self._valid[slot] = True
+            self._entries[slot] = _CacheEntry(query=query, answer=answer, corpus_version=version)
+
+        logger.debug("Answer cached", extra={"corpus_version": version, "size": len(self._entries)})
+
+    def clear(self) -> None:
+        """Drop every cached answer."""
+        with self._lock:
+            for slot in list(self._entries):
+                self._release(slot)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return hit/miss counters and current occupancy.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "corpus_version": self._corpus_version,
+            }
+
+
+_answer_cache: Optional[SemanticAnswerCache] = None
+_answer_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> Optional[SemanticAnswerCache]:
+    """
+    Return the process-wide answer cache, or None when disabled in config.
+    """
+    global _answer_cache
+    if not SEMANTIC_CACHE_ENABLED:
+        return None
+    if _answer_cache is None:
+        with _answer_cache_lock:
+            if _answer_cache is None:
+                _answer_cache = SemanticAnswerCache()
+                logger.info(
+                    "Semantic answer cache initialized",
+                    extra={"threshold": _answer_cache.threshold, "max_size": _answer_cache.max_size},
+                )
+    return _answer_cache
@@ -0,0 +1,118 @@
+# pipeline/context_packer.py
+
+"""
+pipeline.context_packer
+
+Token-budgeted packing of retrieved passages into the answer prompt.
+
+Passages are taken in relevance order and added while they fit in the token
+budget; the first passage that does not fit is truncated at a sentence
+boundary, and later passages are still tried whole so short ones can fill the
+remaining space (those that do not fit are dropped). Tokens are counted with
+tiktoken using the encoding of the active chat model (OpenAI models); other
+providers fall back to ``o200k_base``, which is a close approximation for
+budgeting purposes. If the tokenizer files cannot be loaded (offline host),
+counts fall back to ~4 characters per token.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence
+
+from app.config import CONTEXT_TOKEN_BUDGET
+from app.agents.health_plan_agent.tools.rag.utils.tokens import count_tokens, get_encoding
+
+# Separator used between passages in the prompt (see RAGPipeline._answer_inputs)
+SEPARATOR = "\n\n"
+# Sentence ends: terminal punctuation followed by whitespace, or a line break
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+|\n+")
+
+
+@dataclass
+class PackedContext:
+    """Result of ``ContextPacker.pack``."""
+    passages: List[str] = field(default_factory=list)
+    tokens: int = 0
+    truncated: int = 0
+    dropped: int = 0
+
+
+class ContextPacker:
+    """
+    Fill a token budget with passages in relevance order.
+    """
+
+    def __init__(self, model: Optional[str] = None, budget: int = CONTEXT_TOKEN_BUDGET) -> None:
+        """
+        Parameters
+        ----------
+        model : Optional[str]
+            Chat model name, used to pick the tokenizer.
+        budget : int
+            Maximum context tokens; 0 or less disables packing (every passage kept).
+        """
+        self.model = model
+        self.budget = budget
+        # SEPARATOR ("\n\n") is a single token in the OpenAI encodings
+        self._separator_tokens = 1
+
+    def count(self, text: str) -> int:
+        """Number of tokens of *text* for the active model."""
+        return count_tokens(text, self.model)
+
+    def _truncate(self, passage: str, budget: int) -> str:
+        # Longest prefix made of whole sentences that fits in *budget* tokens
+        # (the whole passage is already known not to fit). The passage is encoded
+        # once and cut on the token array; the cut is then moved back to a sentence end
+        encoding = get_encoding(self.model)
+        if encoding is None:
+            limit = budget * 4
+        else:
+            limit = len(encoding.decode(encoding.encode(passage, disallowed_special=())[:budget]))
+        ends = [m.start() for m in _SENTENCE_END.finditer(passage, 0, limit + 1)]
+        # Re-tokenizing a prefix can merge differently at the cut, so confirm the count
+        for end in reversed(ends):
+            candidate = passage[:end].strip()
+            if candidate and self.count(candidate) <= budget:
+                return candidate
+        return ""
+
+    def pack(self, passages: Sequence[str]) -> PackedContext:
+        """
+        Select *passages* (best first) that fit the token budget.
+
+        Only the first passage that does not fit is truncated at a sentence
+        boundary; later passages that do not fit whole are dropped.
+
+        Parameters
+        ----------
+        passages : Sequence[str]
+            Retrieved passages in relevance order.
+
+        Returns
+        -------
+        PackedContext
+            Packed passages, their total token count (separators included) and
+            how many passages were truncated or dropped.
+        """
+        packed = PackedContext()
+        truncated_one = False
+        for passage in passages:
+            if not passage:
+                continue
+            cost = self.count(passage) + (self._separator_tokens if packed.passages else 0)
+            if self.budget <= 0 or packed.tokens + cost <= self.budget:
+                packed.passages.append(passage)
+                packed.tokens += cost
+                continue
+
+            remaining = self.budget - packed.tokens - (self._separator_tokens if packed.passages else 0)
+            truncated = self._truncate(passage, remaining) if remaining > 0 and not truncated_one else ""
+            truncated_one = True
+            if truncated:
+                packed.tokens += self.count(truncated) + (self._separator_tokens if packed.passages else 0)
+                packed.passages.append(truncated)
+                packed.truncated += 1
+            else:
+                packed.dropped += 1
+        return packed
@@ -0,0 +1,244 @@
+# pipeline/postprocess.py
+
+"""
+pipeline.postprocess
+
+Post-retrieval steps applied to the candidate chunks before they reach the
+answer prompt:
+
+* ``reciprocal_rank_fusion`` merges the rankings of several queries
+  (multi-query retrieval) into a single deduplicated list.
+* ``mmr_select`` picks a relevant but non-redundant subset of an oversampled
+  candidate set (maximal marginal relevance).
+* ``stitch_adjacent`` merges hits with consecutive ``chunk_index`` from the same
+  source into one passage, dropping the text the chunker duplicated as overlap.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import (
+    CHUNK_OVERLAP,
+    HYBRID_RRF_K,
+    MMR_LAMBDA,
+    STITCH_ADJACENT_CHUNKS,
+)
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[Dict[str, Any]]],
+    k: int,
+    rrf_k: int = HYBRID_RRF_K,
+) -> List[Dict[str, Any]]:
+    """
+    Fuse several ranked result lists with Reciprocal Rank Fusion.
+
+    Each document scores ``Σ 1 / (rrf_k + rank)`` over the lists it appears in;
+    duplicates are merged, keeping the row with the smallest distance.
+
+    Parameters
+    ----------
+    rankings : Sequence[Sequence[Dict[str, Any]]]
+        Result lists, each ordered from best to worst and keyed by 'id'.
+    k : int
+        Number of fused documents to return.
+    rrf_k : int
+        RRF smoothing constant.
+
+    Returns
+    -------
+    List[Dict[str, Any]]
+        Up to k documents ordered by fused score, each with a 'score' key added.
+    """
+    scores: Dict[Any, float] = {}
+    best: Dict[Any, Dict[str, Any]] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            doc_id = doc["id"]
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (rrf_k + rank)
+            kept = best.get(doc_id)
+            if kept is None or doc.get("distance", 0.0) < kept.get("distance", 0.0):
+                best[doc_id] = doc
+
+    ordered = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [{**best[doc_id], "score": scores[doc_id]} for doc_id in ordered]
+
+
+def _unit_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0.0, 1.0, norms)
+
+
+def mmr_select(
+    query_vector: Sequence[float],
+    candidates: Sequence[Dict[str, Any]],
+    k: int,
+    lambda_mult: float = MMR_LAMBDA,
+) -> List[Dict[str, Any]]:
+    """
+    Select k candidates by maximal marginal relevance.
+
+    Each step picks the candidate maximizing
+    ``λ · sim(query, d) - (1 - λ) · max sim(d, selected)`` (cosine similarity).
+    The pairwise similarities are one matrix product; the greedy loop only
+    updates a running maximum vector.
+
+    Parameters
+    ----------
+    query_vector : Sequence[float]
+        Query embedding.
+    candidates : Sequence[Dict[str, Any]]
+        Candidate documents carrying an 'embedding' key.
+    k : int
+        Number of documents to select.
+    lambda_mult : float
+        Relevance weight in [0, 1]; 1.0 degenerates to plain similarity ranking.
+
+    Returns
+    -------
+    List[Dict[str, Any]]
+        Selected candidates in selection order.
+    """
+    if len(candidates) <= k:
+        return list(candidates)
+
+    embeddings = _unit_rows(np.asarray([c["embedding"] for c in candidates], dtype=np.float32))
+    query = _unit_rows(np.asarray(query_vector, dtype=np.float32))
+    relevance = embeddings @ query
+    pairwise = embeddings @ embeddings.T
+
+    selected: List[int] = []
+    redundancy = np.zeros(len(candidates), dtype=np.float32)
+    available = np.ones(len(candidates), dtype=bool)
+    for _ in range(k):
+        scores = lambda_mult * relevance - (1.0 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        idx = int(np.argmax(scores))
+        selected.append(idx)
+        available[idx] = False
+        np.maximum(redundancy, pairwise[idx], out=redundancy)
+    return [candidates[i] for i in selected]
+
+
+def _merge_overlap(left: str, right: str, max_overlap: int) -> str:
+    # Longest suffix of *left* that is a prefix of *right* (the chunker's overlap)
+    for size in range(min(len(left), len(right), max_overlap), 0, -1):
+        if left.endswith(right[:size]):
+            return left + right[size:]
+    return f"{left}\n{right}"
+
+
+_ITEM_KEYS = ("path", "page_number", "type", "table_index", "image_index")
+
+
+def _source_key(doc: Dict[str, Any]) -> Optional[Tuple[Any, ...]]:
+    metadata = doc.get("metadata") or {}
+    if metadata.get("path") is None or metadata.get("chunk_index") is None:
+        return None
+    # chunk_index restarts for every extracted item (page text, each table and
+    # image caption), so the key carries the same fields as VectorStore.document_id
+    return tuple(metadata.get(key) for key in _ITEM_KEYS)
+
+
+def stitch_adjacent(
+    docs: Sequence[Dict[str, Any]],
+    max_overlap: int = CHUNK_OVERLAP,
+) -> List[Dict[str, Any]]:
+    """
+    Merge hits with consecutive ``chunk_index`` from the same source into one passage.
+
+    Parameters
+    ----------
+    docs : Sequence[Dict[str, Any]]
+        Retrieved documents, best first.
+    max_overlap : int
+        Longest overlap (characters) searched between neighbouring chunks.
+
+    Returns
+    -------
+    List[Dict[str, Any]]
+        Passages ordered by their best-ranked member. A merged passage keeps the
+        first chunk's id and metadata, with 'chunk_indices' listing its chunks;
+        when the chunks carry 'embedding', the passage gets their mean.
+    """
+    groups: Dict[Tuple[Any, ...], List[int]] = {}
+    for pos, doc in enumerate(docs):
+        key = _source_key(doc)
+        if key is not None:
+            groups.setdefault(key, []).append(pos)
+
+    def chunk_index(pos: int) -> int:
+        return docs[pos]["metadata"]["chunk_index"]
+
+    merged_into: Dict[int, int] = {}
+    passages: Dict[int, Dict[str, Any]] = {}
+    for positions in groups.values():
+        positions.sort(key=chunk_index)
+        run = [positions[0]]
+        for pos in positions[1:] + [None]:
+            if pos is not None and chunk_index(pos) == chunk_index(run[-1]) + 1:
+                run.append(pos)
+                continue
+            if len(run) > 1:
+                head = min(run)  # best-ranked member decides the passage position
+                first = docs[run[0]]
+                content = first["content"]
+                for member in run[1:]:
+                    content = _merge_overlap(content, docs[member]["content"], max_overlap)
+                metadata = dict(first.get("metadata") or {})
+                metadata["chunk_indices"] = [chunk_index(p) for p in run]
+                passage = {**docs[head], "id": first["id"], "content": content, "metadata": metadata}
+                if "embedding" in first:
+                    # Stands in for the passage in MMR (see select_passages)
+                    passage["embedding"] = np.mean(
+                        np.asarray([docs[p]["embedding"] for p in run], dtype=np.float32), axis=0
+                    )
+                passages[head] = passage
+                merged_into.update({p: head for p in run})
+            run = [pos] if pos is not None else []
+
+    result = []
+    for pos, doc in enumerate(docs):
+        head = merged_into.get(pos)
+        if head is None:
+            result.append(doc)
+        elif head == pos:
+            result.append(passages[pos])
+    return result
+
+
+def select_passages(
+    query_vector: Sequence[float],
+    candidates: Sequence[Dict[str, Any]],
+    k: int,
+    stitch: bool = STITCH_ADJACENT_CHUNKS,
+) -> List[Dict[str, Any]]:
+    """
+    Post-retrieval stage: adjacent chunks among the (oversampled) candidates are
+    stitched first, then MMR picks k of the resulting passages. Stitching before
+    MMR matters: overlapping neighbours look redundant to MMR, which would keep
+    only one of them. Embeddings are dropped from the returned documents.
+
+    Parameters
+    ----------
+    query_vector : Sequence[float]
+        Query embedding (relevance term of MMR).
+    candidates : Sequence[Dict[str, Any]]
+        Candidates, best first; MMR runs only when they carry 'embedding'.
+    k : int
+        Number of passages to keep.
+    stitch : bool
+        Whether to merge adjacent chunks.
+
+    Returns
+    -------
+    List[Dict[str, Any]]
+        At most k passages.
+    """
+    passages = stitch_adjacent(candidates) if stitch else list(candidates)
+    if len(passages) > k and "embedding" in passages[0]:
+        docs = mmr_select(query_vector, passages, k)
+    else:
+        docs = passages[:k]
+    return [{key: value for key, value in doc.items() if key != "embedding"} for doc in docs]
@@ -3,23 +3,38 @@ pipeline.rag_pipeline
 
 Main orchestration of the Retrieval-Augmented Generation (RAG) pipeline using LangGraph and LangChain Core Runnables.
 1. Rewrite the input query for improved retrieval.
-2. Retrieve relevant document chunks.
+2. Retrieve relevant document chunks and pack them into the context token budget.
 3. Generate the answer via the LLM chain.
+
+With ``MULTI_QUERY_COUNT`` > 1 the rewrite step produces several query variants,
+which are retrieved together (one embeddings call, one SQL statement) and fused.
+
+``run`` returns the full answer; ``stream``/``astream`` yield answer tokens as the
+LLM produces them, after running the rewrite and retrieve stages. ``arun`` and
+``astream`` are fully async (async LLM calls, async embeddings and asyncpg search).
 """
 
+import asyncio
+import hashlib
+import re
+import threading
 import time
-from typing import List, Dict, Any, TypedDict
+from functools import lru_cache
+from typing import List, Dict, Any, AsyncIterator, Iterator, Optional, Tuple, TypedDict
 
 from langgraph.graph import StateGraph, START, END
 from app.agents.health_plan_agent.tools.rag.pipeline.retriever import Retriever
+from app.agents.health_plan_agent.tools.rag.pipeline.answer_cache import get_answer_cache
+from app.agents.health_plan_agent.tools.rag.pipeline.context_packer import ContextPacker, SEPARATOR
+from app.agents.health_plan_agent.tools.rag.embedding.embedder import generate_embedding, agenerate_embedding
 from app.llm_factory import get_llm_provider
 from app.agents.health_plan_agent.tools.rag.utils.callbacks import get_callback_manager
 from app.agents.health_plan_agent.tools.rag.utils.logger import get_logger
-from app.config import LANGSMITH_PROJECT
+from app.config import LANGSMITH_PROJECT, MULTI_QUERY_COUNT
 from langsmith import traceable
 
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import Runnable
+from langchain_core.runnables import Runnable, RunnableLambda
 
 from app.llm_factory import get_llm_provider
 # … outras importações …
@@ -39,6 +54,7 @@ def init_llm(llm_provider):
 class RAGState(TypedDict):
     query: str
     rewritten_query: str
+    query_variants: List[str]
     contexts: List[str]
     answer: str
 
@@ -48,26 +64,44 @@ class RAGPipeline:
     now leveraging LangGraph state graph and LangChain Core Runnables.
     """
 
-    def __init__(self, k: int = 2) -> None:
+    def __init__(self, k: int = 2, llm: Any = None, n_queries: int = MULTI_QUERY_COUNT) -> None:
         """
         Initialize the RAGPipeline, build LangChain chains, and LangGraph workflow.
 
+        Instances hold no per-query state and can be shared across concurrent
+        sessions; prefer ``get_pipeline`` over constructing one per query.
+
         Parameters
         ----------
         k : int
             Number of top similar document chunks to retrieve (default=2).
+        llm : Any, optional
+            Chat model to use; defaults to the one set via ``init_llm``.
+        n_queries : int
+            Query variants produced by the rewrite step (1 disables multi-query).
         """
         self.k = k
+        self.n_queries = max(1, n_queries)
         self.logger = get_logger(__name__)
         self.retriever = Retriever()
-        self.llm = _llm_provider or get_llm_provider('openai')
+        self.llm = llm or _llm_provider or get_llm_provider('openai')
         self.callback_manager = get_callback_manager()
+        self.answer_cache = get_answer_cache()
+        self.context_packer = ContextPacker(model=_model_name(self.llm))
 
         # -- LangChain: define prompt chains --
-        rewrite_prompt = ChatPromptTemplate.from_messages([
-            ("system", "Rewrite the query for better document retrieval."),
-            ("human", "{query}")
-        ])
+        if self.n_queries > 1:
+            rewrite_prompt = ChatPromptTemplate.from_messages([
+                ("system",
+                 f"Rewrite the query in {self.n_queries} different ways for better document retrieval, "
+                 "varying wording and perspective. Return one rewrite per line, without numbering."),
+                ("human", "{query}")
+            ])
+        else:
+            rewrite_prompt = ChatPromptTemplate.from_messages([
+                ("system", "Rewrite the query for better document retrieval."),
+                ("human", "{query}")
+            ])
         self.rewrite_chain: Runnable = rewrite_prompt | self.llm
 
         answer_prompt = ChatPromptTemplate.from_messages([
@@ -77,20 +111,47 @@ class RAGPipeline:
         self.answer_chain: Runnable = answer_prompt | self.llm
 
         # -- LangGraph: build workflow --
-        self.workflow = StateGraph(RAGState)
-        self.workflow.add_node("rewrite", self._rewrite_node)
-        self.workflow.add_node("retrieve", self._retrieve_node)
-        self.workflow.add_node("generate", self._generate_node)
+        self.workflow = self._build_workflow(include_generate=True)
+        self.app = self.workflow.compile()
+        # Same graph without the generate node; streaming drives generation itself
+        self.prepare_app = self._build_workflow(include_generate=False).compile()
 
-        self.workflow.add_edge(START, "rewrite")
-        self.workflow.add_edge("rewrite", "retrieve")
-        self.workflow.add_edge("retrieve", "generate")
-        self.workflow.add_edge("generate", END)
+    def _build_workflow(self, include_generate: bool) -> StateGraph:
+        workflow = StateGraph(RAGState)
+        # Each node carries a sync and an async implementation (invoke vs ainvoke)
+        workflow.add_node("rewrite", RunnableLambda(self._rewrite_node, afunc=self._arewrite_node))
+        workflow.add_node("retrieve", RunnableLambda(self._retrieve_node, afunc=self._aretrieve_node))
 
-        self.app = self.workflow.compile()
+        workflow.add_conditional_edges(START, self._route_start, {
+            "rewrite": "rewrite",
+            "retrieve": "retrieve",
+        })
+        workflow.add_edge("rewrite", "retrieve")
+        if include_generate:
+            workflow.add_node("generate", RunnableLambda(self._generate_node, afunc=self._agenerate_node))
+            workflow.add_edge("retrieve", "generate")
+            workflow.add_edge("generate", END)
+        else:
+            workflow.add_edge("retrieve", END)
+        return workflow
+
+    @staticmethod
+    def _initial_state(query: str, rewritten_query: Optional[str]) -> RAGState:
+        return {
+            "query": query,
+            "rewritten_query": rewritten_query or "",
+            "query_variants": [],
+            "contexts": [],
+            "answer": ""
+        }
+
+    @staticmethod
+    def _text(message: Any) -> str:
+        # Extract text content if returned as a message (or message chunk)
+        return message.content if hasattr(message, "content") else str(message)
 
     @traceable(project_name=LANGSMITH_PROJECT, name='Rag_Plano')
-    def run(self, query: str) -> str:
+    def run(self, query: str, rewritten_query: Optional[str] = None) -> str:
         """
         Execute the RAG pipeline for the given query via LangGraph and LangChain.
 
@@ -98,6 +159,9 @@ class RAGPipeline:
         ----------
         query : str
             The user question to answer.
+        rewritten_query : Optional[str]
+            Retrieval query already produced upstream (e.g. by the single-call
+            router); when given, the rewrite node is skipped.
 
         Returns
         -------
@@ -107,37 +171,309 @@ class RAGPipeline:
         self.logger.info("Starting RAG pipeline", extra={"query_length": len(query)})
         start_time = time.time()
 
-        initial_state: RAGState = {
-            "query": query,
-            "rewritten_query": "",
-            "contexts": [],
-            "answer": ""
-        }
-        state = self.app.invoke(initial_state)
+        cache_vector, cached_answer = self._cache_lookup(query)
+        if cached_answer is not None:
+            self.logger.info(
+                "RAG pipeline answered from cache",
+                extra={"total_duration_sec": time.time() - start_time, "cache": self.answer_cache.stats()},
+            )
+            return cached_answer
+
+        state = self.app.invoke(self._initial_state(query, rewritten_query))
         print(self.llm)
         duration = time.time() - start_time
         self.logger.info(
             "RAG pipeline finished",
             extra={"total_duration_sec": duration, "answer_length": len(state["answer"])},
         )
+        if cache_vector:
+            self.answer_cache.store(query, cache_vector, state["answer"])
         return state["answer"]
 
+    @traceable(project_name=LANGSMITH_PROJECT, name='Rag_Plano_Async')
+    async def arun(self, query: str, rewritten_query: Optional[str] = None) -> str:
+        """
+        Async counterpart of ``run``; never blocks the event loop on I/O.
+
+        Parameters
+        ----------
+        query : str
+            The user question to answer.
+        rewritten_query : Optional[str]
+            Retrieval query already produced upstream; skips the rewrite node.
+
+        Returns
+        -------
+        str
+            The answer generated by the LLM.
+        """
+        self.logger.info("Starting async RAG pipeline", extra={"query_length": len(query)})
+        start_time = time.time()
+
+        cache_vector, cached_answer = await self._acache_lookup(query)
+        if cached_answer is not None:
+            return cached_answer
+
+        state = await self.app.ainvoke(self._initial_state(query, rewritten_query))
+        self.logger.info(
+            "Async RAG pipeline finished",
+            extra={"total_duration_sec": time.time() - start_time, "answer_length": len(state["answer"])},
+        )
+        if cache_vector:
+            await asyncio.to_thread(self.answer_cache.store, query, cache_vector, state["answer"])
+        return state["answer"]
+
+    @traceable(project_name=LANGSMITH_PROJECT, name='Rag_Plano_Stream')
+    def stream(self, query: str, rewritten_query: Optional[str] = None) -> Iterator[str]:
+        """
+        Execute the RAG pipeline and yield the answer incrementally.
+
+        Rewrite and retrieval run to completion first; the answer tokens are then
+        yielded as ``answer_chain`` streams them. A cached answer is yielded whole.
+
+        Parameters
+        ----------
+        query : str
+            The user question to answer.
+        rewritten_query : Optional[str]
+            Retrieval query already produced upstream; skips the rewrite node.
+
+        Yields
+        ------
+        str
+            Answer text fragments, in order.
+        """
+        self.logger.info("Starting streaming RAG pipeline", extra={"query_length": len(query)})
+        start_time = time.time()
+
+        cache_vector, cached_answer = self._cache_lookup(query)
+        if cached_answer is not None:
+            yield cached_answer
+            return
+
+        state = self.prepare_app.invoke(self._initial_state(query, rewritten_query))
+        parts: List[str] = []
+        for chunk in self.answer_chain.stream(self._answer_inputs(state)):
+            token = self._text(chunk)
+            if token:
+                if not parts:
+                    self.logger.info("First answer token", extra={"ttft_sec": time.time() - start_time})
+                parts.append(token)
+                yield token
+
+        answer = "".join(parts)
+        self.logger.info(
+            "Streaming RAG pipeline finished",
+            extra={"total_duration_sec": time.time() - start_time, "answer_length": len(answer)},
+        )
+        if cache_vector:
+            self.answer_cache.store(query, cache_vector, answer)
+
+    async def astream(self, query: str, rewritten_query: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Async counterpart of ``stream``.
+
+        Parameters
+        ----------
+        query : str
+            The user question to answer.
+        rewritten_query : Optional[str]
+            Retrieval query already produced upstream; skips the rewrite node.
+
+        Yields
+        ------
+        str
+            Answer text fragments, in order.
+        """
+        self.logger.info("Starting streaming RAG pipeline", extra={"query_length": len(query)})
+        start_time = time.time()
+
+        cache_vector, cached_answer = await self._acache_lookup(query)
+        if cached_answer is not None:
+            yield cached_answer
+            return
+
+        state = await self.prepare_app.ainvoke(self._initial_state(query, rewritten_query))
+        parts: List[str] = []
+        async for chunk in self.answer_chain.astream(self._answer_inputs(state)):
+            token = self._text(chunk)
+            if token:
+                if not parts:
+                    self.logger.info("First answer token", extra={"ttft_sec": time.time() - start_time})
+                parts.append(token)
+                yield token
+
+        answer = "".join(parts)
+        self.logger.info(
+            "Streaming RAG pipeline finished",
+            extra={"total_duration_sec": time.time() - start_time, "answer_length": len(answer)},
+        )
+        if cache_vector:
+            await asyncio.to_thread(self.answer_cache.store, query, cache_vector, answer)
+
+    def _cache_lookup(self, query: str) -> Tuple[Optional[List[float]], Optional[str]]:
+        # Embed the raw query and probe the semantic answer cache; failures only skip the cache
+        if self.answer_cache is None:
+            return None, None
+        try:
+            vector = generate_embedding(query)
+        except Exception as e:
+            self.logger.warning("Answer cache lookup skipped", extra={"error": str(e)})
+            return None, None
+        return vector, self.answer_cache.lookup(vector)
+
+    async def _acache_lookup(self, query: str) -> Tuple[Optional[List[float]], Optional[str]]:
+        if self.answer_cache is None:
+            return None, None
+        try:
+            vector = await agenerate_embedding(query)
+        except Exception as e:
+            self.logger.warning("Answer cache lookup skipped", extra={"error": str(e)})
+            return None, None
+        # The lookup may refresh the corpus version from Postgres (sync driver)
+        return vector, await asyncio.to_thread(self.answer_cache.lookup, vector)
+
+    def _route_start(self, state: RAGState) -> str:
+        # Skip the rewrite LLM call when the router already provided the retrieval query
+        return "retrieve" if state.get("rewritten_query") else "rewrite"
+
+    def _rewrite_update(self, result: Any) -> Dict[str, Any]:
+        text = self._text(result)
+        if self.n_queries == 1:
+            return {"rewritten_query": text}
+        # One variant per line; tolerate bullets/numbering the model may add anyway
+        variants = [re.sub(r"^\s*(?:[-*•]|\d+[.)])\s*", "", line).strip() for line in text.splitlines()]
+        variants = [v for v in variants if v][:self.n_queries] or [text]
+        return {"rewritten_query": variants[0], "query_variants": variants}
+
     def _rewrite_node(self, state: RAGState) -> Dict[str, Any]:
         # Use LangChain chain to rewrite the query
         result = self.rewrite_chain.invoke({"query": state["query"]})
-        # Extract text content if returned as a message
-        rewritten_text = result.content if hasattr(result, "content") else str(result)
-        return {"rewritten_query": rewritten_text}
+        return self._rewrite_update(result)
+
+    async def _arewrite_node(self, state: RAGState) -> Dict[str, Any]:
+        result = await self.rewrite_chain.ainvoke({"query": state["query"]})
+        return self._rewrite_update(result)
+
+    def _retrieval_queries(self, state: RAGState) -> List[str]:
+        # The original question is kept as a variant; it also gives a second query
+        # when the router supplied the rewrite and the rewrite node was skipped
+        return [state["rewritten_query"], *state.get("query_variants", []), state["query"]]
+
+    def _pack_contexts(self, docs: List[Dict[str, Any]]) -> Dict[str, Any]:
+        # Fit the retrieved passages (relevance order) into the context token budget
+        packed = self.context_packer.pack([doc["content"] for doc in docs])
+        self.logger.info(
+            "Context packed",
+            extra={
+                "context_tokens": packed.tokens,
+                "token_budget": self.context_packer.budget,
+                "passages": len(packed.passages),
+                "truncated": packed.truncated,
+                "dropped": packed.dropped,
+            },
+        )
+        return {"contexts": packed.passages}
 
     def _retrieve_node(self, state: RAGState) -> Dict[str, Any]:
-        # Retrieve document chunks using the rewritten query
-        docs = self.retriever.retrieve(state["rewritten_query"], k=self.k)
-        contents = [doc["content"] for doc in docs]
-        return {"contexts": contents}
+        # Retrieve document chunks using the rewritten query (or all its variants)
+        if self.n_queries > 1:
+            docs = self.retriever.retrieve_many(self._retrieval_queries(state), k=self.k)
+        else:
+            docs = self.retriever.retrieve(state["rewritten_query"], k=self.k)
+        return self._pack_contexts(docs)
+
+    async def _aretrieve_node(self, state: RAGState) -> Dict[str, Any]:
+        if self.n_queries > 1:
+            docs = await self.retriever.aretrieve_many(self._retrieval_queries(state), k=self.k)
+        else:
+            docs = await self.retriever.aretrieve(state["rewritten_query"], k=self.k)
+        return self._pack_contexts(docs)
+
+    @staticmethod
+    def _answer_inputs(state: RAGState) -> Dict[str, Any]:
+        # Flatten contexts into the answer prompt variables
+        contexts_str = SEPARATOR.join(state["contexts"])
+        return {"contexts": contexts_str, "query": state["rewritten_query"]}
 
     def _generate_node(self, state: RAGState) -> Dict[str, Any]:
-        # Flatten contexts and generate the answer via LLM chain
-        contexts_str = "\n\n".join(state["contexts"])
-        result = self.answer_chain.invoke({"contexts": contexts_str, "query": state["rewritten_query"]})
-        answer_text = result.content if hasattr(result, "content") else str(result)
-        return {"answer": answer_text}
+        # Generate the answer via LLM chain
+        result = self.answer_chain.invoke(self._answer_inputs(state))
+        return {"answer": self._text(result)}
+
+    async def _agenerate_node(self, state: RAGState) -> Dict[str, Any]:
+        result = await self.answer_chain.ainvoke(self._answer_inputs(state))
+        return {"answer": self._text(result)}
+
+
+# === Process-wide pipeline registry ===
+_pipelines: Dict[Tuple[Tuple[Any, ...], int], RAGPipeline] = {}
+_pipelines_lock = threading.Lock()
+
+
+def _model_name(llm: Any) -> Optional[str]:
+    return getattr(llm, "model_name", None) or getattr(llm, "model", None)
+
+
+def _secret_digest(llm: Any) -> Optional[str]:
+    # Short digest of the API key: tells keys apart without keeping the secret in the key
+    for attr in ("openai_api_key", "anthropic_api_key", "api_key"):
+        secret = getattr(llm, attr, None)
+        if secret is not None:
+            value = secret.get_secret_value() if hasattr(secret, "get_secret_value") else str(secret)
+            return hashlib.sha256(value.encode("utf-8")).hexdigest()[:12]
+    return None
+
+
+def _llm_key(llm: Any) -> Tuple[Any, ...]:
+    # Streamlit reruns recreate the chat model, so key on its configuration rather than
+    # identity: class, model, temperature, API key and callback handlers (the factory
+    # reuses the same handler objects across reruns)
+    callbacks = getattr(llm, "callbacks", None)
+    handlers = callbacks if isinstance(callbacks, list) else getattr(callbacks, "handlers", None) or []
+    return (
+        type(llm).__name__,
+        _model_name(llm),
+        getattr(llm, "temperature", None),
+        _secret_digest(llm),
+        tuple(id(handler) for handler in handlers),
+    )
+
+
+@lru_cache(maxsize=1)
+def _default_llm() -> Any:
+    # Built once: get_pipeline is called per query and only needs the default for its key
+    return get_llm_provider('openai')
+
+
+def get_pipeline(k: int = 2, llm: Any = None) -> RAGPipeline:
+    """
+    Return the shared RAGPipeline for (llm provider, k), building and compiling
+    it on first use.
+
+    Parameters
+    ----------
+    k : int
+        Number of top similar document chunks to retrieve (default=2).
+    llm : Any, optional
+        Chat model to use; defaults to the one set via ``init_llm``.
+
+    Returns
+    -------
+    RAGPipeline
+        A compiled pipeline that is safe to share between sessions.
+    """
+    llm = llm or _llm_provider or _default_llm()
+    key = (_llm_key(llm), k)
+    pipeline = _pipelines.get(key)
+    if pipeline is None:
+        with _pipelines_lock:
+            pipeline = _pipelines.get(key)
+            if pipeline is None:
+                pipeline = RAGPipeline(k=k, llm=llm)
+                _pipelines[key] = pipeline
+                get_logger(__name__).info(
+                    "RAG pipeline compiled and registered",
+                    extra={"llm": f"{type(llm).__name__}:{_model_name(llm)}", "k": k},
+                )
+    return pipeline
@@ -5,16 +5,37 @@ pipeline.retriever
 
 Implements the retrieval stage of the RAG pipeline: generates an embedding for
 the query and retrieves the top-k most similar document chunks from the vectorstore.
+In "hybrid" mode the vector ranking is fused with a Portuguese full-text ranking
+(reciprocal rank fusion) in the same SQL round trip. ``retrieve_many`` searches
+several query variants at once (one embeddings request, one SQL statement) and
+fuses their rankings; in "hybrid" mode each variant gets its own hybrid ranking
+before the fusion.
+
+Both paths end with the post-retrieval stage (``postprocess.select_passages``):
+adjacent chunks of the same source in an oversampled candidate set are stitched
+together, then the passages are reduced to k by maximal marginal relevance.
 """
 
-from typing import List, Dict, Any
+import asyncio
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
 
-from app.agents.health_plan_agent.tools.rag.embedding.embedder import generate_embedding
-from app.agents.health_plan_agent.tools.rag.vectorstore.vector_store import VectorStore
+from app.agents.health_plan_agent.tools.rag.embedding.embedder import (
+    agenerate_embedding,
+    agenerate_embeddings,
+    generate_embedding,
+    generate_embeddings,
+)
+from app.agents.health_plan_agent.tools.rag.pipeline.postprocess import reciprocal_rank_fusion, select_passages
+from app.agents.health_plan_agent.tools.rag.vectorstore.vector_store import QUERY_COLUMNS, get_vector_store
 from app.agents.health_plan_agent.tools.rag.utils.logger import get_logger
+from app.config import HNSW_EF_SEARCH, MMR_OVERSAMPLE, RETRIEVAL_MODE
 
 logger = get_logger(__name__)
 
+RETRIEVAL_MODES = ("vector", "hybrid")
+
 
 class Retriever:
     """
@@ -24,9 +45,30 @@ class Retriever:
     """
 
     def __init__(self) -> None:
-        self.vector_store = VectorStore()
+        self.vector_store = get_vector_store()
+
+    @staticmethod
+    def _candidates(k: int) -> Tuple[int, Optional[Tuple[str, ...]]]:
+        # Oversample (with embeddings, needed by MMR) when diversification is enabled
+        if MMR_OVERSAMPLE > 1:
+            return k * MMR_OVERSAMPLE, QUERY_COLUMNS
+        return k, None
 
-    def retrieve(self, query: str, k: int = 2) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _resolve_mode(mode: Optional[str]) -> str:
+        mode = (mode or RETRIEVAL_MODE).lower()
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode '{mode}'; expected one of {RETRIEVAL_MODES}")
+        return mode
+
+    def retrieve(
+        self,
+        query: str,
+        k: int = 2,
+        mode: Optional[str] = None,
+        ef_search: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
         """
         Generate an embedding for the query and retrieve the top-k similar documents.
 
@@ -36,13 +78,37 @@ class Retriever:
             The input text query.
         k : int, optional
             Number of similar documents to retrieve (default is 2).
+        mode : Optional[str]
+            "vector" (pgvector only) or "hybrid" (full-text + vector with RRF);
+            defaults to ``RETRIEVAL_MODE`` from config.
+        ef_search : Optional[int]
+            HNSW candidate list size for this query, applied with
+            ``SET LOCAL hnsw.ef_search``; defaults to ``HNSW_EF_SEARCH`` from config.
+            Higher values raise recall at the cost of latency.
+        filters : Optional[Dict[str, Any]]
+            Metadata filters restricting the search, e.g. a plan document
+            (``{"file_name": "plano_ouro.pdf"}``), ``{"type": "table"}`` or a page
+            range (``{"page_from": 3, "page_to": 8}``). See ``VectorStore.query_similar``.
 
         Returns
         -------
         List[Dict[str, Any]]
-            A list of dicts, each containing keys: 'id', 'content', 'metadata', 'distance'.
+            At most k passages, each containing keys: 'id', 'content', 'metadata'
+            and 'distance' (vector mode) or 'score' (hybrid mode). Stitched
+            passages list their chunks in metadata['chunk_indices'].
         """
-        logger.info("Starting retrieval", extra={"query_length": len(query), "k": k})
+        mode = self._resolve_mode(mode)
+        ef_search = ef_search or HNSW_EF_SEARCH
+        logger.info(
+            "Starting retrieval",
+            extra={
+                "query_length": len(query),
+                "k": k,
+                "mode": mode,
+                "ef_search": ef_search,
+                "filters": filters,
+            },
+        )
         try:
             vector = generate_embedding(query)
         except Exception as e:
@@ -53,6 +119,184 @@ class Retriever:
             logger.warning("Empty embedding vector returned; no retrieval performed")
             return []
 
-        results = self.vector_store.query_similar(vector, k)
+        depth, columns = self._candidates(k)
+        if mode == "hybrid":
+            candidates = self.vector_store.query_hybrid(
+                query, vector, depth, ef_search=ef_search, filters=filters, columns=columns
+            )
+        else:
+            candidates = self.vector_store.query_similar(
+                vector, depth, columns=columns, ef_search=ef_search, filters=filters
+            )
+        results = select_passages(vector, candidates, k)
+        logger.info("Retrieval completed", extra={"candidates": len(candidates), "results_count": len(results)})
+        return results
+
+    async def aretrieve(
+        self,
+        query: str,
+        k: int = 2,
+        mode: Optional[str] = None,
+        ef_search: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Async counterpart of ``retrieve``: async embedding call and asyncpg search.
+
+        Parameters
+        ----------
+        query : str
+            The input text query.
+        k : int, optional
+            Number of similar documents to retrieve (default is 2).
+        mode : Optional[str]
+            "vector" or "hybrid"; defaults to ``RETRIEVAL_MODE`` from config.
+        ef_search : Optional[int]
+            HNSW candidate list size (see ``retrieve``).
+        filters : Optional[Dict[str, Any]]
+            Metadata filters (see ``retrieve``).
+
+        Returns
+        -------
+        List[Dict[str, Any]]
+            Same shape as ``retrieve``.
+        """
+        mode = self._resolve_mode(mode)
+        ef_search = ef_search or HNSW_EF_SEARCH
+        logger.info(
+            "Starting async retrieval",
+            extra={
+                "query_length": len(query),
+                "k": k,
+                "mode": mode,
+                "ef_search": ef_search,
+                "filters": filters,
+            },
+        )
+        try:
+            vector = await agenerate_embedding(query)
+        except Exception as e:
+            logger.error("Failed to generate embedding for retrieval", extra={"error": str(e)})
+            raise
+
+        if not vector:
+            logger.warning("Empty embedding vector returned; no retrieval performed")
+            return []
+
+        depth, columns = self._candidates(k)
+        if mode == "hybrid":
+            candidates = await self.vector_store.aquery_hybrid(
+                query, vector, depth, ef_search=ef_search, filters=filters, columns=columns
+            )
+        else:
+            candidates = await self.vector_store.aquery_similar(
+                vector, depth, columns=columns, ef_search=ef_search, filters=filters
+            )
+        results = select_passages(vector, candidates, k)
+        logger.info("Retrieval completed", extra={"candidates": len(candidates), "results_count": len(results)})
+        return results
+
+    def retrieve_many(
+        self,
+        queries: List[str],
+        k: int = 2,
+        mode: Optional[str] = None,
+        ef_search: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Multi-query retrieval: embed all query variants in one batched request,
+        run every top-k search in one SQL statement and fuse the rankings (RRF).
+        In "hybrid" mode each variant runs its own hybrid search (full-text +
+        vector, one round trip per variant) and those rankings are fused instead.
+
+        Parameters
+        ----------
+        queries : List[str]
+            Query variants (e.g. rewrites of the same question).
+        k : int, optional
+            Number of passages to return; each variant retrieves the same
+            (oversampled) candidate depth as ``retrieve``.
+        mode : Optional[str]
+            "vector" or "hybrid"; defaults to ``RETRIEVAL_MODE`` from config.
+        ef_search : Optional[int]
+            HNSW candidate list size (see ``retrieve``).
+        filters : Optional[Dict[str, Any]]
+            Metadata filters (see ``retrieve``).
+
+        Returns
+        -------
+        List[Dict[str, Any]]
+            At most k deduplicated passages with 'id', 'content', 'metadata',
+            'distance' (best across variants) and the fused 'score'.
+        """
+        queries = list(dict.fromkeys(q for q in queries if q))
+        mode = self._resolve_mode(mode)
+        ef_search = ef_search or HNSW_EF_SEARCH
+        logger.info("Starting multi-query retrieval", extra={"queries": len(queries), "k": k, "mode": mode})
+        try:
+            variants = [(q, v) for q, v in zip(queries, generate_embeddings(queries)) if v]
+        except Exception as e:
+            logger.error("Failed to generate embeddings for retrieval", extra={"error": str(e)})
+            raise
+
+        if not variants:
+            logger.warning("Empty embedding vectors returned; no retrieval performed")
+            return []
+
+        vectors = [v for _, v in variants]
+        depth, columns = self._candidates(k)
+        if mode == "hybrid":
+            rankings = [
+                self.vector_store.query_hybrid(q, v, depth, ef_search=ef_search, filters=filters, columns=columns)
+                for q, v in variants
+            ]
+        else:
+            rankings = self.vector_store.query_similar_many(
+                vectors, depth, columns=columns, ef_search=ef_search, filters=filters
+            )
+        # The centroid of the variants stands in for the query in the MMR relevance term
+        results = select_passages(np.mean(vectors, axis=0), reciprocal_rank_fusion(rankings, depth), k)
+        logger.info("Retrieval completed", extra={"results_count": len(results)})
+        return results
+
+    async def aretrieve_many(
+        self,
+        queries: List[str],
+        k: int = 2,
+        mode: Optional[str] = None,
+        ef_search: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Async counterpart of ``retrieve_many``; the hybrid searches of the
+        variants run concurrently.
+        """
+        queries = list(dict.fromkeys(q for q in queries if q))
+        mode = self._resolve_mode(mode)
+        ef_search = ef_search or HNSW_EF_SEARCH
+        logger.info("Starting async multi-query retrieval", extra={"queries": len(queries), "k": k, "mode": mode})
+        try:
+            variants = [(q, v) for q, v in zip(queries, await agenerate_embeddings(queries)) if v]
+        except Exception as e:
+            logger.error("Failed to generate embeddings for retrieval", extra={"error": str(e)})
+            raise
+
+        if not variants:
+            logger.warning("Empty embedding vectors returned; no retrieval performed")
+            return []
+
+        vectors = [v for _, v in variants]
+        depth, columns = self._candidates(k)
+        if mode == "hybrid":
+            rankings = await asyncio.gather(*(
+                self.vector_store.aquery_hybrid(q, v, depth, ef_search=ef_search, filters=filters, columns=columns)
+                for q, v in variants
+            ))
+        else:
+            rankings = await self.vector_store.aquery_similar_many(
+                vectors, depth, columns=columns, ef_search=ef_search, filters=filters
+            )
+        results = select_passages(np.mean(vectors, axis=0), reciprocal_rank_fusion(rankings, depth), k)
         logger.info("Retrieval completed", extra={"results_count": len(results)})
         return results
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+scripts/bench_pdf_tables.py
+
+Comparação de tempo da extração de tabelas de um PDF de amostra:
+
+1. tabula página a página (uma execução da JVM por página, comportamento anterior
+   do ``load_pdf``).
+2. tabula em uma única chamada para o documento inteiro.
+3. tabula em faixas de PDF_PAGES_PER_TASK páginas (o que cada tarefa do pool de
+   extração executa).
+4. PyMuPDF ``page.find_tables`` (motor "pymupdf", sem Java).
+
+Para cada modo são exibidos o tempo total e o número de tabelas encontradas.
+
+Exemplo:
+    python -m app.agents.health_plan_agent.tools.rag.scripts.bench_pdf_tables data/manual_beneficiario.pdf
+"""
+
+import argparse
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import fitz
+import tabula
+
+from app.config import PDF_PAGES_PER_TASK
+from app.agents.health_plan_agent.tools.rag.ingestion.pdf_loader import extract_tables
+
+
+def _per_page(path: Path, total: int) -> Dict[int, List[str]]:
+    tables: Dict[int, List[str]] = {}
+    for pno in range(total):
+        results = tabula.read_pdf(str(path), pages=pno + 1, multiple_tables=True, output_format="json")
+        if results:
+            tables[pno] = [str(len(table.get("data", []))) for table in results]
+    return tables
+
+
+def _in_ranges(doc, path: Path, total: int, size: int) -> Dict[int, List[str]]:
+    tables: Dict[int, List[str]] = {}
+    for start in range(0, total, max(size, 1)):
+        tables.update(extract_tables(doc, path, start, min(start + size, total), engine="tabula"))
+    return tables
+
+
+def _run(label: str, fn: Callable[[], Dict[int, List[str]]]) -> None:
+    start = time.perf_counter()
+    tables = fn()
+    elapsed = time.perf_counter() - start
+    count = sum(len(texts) for texts in tables.values())
+    print(f"{label:<36}{elapsed:>12.2f}{count:>10}{len(tables):>10}")
+
+
+def main() -> None:
+    """
+    Ponto de entrada do benchmark.
+    """
+    parser = argparse.ArgumentParser(description="Tempo de extração de tabelas por motor (tabula x PyMuPDF)")
+    parser.add_argument("pdf", type=Path, help="PDF de amostra")
+    parser.add_argument("--pages-per-task", type=int, default=PDF_PAGES_PER_TASK, help="Tamanho das faixas")
+    parser.add_argument("--skip-per-page", action="store_true", help="Pula o modo página a página (lento)")
+    args = parser.parse_args()
+
+    path = args.pdf.expanduser().resolve()
+    with fitz.open(str(path)) as doc:
+        total = doc.page_count
+        print(f"{path.name}: {total} páginas")
+        print(f"{'modo':<36}{'tempo (s)':>12}{'tabelas':>10}{'páginas':>10}")
+        if not args.skip_per_page:
+            _run("tabula por página", lambda: _per_page(path, total))
+        _run("tabula, documento inteiro", lambda: extract_tables(doc, path, 0, total, engine="tabula"))
+        _run(
+            f"tabula, faixas de {args.pages_per_task}",
+            lambda: _in_ranges(doc, path, total, args.pages_per_task),
+        )
+        _run("pymupdf find_tables", lambda: extract_tables(doc, path, 0, total, engine="pymupdf"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+scripts/bench_pipeline_setup.py
+
+Benchmark do overhead de preparação do pipeline RAG por consulta:
+compara construir um ``RAGPipeline()`` a cada pergunta (comportamento antigo de
+``agent_plano.run_rag_fn``) com obter a instância compartilhada via ``get_pipeline``.
+
+Usa um LLM falso, portanto mede apenas o custo de setup (chains, Retriever,
+CallbackManager e compilação do StateGraph), sem chamadas de rede.
+
+Exemplo:
+    python -m app.agents.health_plan_agent.tools.rag.scripts.bench_pipeline_setup -n 200
+"""
+
+import argparse
+import statistics
+import time
+from typing import Callable, Dict, List
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from app.agents.health_plan_agent.tools.rag.pipeline.rag_pipeline import RAGPipeline, get_pipeline
+
+
+def _measure(fn: Callable[[], object], iterations: int) -> Dict[str, float]:
+    samples: List[float] = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "p50_ms": statistics.median(samples),
+        "p95_ms": samples[int(0.95 * (len(samples) - 1))],
+        "mean_ms": statistics.fmean(samples),
+    }
+
+
+def main() -> None:
+    """
+    Ponto de entrada do benchmark.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark do setup do RAGPipeline por consulta")
+    parser.add_argument("-n", "--iterations", type=int, default=100, help="Número de consultas simuladas")
+    parser.add_argument("-k", "--top_k", type=int, default=2, help="Valor de k do pipeline")
+    args = parser.parse_args()
+
+    llm = FakeListChatModel(responses=["ok"])
+
+    before = _measure(lambda: RAGPipeline(k=args.top_k, llm=llm), args.iterations)
+    get_pipeline(k=args.top_k, llm=llm)  # primeira chamada compila e registra
+    after = _measure(lambda: get_pipeline(k=args.top_k, llm=llm), args.iterations)
+
+    print(f"{'modo':<28}{'p50 (ms)':>12}{'p95 (ms)':>12}{'média (ms)':>12}")
+    for label, result in (("RAGPipeline() por consulta", before), ("get_pipeline() registro", after)):
+        print(f"{label:<28}{result['p50_ms']:>12.3f}{result['p95_ms']:>12.3f}{result['mean_ms']:>12.3f}")
+    print(f"Economia no p50 por consulta: {before['p50_ms'] - after['p50_ms']:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
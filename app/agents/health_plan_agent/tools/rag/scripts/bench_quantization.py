@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+scripts/bench_quantization.py
+
+Benchmark das quantizações do índice HNSW (``none``, ``halfvec`` e ``binary``).
+
+Para cada modo, garante o índice correspondente (criando-o se necessário),
+reporta seu tamanho em disco (``pg_relation_size``, que aproxima a memória que o
+índice ocupa no shared_buffers) e mede latência p50/p95 e recall@k da busca
+usada por ``VectorStore.query_similar``: varredura no índice do modo e, nos
+modos quantizados, reordenação de k * QUANTIZED_OVERSAMPLE candidatos pela
+distância exata. O gabarito é a busca exata (varredura sequencial).
+
+Os índices criados pelo benchmark são removidos ao final (exceto com ``--keep``),
+deixando apenas o índice de VECTOR_QUANTIZATION que o ``init_db`` mantém.
+
+Exemplo:
+    python -m app.agents.health_plan_agent.tools.rag.scripts.bench_quantization -n 200 -k 5 --ef 40
+"""
+
+import argparse
+import statistics
+import time
+from typing import Dict, List, Set
+
+import numpy as np
+from sqlalchemy import text
+
+from app.config import QUANTIZED_OVERSAMPLE, VECTOR_QUANTIZATION
+from app.agents.health_plan_agent.tools.rag.scripts.sweep_hnsw import _exact_ids, _sample_vectors
+from app.agents.health_plan_agent.tools.rag.vectorstore.db import (
+    QUANTIZATIONS,
+    _index_exists,
+    create_hnsw_index,
+    engine,
+)
+from app.agents.health_plan_agent.tools.rag.vectorstore.vector_store import VectorStore, _similarity_sql
+
+
+def _index_size(name: str) -> int:
+    with engine.connect() as conn:
+        return int(conn.execute(text("SELECT pg_relation_size(CAST(:name AS regclass))"), {"name": name}).scalar_one())
+
+
+def bench_mode(
+    store: VectorStore, mode: str, vectors: List[np.ndarray], truth: List[Set[str]], k: int, ef_search: int
+) -> Dict[str, float]:
+    """
+    Mede latência e recall@k da busca de *mode*.
+    """
+    sql = _similarity_sql(("id",), "%(vector)b", "%(k)s", quantization=mode)
+    depth = k * (QUANTIZED_OVERSAMPLE if mode != "none" else 1)
+    setup = [f"SET LOCAL hnsw.ef_search = {max(ef_search, depth)}"]
+    for vector in vectors[:5]:  # aquecimento do pool e dos prepared statements
+        store._fetch_prepared(sql, {"vector": vector, "k": k}, setup)
+
+    latencies: List[float] = []
+    recalls: List[float] = []
+    for vector, expected in zip(vectors, truth):
+        start = time.perf_counter()
+        rows = store._fetch_prepared(sql, {"vector": vector, "k": k}, setup)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if expected:
+            recalls.append(len(expected & {row["id"] for row in rows}) / len(expected))
+    latencies.sort()
+    return {
+        "recall": statistics.fmean(recalls) if recalls else 0.0,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))],
+    }
+
+
+def main() -> None:
+    """
+    Ponto de entrada do benchmark.
+    """
+    parser = argparse.ArgumentParser(description="Memória × latência × recall das quantizações do índice HNSW")
+    parser.add_argument("-n", "--queries", type=int, default=100, help="Número de embeddings sorteados da tabela")
+    parser.add_argument("-k", "--top_k", type=int, default=5, help="Número de documentos por consulta")
+    parser.add_argument("--ef", type=int, default=40, help="hnsw.ef_search (mínimo: profundidade da busca)")
+    parser.add_argument(
+        "--modes", nargs="+", choices=list(QUANTIZATIONS), default=list(QUANTIZATIONS), help="Modos avaliados"
+    )
+    parser.add_argument("--keep", action="store_true", help="Mantém os índices criados pelo benchmark")
+    args = parser.parse_args()
+
+    vectors = _sample_vectors(args.queries)
+    if not vectors:
+        print("Nenhuma consulta disponível (tabela docs vazia?)")
+        return
+
+    created: List[str] = []
+    for mode in args.modes:
+        name = QUANTIZATIONS[mode][0]
+        with engine.begin() as conn:
+            if not _index_exists(conn, name):
+                print(f"Criando índice {name}...")
+                created.append(create_hnsw_index(conn, mode))
+
+    try:
+        store = VectorStore()
+        truth = [_exact_ids(v, args.top_k) for v in vectors]
+        print(
+            f"{len(vectors)} consultas, k={args.top_k}, ef_search={args.ef}, "
+            f"sobreamostragem={QUANTIZED_OVERSAMPLE} (modo configurado: {VECTOR_QUANTIZATION})"
+        )
+        print(f"{'modo':<10}{'índice (MB)':>14}{'recall@k':>12}{'p50 (ms)':>12}{'p95 (ms)':>12}")
+        for mode in args.modes:
+            size_mb = _index_size(QUANTIZATIONS[mode][0]) / 2**20
+            row = bench_mode(store, mode, vectors, truth, args.top_k, args.ef)
+            print(f"{mode:<10}{size_mb:>14.1f}{row['recall']:>12.4f}{row['p50_ms']:>12.3f}{row['p95_ms']:>12.3f}")
+    finally:
+        if not args.keep:
+            with engine.begin() as conn:
+                for name in created:
+                    conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+if __name__ == "__main__":
+    main()
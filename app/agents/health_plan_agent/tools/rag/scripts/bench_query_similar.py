@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+scripts/bench_query_similar.py
+
+Micro-benchmark da consulta de similaridade:
+
+1. Custo de CPU no cliente para codificar o vetor da consulta em texto
+   (formato antigo, lista Python → '[0.1,0.2,...]') versus binário
+   (numpy float32 → formato binário do pgvector).
+2. Com um banco acessível via DATABASE_URL, compara a consulta antiga
+   (psycopg2, vetor em texto enviado duas vezes e sem prepared statement) com
+   ``VectorStore.query_similar`` (psycopg 3, vetor binário enviado uma vez e
+   statement preparado), reportando latência p50/p95 e CPU do cliente por consulta.
+
+Exemplo:
+    python -m app.agents.health_plan_agent.tools.rag.scripts.bench_query_similar -n 200 --db
+"""
+
+import argparse
+import random
+import statistics
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+from pgvector import Vector
+from sqlalchemy import text
+
+from app.config import EMBEDDING_DIM
+
+
+_LEGACY_SQL = text(
+    "SELECT id, content, metadata, embedding <-> CAST(:vector AS vector) AS distance "
+    "FROM docs ORDER BY embedding <-> CAST(:vector AS vector) LIMIT :k"
+)
+
+
+def _measure(fn: Callable[[], object], iterations: int) -> Dict[str, float]:
+    samples: List[float] = []
+    cpu_start = time.process_time()
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    cpu_ms = (time.process_time() - cpu_start) * 1000 / iterations
+    samples.sort()
+    return {
+        "p50_ms": statistics.median(samples),
+        "p95_ms": samples[int(0.95 * (len(samples) - 1))],
+        "cpu_ms": cpu_ms,
+    }
+
+
+def _print(rows: Dict[str, Dict[str, float]]) -> None:
+    print(f"{'modo':<34}{'p50 (ms)':>12}{'p95 (ms)':>12}{'CPU/consulta (ms)':>20}")
+    for label, result in rows.items():
+        print(f"{label:<34}{result['p50_ms']:>12.4f}{result['p95_ms']:>12.4f}{result['cpu_ms']:>20.4f}")
+
+
+def bench_encoding(iterations: int, dim: int) -> None:
+    """
+    Compara a serialização texto vs. binária do vetor da consulta.
+    """
+    as_list = [random.uniform(-1, 1) for _ in range(dim)]
+    as_array = np.asarray(as_list, dtype=np.float32)
+    text_size = len(Vector._to_db(as_list))
+    binary_size = len(Vector._to_db_binary(as_array))
+
+    print(f"Codificação do vetor (dim={dim}): texto {text_size} bytes, binário {binary_size} bytes")
+    _print({
+        "texto (lista → str)": _measure(lambda: Vector._to_db(as_list), iterations),
+        "binário (ndarray → bytes)": _measure(lambda: Vector._to_db_binary(as_array), iterations),
+    })
+
+
+def bench_database(iterations: int, dim: int, k: int) -> None:
+    """
+    Compara a consulta antiga (psycopg2) com ``VectorStore.query_similar`` num banco real.
+    """
+    from app.agents.health_plan_agent.tools.rag.vectorstore.db import engine
+    from app.agents.health_plan_agent.tools.rag.vectorstore.vector_store import VectorStore
+
+    store = VectorStore()
+    vector = [random.uniform(-1, 1) for _ in range(dim)]
+
+    def legacy() -> None:
+        with engine.connect() as conn:
+            conn.execute(_LEGACY_SQL, {"vector": vector, "k": k}).mappings().all()
+
+    # Aquecimento: abre as conexões dos pools e prepara o statement no servidor
+    for _ in range(10):
+        legacy()
+        store.query_similar(vector, k=k)
+
+    print(f"\nConsulta no banco (k={k})")
+    _print({
+        "psycopg2, texto, sem prepare": _measure(legacy, iterations),
+        "psycopg 3, binário, prepare": _measure(lambda: store.query_similar(vector, k=k), iterations),
+    })
+
+
+def main() -> None:
+    """
+    Ponto de entrada do benchmark.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark de query_similar (texto vs. binário)")
+    parser.add_argument("-n", "--iterations", type=int, default=200, help="Número de repetições")
+    parser.add_argument("-k", "--top_k", type=int, default=5, help="Número de documentos por consulta")
+    parser.add_argument("--db", action="store_true", help="Também mede as consultas no banco (DATABASE_URL)")
+    args = parser.parse_args()
+
+    bench_encoding(args.iterations, EMBEDDING_DIM)
+    if args.db:
+        bench_database(args.iterations, EMBEDDING_DIM, args.top_k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+scripts/bench_upsert.py
+
+Benchmark de gravação na tabela ``docs`` (requer DATABASE_URL e ``init_db``):
+
+1. Upsert linha a linha (``VectorStore.add_document``: um INSERT ... ON CONFLICT
+   e um commit por chunk) sobre uma amostra dos documentos.
+2. ``VectorStore.add_documents``: COPY binário para a tabela temporária e um
+   upsert por lote, para cada tamanho de lote informado.
+3. Reexecução do caminho em lote com os mesmos dados (linhas inalteradas não
+   são regravadas).
+
+Os documentos são sintéticos (vetores aleatórios normalizados, ids com prefixo
+``bench_upsert/``) e são removidos ao final.
+
+Exemplo:
+    python -m app.agents.health_plan_agent.tools.rag.scripts.bench_upsert -n 5000 --batch-sizes 500 1000 5000
+"""
+
+import argparse
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+from sqlalchemy import text
+
+from app.config import EMBEDDING_DIM
+from app.agents.health_plan_agent.tools.rag.vectorstore.db import engine
+from app.agents.health_plan_agent.tools.rag.vectorstore.vector_store import VectorStore
+
+_PREFIX = "bench_upsert/"
+
+
+def _synthetic_docs(n: int, dim: int) -> List[Dict[str, Any]]:
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((n, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return [
+        {
+            "content": f"Trecho sintético {i} sobre carência, cobertura e reembolso do plano.",
+            "metadata": {"path": f"{_PREFIX}doc_{i // 20}.pdf", "chunk_index": i % 20, "page_number": 1},
+            "embedding": vectors[i],
+        }
+        for i in range(n)
+    ]
+
+
+def _cleanup() -> None:
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM docs WHERE id LIKE :prefix"), {"prefix": f"{_PREFIX}%"})
+
+
+def _rate(rows: int, seconds: float) -> str:
+    return f"{rows:>8}{seconds:>12.3f}{rows / seconds if seconds else 0.0:>14.0f}"
+
+
+def main() -> None:
+    """
+    Ponto de entrada do benchmark.
+    """
+    parser = argparse.ArgumentParser(description="Throughput (linhas/s) do upsert na tabela docs")
+    parser.add_argument("-n", "--rows", type=int, default=5000, help="Número de chunks sintéticos")
+    parser.add_argument("--row-by-row", type=int, default=500, help="Chunks gravados com add_document (0 = pula)")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1000], help="Tamanhos de lote avaliados")
+    args = parser.parse_args()
+
+    store = VectorStore()
+    docs = _synthetic_docs(args.rows, EMBEDDING_DIM)
+    print(f"{'modo':<36}{'linhas':>8}{'tempo (s)':>12}{'linhas/s':>14}")
+    try:
+        _cleanup()
+        if args.row_by_row:
+            sample = docs[:args.row_by_row]
+            start = time.perf_counter()
+            for doc in sample:
+                store.add_document(doc)
+            print(f"{'add_document (linha a linha)':<36}{_rate(len(sample), time.perf_counter() - start)}")
+            _cleanup()
+
+        for batch_size in args.batch_sizes:
+            start = time.perf_counter()
+            store.add_documents(docs, batch_size=batch_size)
+            print(f"{f'add_documents (lote {batch_size})':<36}{_rate(len(docs), time.perf_counter() - start)}")
+            start = time.perf_counter()
+            store.add_documents(docs, batch_size=batch_size)
+            print(f"{'  reexecução, dados inalterados':<36}{_rate(len(docs), time.perf_counter() - start)}")
+            _cleanup()
+    finally:
+        _cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,31 +3,78 @@
 """
 ingestion.cli
 
-CLI entrypoint to execute the full multimodal ingestion pipeline:
-1. Load raw documents (including PDF detection)
-2. Extract multimodal items from PDFs
-3. Clean and normalize text
+CLI entrypoint to execute the full multimodal ingestion pipeline. Steps 1-6 are
+streamed: each stage is a generator, stages run on their own threads connected
+by bounded queues (INGEST_QUEUE_SIZE) and chunks are embedded and upserted in
+batches of UPSERT_BATCH_SIZE, so peak memory does not grow with the corpus.
+The peak RSS is logged at the end of the run.
+
+0. Compare DATA_DIR with the ingestion manifest (unchanged files are skipped)
+1. Discover new/changed files lazily (stat-only descriptors; each format is
+   read by the stage that parses it)
+2. Extract multimodal items from PDFs (optionally across a process pool, PDFs
+   and page ranges of large PDFs in parallel, output kept in input order);
+   images are written once to the content-addressed image store and only their
+   references flow downstream. Optionally caption the images with the LLM
+   (one call per distinct image) so the captions are indexed as text
+3. Clean and normalize text (image items without caption are dropped)
 4. Chunk documents into controlled-size pieces
-5. Generate embeddings for each chunk
-6. Upsert embeddings into Postgres+pgvector VectorStore
+5. Generate embeddings in token-capped batches sent concurrently
+6. Upsert embeddings into Postgres+pgvector VectorStore, deleting the stale
+   chunks of each changed file once its chunks are written, and of deleted
+   files; record the files in the manifest (files that produced no chunks keep
+   their old rows and are retried on the next run)
+7. Bump the corpus version (invalidates the semantic answer cache)
+8. Optionally export the docs table to a memory-mapped vector index
 """
 
 import argparse
+from collections import Counter
 from pathlib import Path
-from typing import Optional, List, Dict, Any
-
-from app.agents.health_plan_agent.tools.rag.ingestion.loader import load_documents
-from app.agents.health_plan_agent.tools.rag.ingestion.pdf_loader import load_pdf
-from app.agents.health_plan_agent.tools.rag.ingestion.cleaner import clean_documents
-from app.agents.health_plan_agent.tools.rag.ingestion.chunker import chunk_documents
-from app.agents.health_plan_agent.tools.rag.embedding.embedder import generate_embedding
+from typing import Optional, List, Dict, Any, Iterable, Iterator
+
+from app.config import IMAGE_CAPTIONING, PDF_WORKERS, UPSERT_BATCH_SIZE, settings
+from app.agents.health_plan_agent.tools.rag.ingestion.loader import iter_documents
+from app.agents.health_plan_agent.tools.rag.ingestion.pdf_loader import extract_items
+from app.agents.health_plan_agent.tools.rag.ingestion.captioner import caption_images
+from app.agents.health_plan_agent.tools.rag.ingestion.cleaner import iter_clean_documents
+from app.agents.health_plan_agent.tools.rag.ingestion.chunker import iter_chunks
+from app.agents.health_plan_agent.tools.rag.ingestion.manifest import (
+    forget_paths,
+    plan_ingestion,
+    record_ingested,
+)
+from app.agents.health_plan_agent.tools.rag.ingestion.streaming import batched, peak_rss_mb, prefetch
+from app.agents.health_plan_agent.tools.rag.embedding.embedder import generate_embeddings
 from app.agents.health_plan_agent.tools.rag.vectorstore.vector_store import VectorStore
+from app.agents.health_plan_agent.tools.rag.vectorstore.db import bump_corpus_version
+from app.agents.health_plan_agent.tools.rag.vectorstore.mmap_store import export_from_postgres
 from app.agents.health_plan_agent.tools.rag.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
 
-def run_ingestion(data_dir: Optional[str] = None) -> None:
+def _embed_batches(batches: Iterable[List[Dict[str, Any]]]) -> Iterator[List[Dict[str, Any]]]:
+    # One generate_embeddings call per batch (token-capped requests sent in parallel)
+    for batch in batches:
+        embeddings = generate_embeddings([doc["content"] for doc in batch])
+        yield [
+            {
+                "content": doc["content"],
+                "metadata": doc["metadata"],
+                "embedding": emb
+            }
+            for doc, emb in zip(batch, embeddings)
+        ]
+
+
+def run_ingestion(
+    data_dir: Optional[str] = None,
+    export_mmap_dir: Optional[str] = None,
+    full: bool = False,
+    workers: int = PDF_WORKERS,
+    captions: bool = IMAGE_CAPTIONING,
+) -> None:
     """
     Execute o pipeline completo de ingestão multimodal.
 
@@ -35,51 +82,98 @@ def run_ingestion(data_dir: Optional[str] = None) -> None:
     ----------
     data_dir : Optional[str]
         Diretório base de onde carregar documentos. Se None, usa configuração em .env.
+    export_mmap_dir : Optional[str]
+        Se informado, exporta a tabela docs para um índice mmap nesse diretório
+        (backend VECTOR_BACKEND=mmap).
+    full : bool
+        Reprocessa todos os arquivos, ignorando o manifesto de ingestão.
+    workers : int
+        Processos usados na extração dos PDFs (1 = serial).
+    captions : bool
+        Gera legendas das imagens com o LLM e as indexa como texto.
     """
-    logger.info("Iniciando pipeline de ingestão multimodal", extra={"data_dir": data_dir})
-
-    # 1. Carregar documentos brutos
-    raw_docs: List[Dict[str, Any]] = load_documents(data_dir)
-    logger.info("Documentos brutos carregados", extra={"count": len(raw_docs)})
-
-    # 2. Extrair itens multimodais de PDFs
-    multimodal_items: List[Dict[str, Any]] = []
-    for doc in raw_docs:
-        path = doc["metadata"].get("path", "")
-        if Path(path).suffix.lower() == ".pdf":
-            multimodal_items.extend(load_pdf(Path(path)))
-        else:
-            multimodal_items.append(doc)
     logger.info(
-        "Itens multimodais preparados",
-        extra={"total_items": len(multimodal_items)}
+        "Iniciando pipeline de ingestão multimodal",
+        extra={"data_dir": data_dir, "full": full, "workers": workers, "captions": captions},
     )
 
-    # 3. Limpeza e normalização
-    cleaned_docs = clean_documents(multimodal_items)
-    logger.info("Documentos limpos e normalizados", extra={"count": len(cleaned_docs)})
-
-    # 4. Chunking de texto
-    chunked_docs = chunk_documents(cleaned_docs)
-    logger.info("Chunking concluído", extra={"total_chunks": len(chunked_docs)})
-
-    # 5. Geração de embeddings
-    docs_with_embeddings: List[Dict[str, Any]] = []
-    for doc in chunked_docs:
-        emb = generate_embedding(doc["content"])
-        docs_with_embeddings.append({
-            "content": doc["content"],
-            "metadata": doc["metadata"],
-            "embedding": emb
-        })
-    logger.info("Embeddings gerados", extra={"count": len(docs_with_embeddings)})
-
-    # 6. Persistir no VectorStore
+    # 0. Plano incremental: apenas arquivos novos/alterados são processados
+    base_dir = Path(data_dir or settings.DATA_DIR).expanduser().resolve()
+    plan = plan_ingestion(base_dir, full=full)
+    if not plan.changed and not plan.deleted:
+        logger.info("Nenhum arquivo novo, alterado ou removido; ingestão concluída sem alterações")
+        return
+    changed_paths = [state.path for state in plan.changed]
+
+    # 1-4. Carregar → extrair itens multimodais → limpar → fragmentar, em streaming:
+    # carga e extração rodam em threads próprias, ligadas por filas limitadas; com
+    # workers > 1 a extração dos PDFs é distribuída num pool de processos
+    raw_docs = prefetch(iter_documents(base_dir, paths=changed_paths, lazy=True), name="ingest-load")
+    items = prefetch(extract_items(raw_docs, workers=workers), name="ingest-extract")
+    if captions:
+        # Legendas em estágio próprio: as chamadas ao LLM não bloqueiam a extração
+        items = prefetch(caption_images(items), name="ingest-caption")
+    chunks = iter_chunks(iter_clean_documents(items))
+
+    # 5. Embeddings por lote; o lote seguinte é embeddado enquanto o anterior é gravado
+    embedded = prefetch(_embed_batches(batched(chunks, UPSERT_BATCH_SIZE)), maxsize=1, name="ingest-embed")
+
+    # 6. Persistir no VectorStore lote a lote e remover chunks antigos de arquivos alterados/removidos
+    # Os chunks chegam agrupados por arquivo: quando um lote passa para o arquivo
+    # seguinte, os chunks antigos do anterior são removidos só com os ids dele, e a
+    # memória não cresce com o corpus. Arquivos sem nenhum chunk (falha de
+    # extração/limpeza) nunca chegam aqui e mantêm as linhas antigas
     vs = VectorStore()
-    vs.add_documents(docs_with_embeddings)
-    logger.info("Embeddings upsertados no VectorStore", extra={"count": len(docs_with_embeddings)})
+    written = deleted = 0
+    open_ids: Dict[str, List[str]] = {}
+    finished = set()  # um arquivo que reaparecer já teve os chunks antigos removidos
+    chunk_counts: Counter = Counter()
+    for batch in embedded:
+        written += vs.add_documents(batch)
+        for doc in batch:
+            path = doc["metadata"].get("path")
+            if path not in finished:
+                open_ids.setdefault(path, []).append(vs.document_id(doc))
+        chunk_counts.update(doc["metadata"].get("path") for doc in batch)
+        current = batch[-1]["metadata"].get("path")
+        for path in [p for p in open_ids if p != current]:
+            deleted += vs.delete_stale([path], open_ids.pop(path))
+            finished.add(path)
+        logger.info(
+            "Lote de chunks gravado",
+            extra={"chunks": sum(chunk_counts.values()), "peak_rss_mb": round(peak_rss_mb(), 1)},
+        )
+    for path, ids in open_ids.items():
+        deleted += vs.delete_stale([path], ids)
+    deleted += vs.delete_stale(plan.deleted, [])
+    logger.info(
+        "Embeddings upsertados no VectorStore",
+        extra={"count": sum(chunk_counts.values()), "written": written, "deleted": deleted},
+    )
 
-    logger.info("Pipeline de ingestão multimodal finalizado com sucesso")
+    # Arquivos sem chunks ficam fora do manifesto, para serem reprocessados na próxima execução
+    ingested = [state for state in plan.changed if chunk_counts[state.path] > 0]
+    skipped = [state.path for state in plan.changed if chunk_counts[state.path] == 0]
+    if skipped:
+        logger.warning(
+            "Arquivos sem chunks não foram registrados no manifesto",
+            extra={"count": len(skipped), "paths": skipped},
+        )
+    record_ingested(ingested, chunk_counts)
+    forget_paths(plan.deleted)
+
+    # 7. Nova versão do corpus invalida respostas em cache
+    bump_corpus_version()
+
+    # 8. Exportação opcional para o índice mmap
+    if export_mmap_dir:
+        exported = export_from_postgres(export_mmap_dir)
+        logger.info("Índice mmap exportado", extra={"dir": export_mmap_dir, "count": exported})
+
+    logger.info(
+        "Pipeline de ingestão multimodal finalizado com sucesso",
+        extra={"peak_rss_mb": round(peak_rss_mb(), 1)},
+    )
 
 
 if __name__ == "__main__":
@@ -92,5 +186,34 @@ if __name__ == "__main__":
         default=None,
         help="Diretório de dados (padrão: configurado em .env)"
     )
+    parser.add_argument(
+        "--export-mmap",
+        type=str,
+        default=None,
+        help="Exporta os vetores para um índice mmap nesse diretório (ex.: data/index)"
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Reprocessa todos os arquivos, ignorando o manifesto de ingestão"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=PDF_WORKERS,
+        help="Processos para extração paralela de PDFs (padrão: PDF_WORKERS, 1 = serial)"
+    )
+    parser.add_argument(
+        "--captions",
+        action=argparse.BooleanOptionalAction,
+        default=IMAGE_CAPTIONING,
+        help="Gera legendas das imagens com o LLM e as indexa; --no-captions desativa (padrão: IMAGE_CAPTIONING)"
+    )
     args = parser.parse_args()
-    run_ingestion(args.data_dir)
+    run_ingestion(
+        args.data_dir,
+        export_mmap_dir=args.export_mmap,
+        full=args.full,
+        workers=args.workers,
+        captions=args.captions,
+    )
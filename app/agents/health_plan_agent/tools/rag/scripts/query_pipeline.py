@@ -9,7 +9,7 @@ instancia o pipeline RAG e imprime a resposta gerada pelo LLM.
 import argparse
 from dotenv import load_dotenv
 
-from app.agents.health_plan_agent.tools.rag.pipeline.rag_pipeline import RAGPipeline
+from app.agents.health_plan_agent.tools.rag.pipeline.rag_pipeline import get_pipeline
 
 
 def main() -> None:
@@ -38,9 +38,9 @@ def main() -> None:
 
     # Determina quantos contextos recuperar
     if args.top_k is not None:
-        pipeline = RAGPipeline(k=args.top_k)
+        pipeline = get_pipeline(k=args.top_k)
     else:
-        pipeline = RAGPipeline()
+        pipeline = get_pipeline()
 
     # Executa o pipeline e imprime a resposta
     answer = pipeline.run(args.query)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+scripts/reembed_docs.py
+
+Job de re-embedding da tabela ``docs`` após mudar EMBEDDING_DIM ou EMBEDDING_MODEL.
+
+1. ``init_db`` migra a coluna ``docs.embedding`` para VECTOR(EMBEDDING_DIM):
+   reduções com modelos text-embedding-3-* são feitas no próprio banco
+   (truncamento + renormalização); nos demais casos os vetores ficam NULL.
+2. Os chunks sem embedding (ou todos, com ``--all``, ex.: troca de modelo) são
+   embeddados em lotes com ``generate_embeddings``, que já pede EMBEDDING_DIM
+   dimensões à API, e atualizados em blocos percorrendo a chave primária.
+3. O índice HNSW é recriado pelo ``init_db`` e a versão do corpus é incrementada
+   (invalida o cache semântico de respostas); opcionalmente o índice mmap é reexportado.
+
+Exemplo:
+    EMBEDDING_DIM=512 python -m app.agents.health_plan_agent.tools.rag.scripts.reembed_docs --batch-size 256
+"""
+
+import argparse
+
+import numpy as np
+from sqlalchemy import text
+
+from app.config import EMBEDDING_DIM, EMBEDDING_MODEL
+from app.agents.health_plan_agent.tools.rag.embedding.embedder import generate_embeddings
+from app.agents.health_plan_agent.tools.rag.vectorstore.db import bump_corpus_version, engine, init_db
+from app.agents.health_plan_agent.tools.rag.vectorstore.mmap_store import export_from_postgres
+from app.agents.health_plan_agent.tools.rag.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def reembed(batch_size: int = 256, reembed_all: bool = False) -> int:
+    """
+    Regera os embeddings dos chunks da tabela docs.
+
+    Parameters
+    ----------
+    batch_size : int
+        Número de chunks por requisição de embeddings e por atualização.
+    reembed_all : bool
+        Regera todos os chunks, não apenas os que estão sem embedding.
+
+    Returns
+    -------
+    int
+        Número de chunks atualizados.
+    """
+    init_db()
+    pending = "" if reembed_all else "AND embedding IS NULL"
+    select = text(f"SELECT id, content FROM docs WHERE id > :after {pending} ORDER BY id LIMIT :limit")
+    update = text("UPDATE docs SET embedding = :embedding WHERE id = :id")
+
+    updated = 0
+    after = ""
+    while True:
+        with engine.connect() as conn:
+            rows = conn.execute(select, {"after": after, "limit": batch_size}).all()
+        if not rows:
+            break
+        vectors = generate_embeddings([row.content for row in rows])
+        params = [
+            {"id": row.id, "embedding": np.asarray(vector, dtype=np.float32)}
+            for row, vector in zip(rows, vectors)
+            if vector
+        ]
+        if params:
+            with engine.begin() as conn:
+                conn.execute(update, params)
+        updated += len(params)
+        after = rows[-1].id
+        logger.info("Lote re-embeddado", extra={"updated": updated, "last_id": after})
+
+    bump_corpus_version()
+    logger.info(
+        "Re-embedding concluído",
+        extra={"updated": updated, "model": EMBEDDING_MODEL, "dim": EMBEDDING_DIM},
+    )
+    return updated
+
+
+def main() -> None:
+    """
+    Ponto de entrada do job.
+    """
+    parser = argparse.ArgumentParser(description="Regera os embeddings da tabela docs (EMBEDDING_MODEL/EMBEDDING_DIM)")
+    parser.add_argument("--batch-size", type=int, default=256, help="Chunks por lote")
+    parser.add_argument("--all", action="store_true", help="Regera todos os chunks (ex.: após trocar o modelo)")
+    parser.add_argument("--export-mmap", default=None, help="Reexporta o índice mmap nesse diretório")
+    args = parser.parse_args()
+
+    updated = reembed(args.batch_size, reembed_all=args.all)
+    print(f"{updated} chunks re-embeddados (modelo={EMBEDDING_MODEL}, dim={EMBEDDING_DIM})")
+    if args.export_mmap:
+        exported = export_from_postgres(args.export_mmap)
+        print(f"Índice mmap exportado: {exported} vetores em {args.export_mmap}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+scripts/sweep_hnsw.py
+
+Varredura recall × latência do índice HNSW em função de ``hnsw.ef_search``.
+
+Para cada consulta, o resultado exato (varredura sequencial, índice desligado)
+é usado como gabarito; em seguida ``VectorStore.query_similar`` é executado com
+cada valor de ef_search e são reportados recall@k médio e latência p50/p95.
+
+As consultas são embeddings sorteados da própria tabela ``docs`` ou, com
+``--questions``, perguntas (uma por linha) embeddadas com o modelo configurado.
+
+Exemplo:
+    python -m app.agents.health_plan_agent.tools.rag.scripts.sweep_hnsw -k 5 --ef 10 20 40 80 160
+"""
+
+import argparse
+import statistics
+import time
+from typing import Dict, List, Set
+
+import numpy as np
+from psycopg.rows import dict_row
+from sqlalchemy import text
+
+from app.config import HNSW_DISTANCE, HNSW_EF_CONSTRUCTION, HNSW_M, VECTOR_QUANTIZATION
+from app.agents.health_plan_agent.tools.rag.vectorstore.db import engine, get_query_engine
+from app.agents.health_plan_agent.tools.rag.vectorstore.vector_store import VectorStore, _similarity_sql
+
+
+def _sample_vectors(n: int) -> List[np.ndarray]:
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text("SELECT embedding FROM docs WHERE embedding IS NOT NULL ORDER BY random() LIMIT :n"),
+            {"n": n},
+        ).all()
+    return [np.asarray(row[0], dtype=np.float32) for row in rows]
+
+
+def _embed_questions(path: str) -> List[np.ndarray]:
+    from app.agents.health_plan_agent.tools.rag.embedding.embedder import generate_embedding
+
+    with open(path, encoding="utf-8") as fh:
+        questions = [line.strip() for line in fh if line.strip()]
+    return [np.asarray(generate_embedding(q), dtype=np.float32) for q in questions]
+
+
+def _exact_ids(vector: np.ndarray, k: int) -> Set[str]:
+    # Gabarito: sem index scan (e sem quantização) o planner ordena por distância exata
+    sql = _similarity_sql(("id",), "%(vector)b", "%(k)s", quantization="none")
+    with get_query_engine().connect() as conn:
+        with conn.connection.driver_connection.cursor(row_factory=dict_row) as cur:
+            cur.execute("SET LOCAL enable_indexscan = off")
+            cur.execute(sql, {"vector": vector, "k": k}, binary=True)
+            return {row["id"] for row in cur.fetchall()}
+
+
+def sweep(vectors: List[np.ndarray], k: int, ef_values: List[int]) -> List[Dict[str, float]]:
+    """
+    Mede recall@k e latência de ``query_similar`` para cada ef_search.
+    """
+    store = VectorStore()
+    truth = [_exact_ids(v, k) for v in vectors]
+    for v in vectors[:5]:  # aquecimento do pool e dos prepared statements
+        store.query_similar(v, k=k, columns=("id",), ef_search=ef_values[0])
+
+    report = []
+    for ef in ef_values:
+        latencies: List[float] = []
+        recalls: List[float] = []
+        for vector, expected in zip(vectors, truth):
+            start = time.perf_counter()
+            rows = store.query_similar(vector, k=k, columns=("id",), ef_search=ef)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if expected:
+                recalls.append(len(expected & {row["id"] for row in rows}) / len(expected))
+        latencies.sort()
+        report.append({
+            "ef_search": ef,
+            "recall": statistics.fmean(recalls) if recalls else 0.0,
+            "p50_ms": statistics.median(latencies),
+            "p95_ms": latencies[int(0.95 * (len(latencies) - 1))],
+        })
+    return report
+
+
+def main() -> None:
+    """
+    Ponto de entrada da varredura.
+    """
+    parser = argparse.ArgumentParser(description="Varredura recall × latência do hnsw.ef_search")
+    parser.add_argument("-n", "--queries", type=int, default=100, help="Número de embeddings sorteados da tabela")
+    parser.add_argument("-k", "--top_k", type=int, default=5, help="Número de documentos por consulta")
+    parser.add_argument("--ef", type=int, nargs="+", default=[10, 20, 40, 80, 160, 320], help="Valores de ef_search")
+    parser.add_argument("--questions", help="Arquivo com perguntas (uma por linha) em vez de embeddings sorteados")
+    args = parser.parse_args()
+
+    vectors = _embed_questions(args.questions) if args.questions else _sample_vectors(args.queries)
+    if not vectors:
+        print("Nenhuma consulta disponível (tabela docs vazia?)")
+        return
+
+    print(
+        f"Índice: distância={HNSW_DISTANCE} quantização={VECTOR_QUANTIZATION} "
+        f"m={HNSW_M} ef_construction={HNSW_EF_CONSTRUCTION} | "
+        f"{len(vectors)} consultas, k={args.top_k}"
+    )
+    print(f"{'ef_search':>10}{'recall@k':>12}{'p50 (ms)':>12}{'p95 (ms)':>12}")
+    for row in sweep(vectors, args.top_k, sorted(args.ef)):
+        print(f"{row['ef_search']:>10}{row['recall']:>12.4f}{row['p50_ms']:>12.3f}{row['p95_ms']:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
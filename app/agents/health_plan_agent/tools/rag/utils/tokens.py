@@ -0,0 +1,49 @@
+"""
+utils/tokens.py
+
+Contagem de tokens com tiktoken, usada no orçamento de contexto do prompt e no
+empacotamento dos lotes de embeddings.
+"""
+from functools import lru_cache
+from typing import Optional
+
+import tiktoken
+
+from app.agents.health_plan_agent.tools.rag.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Encoding usado para modelos que o tiktoken não conhece (ex.: outros provedores)
+_FALLBACK_ENCODING = "o200k_base"
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: Optional[str]) -> Optional[tiktoken.Encoding]:
+    """
+    Retorna o encoding do tiktoken para *model* (``o200k_base`` para modelos
+    desconhecidos) ou None quando os arquivos do tokenizer não podem ser carregados.
+    """
+    try:
+        if model:
+            try:
+                return tiktoken.encoding_for_model(model)
+            except KeyError:
+                pass
+        return tiktoken.get_encoding(_FALLBACK_ENCODING)
+    except Exception as e:
+        # O tiktoken baixa os arquivos BPE no primeiro uso
+        logger.warning(
+            "Tokenizer indisponível; contagem de tokens aproximada",
+            extra={"model": model, "error": str(e)},
+        )
+        return None
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """
+    Número de tokens de *text* para *model*; sem tokenizer, estima ~4 caracteres por token.
+    """
+    encoding = get_encoding(model)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
@@ -1,12 +1,60 @@
 # pipeline/db.py  (ou onde você definiu engine)
 from sqlalchemy import text
-from sqlalchemy import create_engine, event
+from typing import Optional
+
+from sqlalchemy import Engine, create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from pgvector.psycopg2 import register_vector
-from app.config import DATABASE_URL, EMBEDDING_DIM
+from app.config import (
+    DATABASE_URL,
+    EMBEDDING_DIM,
+    EMBEDDING_MODEL,
+    HNSW_DISTANCE,
+    HNSW_EF_CONSTRUCTION,
+    HNSW_M,
+    VECTOR_QUANTIZATION,
+)
 from app.agents.health_plan_agent.tools.rag.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Configuração de busca textual em português com remoção de acentos
+FTS_CONFIG = "pt_unaccent"
+
+# Métrica de distância → (classe de operadores do índice HNSW, operador de distância)
+DISTANCE_METRICS = {
+    "l2": ("vector_l2_ops", "<->"),
+    "ip": ("vector_ip_ops", "<#>"),
+    "cosine": ("vector_cosine_ops", "<=>"),
+}
+if HNSW_DISTANCE not in DISTANCE_METRICS:
+    raise ValueError(f"HNSW_DISTANCE inválido '{HNSW_DISTANCE}'; use um de {tuple(DISTANCE_METRICS)}")
+HNSW_OPCLASS, DISTANCE_OPERATOR = DISTANCE_METRICS[HNSW_DISTANCE]
+
+# Quantização → (nome do índice HNSW, classe de operadores, operador de distância no índice).
+# halfvec mantém a métrica configurada; o binário usa distância de Hamming sobre os sinais.
+QUANTIZATIONS = {
+    "none": ("docs_embedding_hnsw_idx", HNSW_OPCLASS, DISTANCE_OPERATOR),
+    "halfvec": ("docs_embedding_halfvec_hnsw_idx", HNSW_OPCLASS.replace("vector", "halfvec"), DISTANCE_OPERATOR),
+    "binary": ("docs_embedding_binary_hnsw_idx", "bit_hamming_ops", "<~>"),
+}
+if VECTOR_QUANTIZATION not in QUANTIZATIONS:
+    raise ValueError(f"VECTOR_QUANTIZATION inválido '{VECTOR_QUANTIZATION}'; use um de {tuple(QUANTIZATIONS)}")
+HNSW_INDEX = QUANTIZATIONS[VECTOR_QUANTIZATION][0]
+
+
+def quantize_sql(value: str, quantization: str = VECTOR_QUANTIZATION) -> str:
+    """
+    Expressão SQL que quantiza *value* (coluna ou parâmetro do tipo vector)
+    exatamente como a expressão do índice HNSW, para que o planner use o índice.
+    """
+    if quantization == "halfvec":
+        return f"CAST({value} AS halfvec({EMBEDDING_DIM}))"
+    if quantization == "binary":
+        return f"CAST(binary_quantize({value}) AS bit({EMBEDDING_DIM}))"
+    return value
+
 engine = create_engine(DATABASE_URL, echo=False)
 
 @event.listens_for(engine, "connect")
@@ -14,6 +62,57 @@ def _register_vector(dbapi_conn, connection_record):
     # Mapeia automaticamente Python List[float] → pgvector VECTOR
     register_vector(dbapi_conn)
 
+
+_query_engine: Optional[Engine] = None
+
+
+def get_query_engine() -> Engine:
+    """
+    Retorna (criando na primeira chamada) o engine de consultas sobre psycopg 3.
+
+    Diferente do psycopg2, o psycopg 3 faz bind de parâmetros no servidor, aceita
+    parâmetros em formato binário (o vetor vai como float32 no formato binário do
+    pgvector, sem serializar texto) e suporta prepared statements no servidor.
+    """
+    global _query_engine
+    if _query_engine is None:
+        from pgvector.psycopg import register_vector as register_vector_psycopg
+
+        url = make_url(DATABASE_URL).set(drivername="postgresql+psycopg")
+        _query_engine = create_engine(url, echo=False)
+
+        @event.listens_for(_query_engine, "connect")
+        def _register_vector_psycopg(dbapi_conn, connection_record):
+            # Dumpers/loaders binários do pgvector para numpy.ndarray
+            register_vector_psycopg(dbapi_conn)
+
+        logger.info("Engine de consultas (psycopg 3) criado")
+    return _query_engine
+
+
+_async_engine: Optional[AsyncEngine] = None
+
+
+def get_async_engine() -> AsyncEngine:
+    """
+    Retorna (criando na primeira chamada) o engine assíncrono sobre asyncpg.
+    Criado sob demanda para que o caminho síncrono não dependa do asyncpg.
+    """
+    global _async_engine
+    if _async_engine is None:
+        from pgvector.asyncpg import register_vector as register_vector_async
+
+        url = make_url(DATABASE_URL).set(drivername="postgresql+asyncpg")
+        _async_engine = create_async_engine(url, echo=False)
+
+        @event.listens_for(_async_engine.sync_engine, "connect")
+        def _register_vector_async(dbapi_conn, connection_record):
+            # Codec binário do pgvector para o asyncpg
+            dbapi_conn.run_async(register_vector_async)
+
+        logger.info("Engine assíncrono (asyncpg) criado")
+    return _async_engine
+
 def init_db() -> None:
     logger.info("Inicializando schema do vectorstore")
     with engine.begin() as conn:
@@ -26,8 +125,201 @@ def init_db() -> None:
                 embedding VECTOR({EMBEDDING_DIM})
             );
         """))
-        conn.execute(text("""
-            CREATE INDEX IF NOT EXISTS docs_embedding_hnsw_idx
-            ON docs USING hnsw (embedding)
-        """))
+        _ensure_embedding_dim(conn)
+        _ensure_hnsw_index(conn)
+        _ensure_metadata_columns(conn)
+        _ensure_fulltext(conn)
+        _ensure_meta_table(conn)
+        ensure_manifest_table(conn)
     logger.info("Schema inicializado com sucesso")
+
+
+def _ensure_embedding_dim(conn) -> None:
+    # Migra docs.embedding quando EMBEDDING_DIM muda. Nos modelos text-embedding-3-* os
+    # primeiros N componentes renormalizados equivalem ao vetor pedido com dimensions=N,
+    # então a redução é feita no próprio banco; nos demais casos os vetores viram NULL
+    # e devem ser regerados com scripts/reembed_docs.py
+    current = conn.execute(text("""
+        SELECT atttypmod FROM pg_attribute
+        WHERE attrelid = 'docs'::regclass AND attname = 'embedding'
+    """)).scalar_one()
+    if current == EMBEDDING_DIM:
+        return
+    shorten = 0 < EMBEDDING_DIM < current and EMBEDDING_MODEL.startswith("text-embedding-3")
+    logger.warning(
+        "Dimensão de docs.embedding diferente de EMBEDDING_DIM; migrando coluna",
+        extra={"from_dim": current, "to_dim": EMBEDDING_DIM, "shorten": shorten},
+    )
+    # Os índices HNSW dependem do tipo da coluna (inclusive os de expressão)
+    for name, _, _ in QUANTIZATIONS.values():
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    value = f"l2_normalize(subvector(embedding, 1, {EMBEDDING_DIM}))" if shorten else "NULL"
+    conn.execute(text(
+        f"ALTER TABLE docs ALTER COLUMN embedding TYPE VECTOR({EMBEDDING_DIM}) USING {value}"
+    ))
+    if not shorten:
+        logger.warning("Embeddings removidos; execute scripts/reembed_docs.py para regerá-los")
+
+
+def _ensure_hnsw_index(conn) -> None:
+    # Mantém apenas o índice HNSW da quantização configurada
+    for quantization, (name, _, _) in QUANTIZATIONS.items():
+        if quantization != VECTOR_QUANTIZATION and _index_exists(conn, name):
+            logger.info("Removendo índice HNSW de outra quantização", extra={"index": name})
+            conn.execute(text(f"DROP INDEX {name}"))
+    create_hnsw_index(conn, VECTOR_QUANTIZATION)
+
+
+def _index_exists(conn, name: str) -> bool:
+    return conn.execute(
+        text("SELECT 1 FROM pg_class WHERE relname = :name AND relkind = 'i'"), {"name": name}
+    ).first() is not None
+
+
+def create_hnsw_index(conn, quantization: str) -> str:
+    """
+    Cria (ou recria, se a métrica ou os parâmetros de construção mudaram) o
+    índice HNSW de *quantization* sobre docs.embedding e retorna seu nome.
+    Os índices quantizados são índices de expressão: a coluna continua float32.
+    """
+    name, opclass, _ = QUANTIZATIONS[quantization]
+    current = conn.execute(text("""
+        SELECT opc.opcname, c.reloptions
+        FROM pg_class c
+        JOIN pg_index i ON i.indexrelid = c.oid
+        JOIN pg_opclass opc ON opc.oid = i.indclass[0]
+        WHERE c.relname = :name
+    """), {"name": name}).first()
+    wanted = {f"m={HNSW_M}", f"ef_construction={HNSW_EF_CONSTRUCTION}"}
+    if current is not None:
+        # Sem reloptions o índice usa os padrões do pgvector (m=16, ef_construction=64)
+        options = set(current.reloptions or ["m=16", "ef_construction=64"])
+        if current.opcname == opclass and options == wanted:
+            return name
+        logger.info(
+            "Parâmetros do índice HNSW alterados; recriando",
+            extra={"index": name, "opclass": current.opcname, "options": sorted(options)},
+        )
+        conn.execute(text(f"DROP INDEX {name}"))
+    expression = quantize_sql("embedding", quantization)
+    if quantization != "none":
+        expression = f"({expression})"
+    conn.execute(text(f"""
+        CREATE INDEX {name}
+        ON docs USING hnsw ({expression} {opclass})
+        WITH (m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION})
+    """))
+    logger.info(
+        "Índice HNSW criado",
+        extra={"index": name, "opclass": opclass, "m": HNSW_M, "ef_construction": HNSW_EF_CONSTRUCTION},
+    )
+    return name
+
+
+def _ensure_metadata_columns(conn) -> None:
+    # Colunas geradas a partir de docs.metadata para filtros indexados (B-tree).
+    # Itens de texto não gravam 'type' nos metadados, por isso o padrão 'text'.
+    conn.execute(text("""
+        ALTER TABLE docs
+            ADD COLUMN IF NOT EXISTS file_name TEXT
+                GENERATED ALWAYS AS (metadata->>'file_name') STORED,
+            ADD COLUMN IF NOT EXISTS doc_path TEXT
+                GENERATED ALWAYS AS (metadata->>'path') STORED,
+            ADD COLUMN IF NOT EXISTS doc_type TEXT
+                GENERATED ALWAYS AS (COALESCE(metadata->>'type', 'text')) STORED,
+            ADD COLUMN IF NOT EXISTS page_number INTEGER
+                GENERATED ALWAYS AS (
+                    CASE WHEN jsonb_typeof(metadata->'page_number') = 'number'
+                         THEN (metadata->>'page_number')::integer
+                    END
+                ) STORED
+    """))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS docs_file_name_idx ON docs (file_name)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS docs_doc_path_idx ON docs (doc_path)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS docs_doc_type_page_idx ON docs (doc_type, page_number)"))
+    # Filtros arbitrários por containment (metadata @> '{...}')
+    conn.execute(text("""
+        CREATE INDEX IF NOT EXISTS docs_metadata_gin_idx
+        ON docs USING gin (metadata jsonb_path_ops)
+    """))
+
+
+def _ensure_fulltext(conn) -> None:
+    # Índice full-text: stemming em português + unaccent ("carência" casa com "carencia")
+    conn.execute(text("CREATE EXTENSION IF NOT EXISTS unaccent"))
+    conn.execute(text(f"""
+        DO $$
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = '{FTS_CONFIG}') THEN
+                CREATE TEXT SEARCH CONFIGURATION {FTS_CONFIG} (COPY = portuguese);
+                ALTER TEXT SEARCH CONFIGURATION {FTS_CONFIG}
+                    ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+            END IF;
+        END
+        $$;
+    """))
+    conn.execute(text(f"""
+        ALTER TABLE docs ADD COLUMN IF NOT EXISTS content_tsv tsvector
+        GENERATED ALWAYS AS (to_tsvector('{FTS_CONFIG}', content)) STORED
+    """))
+    conn.execute(text("""
+        CREATE INDEX IF NOT EXISTS docs_content_tsv_idx
+        ON docs USING gin (content_tsv)
+    """))
+
+
+def _ensure_meta_table(conn) -> None:
+    # Tabela chave/valor com metadados do corpus (ex.: versão da última ingestão)
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS rag_meta (
+            key TEXT PRIMARY KEY,
+            value BIGINT NOT NULL
+        );
+    """))
+
+
+def ensure_manifest_table(conn) -> None:
+    """
+    Cria a tabela do manifesto de ingestão: um registro por arquivo ingerido, com o
+    estado do arquivo (tamanho, mtime) e o hash do conteúdo usados na ingestão incremental.
+    """
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS ingest_manifest (
+            path TEXT PRIMARY KEY,
+            content_hash TEXT NOT NULL,
+            size_bytes BIGINT NOT NULL,
+            mtime_ns BIGINT NOT NULL,
+            chunk_count INTEGER NOT NULL DEFAULT 0,
+            ingested_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+    """))
+
+
+def get_corpus_version() -> int:
+    """
+    Retorna a versão atual do corpus indexado (0 se nunca houve ingestão).
+    """
+    with engine.connect() as conn:
+        # rag_meta só existe após init_db/ingestão; sem ela, a versão é 0
+        if conn.execute(text("SELECT to_regclass('rag_meta')")).scalar() is None:
+            return 0
+        row = conn.execute(
+            text("SELECT value FROM rag_meta WHERE key = 'corpus_version'")
+        ).first()
+    return int(row[0]) if row else 0
+
+
+def bump_corpus_version() -> int:
+    """
+    Incrementa a versão do corpus e retorna o novo valor.
+    Deve ser chamado ao final de cada ingestão para invalidar caches derivados.
+    """
+    with engine.begin() as conn:
+        _ensure_meta_table(conn)
+        version = conn.execute(text("""
+            INSERT INTO rag_meta (key, value) VALUES ('corpus_version', 1)
+            ON CONFLICT (key) DO UPDATE SET value = rag_meta.value + 1
+            RETURNING value
+        """)).scalar_one()
+    logger.info("Versão do corpus incrementada", extra={"corpus_version": version})
+    return int(version)
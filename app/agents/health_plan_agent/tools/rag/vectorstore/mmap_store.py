@@ -0,0 +1,475 @@
+"""
+vectorstore/mmap_store.py
+
+In-process vector index backed by memory-mapped files, as an alternative to the
+Postgres+pgvector backend for small and medium corpora. Top-k queries are
+answered with vectorized NumPy dot products, without any database round trip.
+
+Index directory layout
+----------------------
+* ``vectors.npy``  – (N, dim) float32 or float16 matrix, opened with ``mmap_mode="r"``
+* ``norms.npy``    – (N,) float32 squared L2 norms of the rows
+* ``docs.jsonl``   – one JSON line per row with ``id``, ``content`` and ``metadata``
+* ``offsets.npy``  – (N + 1,) int64 byte offsets of each line in ``docs.jsonl``
+* ``manifest.json`` – dtype, dimension, row count and creation timestamp
+
+The index path is a symlink to a versioned directory (``<name>.v<ns>``) holding
+these files; an export writes a new version and swaps the link atomically.
+Every file is mapped read-only, so worker processes on the same host share the
+same page-cache pages instead of holding private copies.
+"""
+
+import asyncio
+import json
+import mmap
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import text
+
+from app.config import EMBEDDING_DIM, MMAP_INDEX_DTYPE
+from app.agents.health_plan_agent.tools.rag.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_VECTORS = "vectors.npy"
+_NORMS = "norms.npy"
+_DOCS = "docs.jsonl"
+_OFFSETS = "offsets.npy"
+_MANIFEST = "manifest.json"
+
+# Rows scored per block; bounds the temporary float32 copy for float16 indexes
+_BLOCK_ROWS = 65536
+
+
+class _IndexSnapshot:
+    """
+    One loaded version of the index directory. Never rebound after construction
+    (only the filter columns are built lazily, once), so a query that captured a
+    snapshot keeps consistent arrays even if the store reloads meanwhile.
+    """
+
+    def __init__(self, directory: Path, mtime: int) -> None:
+        manifest = json.loads((directory / _MANIFEST).read_text(encoding="utf-8"))
+        self.version = (str(directory), mtime)
+        self.dtype = manifest["dtype"]
+        self.count = int(manifest["count"])
+        self.dim = int(manifest["dim"])
+        self.vectors = np.load(directory / _VECTORS, mmap_mode="r")
+        self.norms = np.load(directory / _NORMS, mmap_mode="r")
+        self.offsets = np.load(directory / _OFFSETS, mmap_mode="r")
+        with open(directory / _DOCS, "rb") as fh:
+            self.docs = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) if self.count else b""
+        self._facets: Optional[Dict[str, np.ndarray]] = None
+        self._facets_lock = threading.Lock()
+
+    def doc(self, row: int) -> Dict[str, Any]:
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return json.loads(self.docs[start:end])
+
+    # -- filters ----------------------------------------------------------
+
+    def facets(self) -> Dict[str, np.ndarray]:
+        # Per-row filter columns, built on the first filtered query (one pass over docs.jsonl)
+        if self._facets is None:
+            with self._facets_lock:
+                if self._facets is None:
+                    file_name, path, doc_type = [], [], []
+                    page = np.full(self.count, -1, dtype=np.int64)
+                    for row in range(self.count):
+                        metadata = self.doc(row).get("metadata") or {}
+                        file_name.append(metadata.get("file_name"))
+                        path.append(metadata.get("path"))
+                        doc_type.append(metadata.get("type") or "text")
+                        if isinstance(metadata.get("page_number"), int):
+                            page[row] = metadata["page_number"]
+                    self._facets = {
+                        "file_name": np.array(file_name, dtype=object),
+                        "path": np.array(path, dtype=object),
+                        "type": np.array(doc_type, dtype=object),
+                        "page_number": page,
+                    }
+        return self._facets
+
+    def filter_mask(self, filters: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """
+        Boolean mask of the rows matching *filters* (same keys as ``VectorStore.query_similar``).
+        """
+        if not filters:
+            return None
+        unknown = set(filters) - {"file_name", "path", "type", "page_from", "page_to"}
+        if unknown:
+            raise ValueError(f"Unknown filters {sorted(unknown)}")
+        facets = self.facets()
+        mask = np.ones(self.count, dtype=bool)
+        for key in ("file_name", "path", "type"):
+            value = filters.get(key)
+            if value is not None:
+                values = [value] if isinstance(value, str) else list(value)
+                mask &= np.isin(facets[key], values)
+        page = facets["page_number"]
+        if filters.get("page_from") is not None:
+            mask &= (page >= 0) & (page >= int(filters["page_from"]))
+        if filters.get("page_to") is not None:
+            mask &= (page >= 0) & (page <= int(filters["page_to"]))
+        return mask
+
+    # -- queries ----------------------------------------------------------
+
+    def top_k(self, query: np.ndarray, k: int, mask: Optional[np.ndarray] = None) -> List[tuple]:
+        q_norm = float(query @ query)
+        best_rows = np.empty(0, dtype=np.int64)
+        best_dist = np.empty(0, dtype=np.float32)
+        for start in range(0, self.count, _BLOCK_ROWS):
+            block = np.asarray(self.vectors[start:start + _BLOCK_ROWS], dtype=np.float32)
+            # ||a - b||² = ||a||² + ||b||² - 2 a·b
+            dist = self.norms[start:start + block.shape[0]] + q_norm - 2.0 * (block @ query)
+            rows = np.arange(start, start + block.shape[0])
+            if mask is not None:
+                keep = mask[start:start + block.shape[0]]
+                dist, rows = dist[keep], rows[keep]
+            if dist.shape[0] > k:
+                keep = np.argpartition(dist, k)[:k]
+                dist, rows = dist[keep], rows[keep]
+            best_dist = np.concatenate([best_dist, dist])
+            best_rows = np.concatenate([best_rows, rows])
+            if best_dist.shape[0] > k:
+                keep = np.argpartition(best_dist, k)[:k]
+                best_dist, best_rows = best_dist[keep], best_rows[keep]
+        order = np.argsort(best_dist)
+        return [(int(best_rows[i]), float(np.sqrt(max(best_dist[i], 0.0)))) for i in order]
+
+
+class MmapVectorStore:
+    """
+    Read-only vector store over a memory-mapped index directory.
+
+    Exposes the same query interface as ``VectorStore`` (``query_similar`` and
+    friends) so the Retriever can use either backend.
+    """
+
+    def __init__(self, index_dir: str) -> None:
+        """
+        Parameters
+        ----------
+        index_dir : str
+            Directory produced by ``export_index`` / ``export_from_postgres``
+            (normally a symlink to the current version directory).
+        """
+        # Not resolved: the symlink is followed on every load to see new exports
+        self.index_dir = Path(index_dir).expanduser().absolute()
+        self._lock = threading.Lock()
+        self._snapshot = self._load()
+
+    @property
+    def count(self) -> int:
+        return self._snapshot.count
+
+    @property
+    def dim(self) -> int:
+        return self._snapshot.dim
+
+    # -- loading ----------------------------------------------------------
+
+    def _version(self) -> tuple:
+        # (version directory the link points to, manifest mtime); plain directories
+        # written by older exports only change the mtime
+        directory = Path(os.path.realpath(self.index_dir))
+        return directory, (directory / _MANIFEST).stat().st_mtime_ns
+
+    def _load(self) -> _IndexSnapshot:
+        manifest_path = self.index_dir / _MANIFEST
+        if not manifest_path.is_file():
+            raise FileNotFoundError(f"{manifest_path} not found; export the index first")
+        snapshot = _IndexSnapshot(*self._version())
+        logger.info(
+            "Índice mmap carregado",
+            extra={"index_dir": snapshot.version[0], "count": snapshot.count, "dtype": snapshot.dtype},
+        )
+        return snapshot
+
+    def _current(self) -> _IndexSnapshot:
+        # A new export swaps the directory in; pick it up without restarting the worker.
+        # The snapshot is replaced as a single reference, never attribute by attribute
+        snapshot = self._snapshot
+        try:
+            directory, mtime = self._version()
+        except OSError:
+            return snapshot
+        if (str(directory), mtime) != snapshot.version:
+            with self._lock:
+                if (str(directory), mtime) != self._snapshot.version:
+                    try:
+                        self._snapshot = self._load()
+                    except OSError as e:
+                        # Export swapped again mid-load; keep serving the previous version
+                        logger.warning("Falha ao recarregar índice mmap", extra={"error": str(e)})
+                snapshot = self._snapshot
+        return snapshot
+
+    def query_similar(
+        self,
+        vector: List[float],
+        k: int = 5,
+        columns: Optional[Sequence[str]] = None,
+        ef_search: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Query for the k most similar documents (L2 distance) to the provided vector.
+
+        Parameters
+        ----------
+        vector : List[float]
+            Query embedding vector.
+        k : int
+            Number of similar documents to retrieve.
+        columns : Optional[Sequence[str]]
+            Columns to return, among 'id', 'content', 'metadata' and 'embedding'
+            (default: id, content, metadata).
+        ef_search : Optional[int]
+            Accepted for interface parity with ``VectorStore``; the scan is exact.
+        filters : Optional[Dict[str, Any]]
+            Metadata filters ('file_name', 'path', 'type', 'page_from', 'page_to'),
+            as in ``VectorStore.query_similar``.
+
+        Returns
+        -------
+        List[Dict[str, Any]]
+            List of dicts with the requested columns plus 'distance'.
+        """
+        columns = tuple(columns or ("id", "content", "metadata"))
+        # Captured once: every read below comes from the same index version
+        snapshot = self._current()
+        query = np.asarray(vector, dtype=np.float32)
+        if query.shape != (snapshot.dim,):
+            raise ValueError(f"Query vector has dimension {query.shape}, index expects {snapshot.dim}")
+        if snapshot.count == 0 or k <= 0:
+            return []
+
+        results = []
+        for row, distance in snapshot.top_k(query, k, snapshot.filter_mask(filters)):
+            doc = snapshot.doc(row)
+            doc["embedding"] = np.asarray(snapshot.vectors[row], dtype=np.float32)
+            result = {col: doc[col] for col in columns}
+            result["distance"] = distance
+            results.append(result)
+        logger.debug("Query returned rows", extra={"count": len(results)})
+        return results
+
+    async def aquery_similar(
+        self,
+        vector: List[float],
+        k: int = 5,
+        columns: Optional[Sequence[str]] = None,
+        ef_search: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Async counterpart of ``query_similar`` (NumPy releases the GIL in matmul).
+        """
+        return await asyncio.to_thread(self.query_similar, vector, k, columns, ef_search, filters)
+
+    def query_similar_many(
+        self,
+        vectors: Sequence[List[float]],
+        k: int = 5,
+        columns: Optional[Sequence[str]] = None,
+        ef_search: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        One ``query_similar`` per vector (no round trips to save in-process).
+        """
+        return [self.query_similar(v, k, columns, ef_search, filters) for v in vectors]
+
+    async def aquery_similar_many(
+        self,
+        vectors: Sequence[List[float]],
+        k: int = 5,
+        columns: Optional[Sequence[str]] = None,
+        ef_search: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Async counterpart of ``query_similar_many``.
+        """
+        return await asyncio.to_thread(self.query_similar_many, vectors, k, columns, ef_search, filters)
+
+    def query_hybrid(
+        self,
+        query: str,
+        vector: List[float],
+        k: int = 5,
+        filters: Optional[Dict[str, Any]] = None,
+        columns: Optional[Sequence[str]] = None,
+        **kwargs: Any,
+    ) -> List[Dict[str, Any]]:
+        """
+        Full-text ranking is only available on Postgres; falls back to vector search.
+        """
+        logger.warning("Busca híbrida indisponível no backend mmap; usando apenas vetores")
+        return self.query_similar(vector, k, columns=columns, filters=filters)
+
+    async def aquery_hybrid(
+        self,
+        query: str,
+        vector: List[float],
+        k: int = 5,
+        filters: Optional[Dict[str, Any]] = None,
+        columns: Optional[Sequence[str]] = None,
+        **kwargs: Any,
+    ) -> List[Dict[str, Any]]:
+        """
+        Async counterpart of ``query_hybrid``.
+        """
+        return await asyncio.to_thread(self.query_hybrid, query, vector, k, filters, columns)
+
+
+# =======================
+# Export
+# =======================
+
+def _publish(tmp_dir: Path, out_dir: Path) -> None:
+    # *out_dir* is a symlink to a versioned directory; os.replace of the link is
+    # atomic, so readers resolve either the old or the new version, never a mix.
+    # Open mappings keep the inodes of a removed version alive
+    version_dir = out_dir.with_name(f"{out_dir.name}.v{time.time_ns()}")
+    os.replace(tmp_dir, version_dir)
+    previous = Path(os.path.realpath(out_dir)) if out_dir.is_symlink() else None
+    if out_dir.exists() and not out_dir.is_symlink():
+        # Plain directory written by older exports: moved aside once
+        previous = out_dir.with_name(out_dir.name + ".old")
+        if previous.exists():
+            shutil.rmtree(previous)
+        os.replace(out_dir, previous)
+    link = out_dir.with_name(f"{out_dir.name}.link-{os.getpid()}")
+    if link.is_symlink():
+        link.unlink()
+    os.symlink(version_dir.name, link)
+    os.replace(link, out_dir)
+    if previous is not None and previous != version_dir:
+        shutil.rmtree(previous, ignore_errors=True)
+
+
+def export_index(
+    docs: Iterable[Dict[str, Any]],
+    out_dir: str,
+    count: int,
+    dim: int = EMBEDDING_DIM,
+    dtype: str = MMAP_INDEX_DTYPE,
+) -> int:
+    """
+    Write an index directory from an iterable of document dicts.
+
+    Parameters
+    ----------
+    docs : Iterable[Dict[str, Any]]
+        Dicts with 'id', 'content', 'metadata' and 'embedding'.
+    out_dir : str
+        Destination path; becomes a symlink to a new versioned directory,
+        swapped in atomically.
+    count : int
+        Number of documents in *docs* (the matrix is preallocated on disk).
+    dim : int
+        Embedding dimension.
+    dtype : str
+        "float32" or "float16" storage for the vectors.
+
+    Returns
+    -------
+    int
+        Number of rows written.
+    """
+    if dtype not in ("float32", "float16"):
+        raise ValueError(f"Unsupported dtype '{dtype}'")
+    out_path = Path(out_dir).expanduser().resolve()
+    tmp_dir = out_path.with_name(f"{out_path.name}.tmp-{os.getpid()}")
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+    tmp_dir.mkdir(parents=True)
+
+    vectors = np.lib.format.open_memmap(tmp_dir / _VECTORS, mode="w+", dtype=dtype, shape=(count, dim))
+    norms = np.lib.format.open_memmap(tmp_dir / _NORMS, mode="w+", dtype=np.float32, shape=(count,))
+    offsets = np.zeros(count + 1, dtype=np.int64)
+
+    written = 0
+    with open(tmp_dir / _DOCS, "wb") as fh:
+        for doc in docs:
+            if written >= count:
+                raise ValueError("More documents than the declared count")
+            emb = np.asarray(doc["embedding"], dtype=np.float32)
+            vectors[written] = emb
+            # Norms follow the stored precision so distances stay consistent
+            stored = np.asarray(vectors[written], dtype=np.float32)
+            norms[written] = float(stored @ stored)
+            line = json.dumps(
+                {"id": doc["id"], "content": doc["content"], "metadata": doc.get("metadata") or {}},
+                ensure_ascii=False,
+            ).encode("utf-8") + b"\n"
+            fh.write(line)
+            written += 1
+            offsets[written] = offsets[written - 1] + len(line)
+
+    if written != count:
+        raise ValueError(f"Expected {count} documents, got {written}")
+    vectors.flush()
+    norms.flush()
+    del vectors, norms
+    np.save(tmp_dir / _OFFSETS, offsets)
+    (tmp_dir / _MANIFEST).write_text(
+        json.dumps({"dtype": dtype, "dim": dim, "count": written, "created_at": time.time()}),
+        encoding="utf-8",
+    )
+    _publish(tmp_dir, out_path)
+    logger.info("Índice mmap exportado", extra={"index_dir": str(out_path), "count": written, "dtype": dtype})
+    return written
+
+
+def export_from_postgres(out_dir: str, dtype: str = MMAP_INDEX_DTYPE) -> int:
+    """
+    Export the full ``docs`` table to a memory-mapped index directory,
+    streaming rows with a server-side cursor.
+
+    Parameters
+    ----------
+    out_dir : str
+        Destination directory.
+    dtype : str
+        "float32" or "float16" storage for the vectors.
+
+    Returns
+    -------
+    int
+        Number of rows exported.
+    """
+    from app.agents.health_plan_agent.tools.rag.vectorstore.db import engine
+
+    with engine.connect() as conn:
+        count = conn.execute(text("SELECT COUNT(*) FROM docs WHERE embedding IS NOT NULL")).scalar_one()
+        result = conn.execution_options(stream_results=True, yield_per=1000).execute(
+            text("SELECT id, content, metadata, embedding FROM docs WHERE embedding IS NOT NULL ORDER BY id")
+        )
+        return export_index(result.mappings(), out_dir, count=count, dtype=dtype)
+
+
+_stores: Dict[str, MmapVectorStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_mmap_store(index_dir: str) -> MmapVectorStore:
+    """
+    Return the process-wide store for *index_dir*, mapping it on first use.
+    """
+    key = str(Path(index_dir).expanduser().absolute())
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = MmapVectorStore(key)
+            _stores[key] = store
+    return store
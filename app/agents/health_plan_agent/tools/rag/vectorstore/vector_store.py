@@ -1,12 +1,232 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Sequence, Tuple
 import json
 
+import numpy as np
+from pgvector import Vector
+from psycopg.rows import dict_row
 from sqlalchemy import text
-from app.agents.health_plan_agent.tools.rag.vectorstore.db import engine
+from app.config import (
+    EMBEDDING_DIM,
+    HNSW_ITERATIVE_SCAN,
+    HYBRID_CANDIDATES,
+    HYBRID_RRF_K,
+    MMAP_INDEX_DIR,
+    QUANTIZED_OVERSAMPLE,
+    UPSERT_BATCH_SIZE,
+    VECTOR_BACKEND,
+    VECTOR_QUANTIZATION,
+)
+from app.agents.health_plan_agent.tools.rag.vectorstore.db import (
+    engine,
+    get_async_engine,
+    get_query_engine,
+    DISTANCE_OPERATOR,
+    FTS_CONFIG,
+    QUANTIZATIONS,
+    quantize_sql,
+)
 from app.agents.health_plan_agent.tools.rag.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Columns callers may request from similarity queries ('distance' is always returned)
+QUERY_COLUMNS = ("id", "content", "metadata", "embedding")
+DEFAULT_COLUMNS = ("id", "content", "metadata")
+
+# Metadata filters -> generated, B-tree indexed columns of docs (see db._ensure_metadata_columns).
+# Each value may be a single string or a list of accepted strings.
+FILTER_COLUMNS = {"file_name": "file_name", "path": "doc_path", "type": "doc_type"}
+# Inclusive page range over the page_number column
+PAGE_FILTERS = ("page_from", "page_to")
+
+# Placeholder styles: psycopg 3 (sync query engine) and SQLAlchemy text() (asyncpg)
+_PSYCOPG = "%({})s"
+_SQLALCHEMY = ":{}"
+
+
+def _select_columns(columns: Optional[Sequence[str]]) -> str:
+    columns = tuple(columns or DEFAULT_COLUMNS)
+    unknown = set(columns) - set(QUERY_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown columns {sorted(unknown)}; allowed: {QUERY_COLUMNS}")
+    return ", ".join(columns)
+
+
+def _filter_sql(filters: Optional[Dict[str, Any]], placeholder: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    Build the WHERE condition (without the keyword) and parameters for *filters*.
+    """
+    if not filters:
+        return "", {}
+    unknown = set(filters) - set(FILTER_COLUMNS) - set(PAGE_FILTERS)
+    if unknown:
+        raise ValueError(
+            f"Unknown filters {sorted(unknown)}; allowed: {sorted(FILTER_COLUMNS) + list(PAGE_FILTERS)}"
+        )
+
+    clauses: List[str] = []
+    params: Dict[str, Any] = {}
+    for key, column in FILTER_COLUMNS.items():
+        value = filters.get(key)
+        if value is None:
+            continue
+        name = f"filter_{key}"
+        clauses.append(f"{column} = ANY({placeholder.format(name)})")
+        params[name] = [value] if isinstance(value, str) else list(value)
+    for key, op in zip(PAGE_FILTERS, (">=", "<=")):
+        if filters.get(key) is not None:
+            name = f"filter_{key}"
+            clauses.append(f"page_number {op} {placeholder.format(name)}")
+            params[name] = int(filters[key])
+    return " AND ".join(clauses), params
+
+
+def _nearest_sql(
+    select: str, vector: str, limit: str, where: str = "", quantization: str = VECTOR_QUANTIZATION
+) -> str:
+    # Top-*limit* rows of docs by exact distance to *vector*, as "SELECT <select>, distance".
+    # The query vector is sent once and referenced by the ORDER BY through its alias,
+    # which still lets the planner use the HNSW index.
+    distance = f"embedding {DISTANCE_OPERATOR} {vector} AS distance"
+    where = f"WHERE {where} " if where else ""
+    if quantization == "none":
+        return f"SELECT {select}, {distance} FROM docs {where}ORDER BY distance LIMIT {limit}"
+    # Quantized: walk the compact expression index for limit * QUANTIZED_OVERSAMPLE
+    # candidates, then re-rank them by exact distance on the full-precision column.
+    operator = QUANTIZATIONS[quantization][2]
+    return (
+        f"SELECT {select}, {distance} FROM ("
+        f"SELECT {', '.join(QUERY_COLUMNS)} FROM docs {where}"
+        f"ORDER BY {quantize_sql('embedding', quantization)} {operator} {quantize_sql(vector, quantization)} "
+        f"LIMIT {limit} * {QUANTIZED_OVERSAMPLE}"
+        f") quantized_hits ORDER BY distance LIMIT {limit}"
+    )
+
+
+def _similarity_sql(
+    columns: Optional[Sequence[str]],
+    vector_param: str,
+    k_param: str,
+    where: str = "",
+    quantization: str = VECTOR_QUANTIZATION,
+) -> str:
+    return _nearest_sql(_select_columns(columns), vector_param, k_param, where, quantization)
+
+
+def _similarity_many_sql(
+    columns: Optional[Sequence[str]], vectors_param: str, k_param: str, where: str = ""
+) -> str:
+    # One top-k search per element of the vector array: the LATERAL subquery is an
+    # HNSW index scan parameterized by q.vector, all in a single round trip.
+    return (
+        f"SELECT q.ord - 1 AS query_index, hits.* "
+        f"FROM unnest(CAST({vectors_param} AS vector[])) WITH ORDINALITY AS q(vector, ord) "
+        f"CROSS JOIN LATERAL ({_nearest_sql(_select_columns(columns), 'q.vector', k_param, where)}"
+        f") hits ORDER BY q.ord, hits.distance"
+    )
+
+
+def _session_sql(ef_search: Optional[int], k: int, filtered: bool) -> List[str]:
+    # SET LOCAL lasts until the end of the query's transaction, so pooled
+    # connections never leak the settings.
+    statements = []
+    if ef_search is not None:
+        # The HNSW scan returns at most ef_search rows, hence the floor at the scan depth
+        depth = int(k) * (QUANTIZED_OVERSAMPLE if VECTOR_QUANTIZATION != "none" else 1)
+        statements.append(f"SET LOCAL hnsw.ef_search = {max(int(ef_search), depth)}")
+    if filtered and HNSW_ITERATIVE_SCAN != "off":
+        # Keep walking the graph until k rows pass the filter
+        statements.append(f"SET LOCAL hnsw.iterative_scan = {HNSW_ITERATIVE_SCAN}")
+    return statements
+
+
+def _as_array(vector: Any) -> np.ndarray:
+    return np.asarray(vector, dtype=np.float32)
+
+
+def _group_by_query(rows: List[Dict[str, Any]], n_queries: int) -> List[List[Dict[str, Any]]]:
+    grouped: List[List[Dict[str, Any]]] = [[] for _ in range(n_queries)]
+    for row in rows:
+        grouped[row.pop("query_index")].append(row)
+    return grouped
+
+
+# Bulk upsert: rows are COPied in binary into a per-transaction staging table and
+# merged into docs with one statement. Unchanged rows are skipped so re-ingesting
+# the same content writes no new tuples (and no HNSW index entries).
+_STAGING_DDL = f"""
+CREATE TEMP TABLE docs_staging (
+  id TEXT,
+  content TEXT,
+  metadata JSONB,
+  embedding VECTOR({EMBEDDING_DIM})
+) ON COMMIT DROP
+"""
+_STAGING_COPY = "COPY docs_staging (id, content, metadata, embedding) FROM STDIN (FORMAT BINARY)"
+_STAGING_TYPES = ("text", "text", "jsonb", "vector")
+_STAGING_UPSERT = """
+INSERT INTO docs (id, content, metadata, embedding)
+SELECT id, content, metadata, embedding FROM docs_staging
+ON CONFLICT (id) DO UPDATE SET
+  content = EXCLUDED.content,
+  metadata = EXCLUDED.metadata,
+  embedding = EXCLUDED.embedding
+WHERE (docs.content, docs.metadata, docs.embedding)
+  IS DISTINCT FROM (EXCLUDED.content, EXCLUDED.metadata, EXCLUDED.embedding)
+"""
+
+
+# Hybrid search: lexical (full-text) and vector rankings fused with Reciprocal
+# Rank Fusion in a single round trip. The tsquery ORs the query lexemes so a
+# question matches passages containing any of its (stemmed, unaccented) terms.
+_HYBRID_TEMPLATE = """
+WITH vector_hits AS (
+  SELECT id, ROW_NUMBER() OVER (ORDER BY distance) AS rank
+  FROM ({vector_search}) v
+),
+lexical_hits AS (
+  SELECT id, ROW_NUMBER() OVER (ORDER BY score DESC) AS rank
+  FROM (
+    SELECT d.id, ts_rank_cd(d.content_tsv, q.query) AS score
+    FROM docs d,
+         CAST(replace(CAST(plainto_tsquery('{fts}', {query}) AS text), '&', '|') AS tsquery) AS q(query)
+    WHERE d.content_tsv @@ q.query {lexical_where}
+    ORDER BY score DESC
+    LIMIT {candidates}
+  ) l
+),
+fused AS (
+  SELECT id, SUM(1.0 / ({rrf_k} + rank)) AS score
+  FROM (
+    SELECT id, rank FROM vector_hits
+    UNION ALL
+    SELECT id, rank FROM lexical_hits
+  ) r
+  GROUP BY id
+)
+SELECT {select}, f.score
+FROM fused f
+JOIN docs d ON d.id = f.id
+ORDER BY f.score DESC
+LIMIT {k}
+"""
+
+
+def _hybrid_sql(
+    placeholder: str, vector_param: str, where: str, columns: Optional[Sequence[str]] = None
+) -> str:
+    # Filters restrict both rankings, so fused results always satisfy them
+    return _HYBRID_TEMPLATE.format(
+        select=", ".join(f"d.{col}" for col in _select_columns(columns).split(", ")),
+        fts=FTS_CONFIG,
+        vector_search=_nearest_sql("id", vector_param, placeholder.format("candidates"), where),
+        query=placeholder.format("query"),
+        candidates=placeholder.format("candidates"),
+        rrf_k=placeholder.format("rrf_k"),
+        k=placeholder.format("k"),
+        lexical_where=f"AND {where}" if where else "",
+    )
+
 
 class VectorStore:
     """
@@ -22,6 +242,38 @@ class VectorStore:
         """
         self.engine = engine
 
+    @staticmethod
+    def document_id(doc: Dict[str, Any]) -> str:
+        """
+        Return the id under which *doc* is stored (explicit 'id', else derived
+        from the source path, the page/table/image it was extracted from and
+        the chunk index).
+        """
+        metadata = doc.get("metadata", {})
+        path = metadata.get("path")
+        chunk_index = metadata.get("chunk_index")
+        # Build a unique document ID per chunk when present; items of a PDF share
+        # the path, so the page and table/image index keep their chunks apart
+        if chunk_index is not None and path:
+            parts = [path]
+            for key, label in (("page_number", "page"), ("table_index", "table"), ("image_index", "image")):
+                if metadata.get(key) is not None:
+                    parts.append(f"{label}_{metadata[key]}")
+            parts.append(f"chunk_{chunk_index}")
+            return doc.get("id") or "_".join(parts)
+        return doc.get("id") or path
+
+    @classmethod
+    def _document_row(cls, doc: Dict[str, Any]) -> Tuple[str, str, Dict[str, Any], Any]:
+        # (id, content, metadata, embedding) as stored in docs
+        metadata = doc.get("metadata", {})
+        doc_id = cls.document_id(doc)
+        # Optionally, strip chunk-specific metadata if you don't want it stored
+        metadata_to_store = metadata.copy()
+        # metadata_to_store.pop("chunk_index", None)
+        # metadata_to_store.pop("chunk_count", None)
+        return doc_id, doc.get("content", ""), metadata_to_store, doc.get("embedding", [])
+
     def add_document(self, doc: Dict[str, Any]) -> None:
         """
         Insert or update a single document chunk embedding.
@@ -35,20 +287,7 @@ class VectorStore:
               - 'embedding': List[float]
               - optionally 'id': str
         """
-        metadata = doc.get("metadata", {})
-        path = metadata.get("path")
-        chunk_index = metadata.get("chunk_index")
-        # Build a unique document ID per chunk when present
-        if chunk_index is not None and path:
-            doc_id = doc.get("id") or f"{path}_chunk_{chunk_index}"
-        else:
-            doc_id = doc.get("id") or path
-        content = doc.get("content", "")
-        embedding = doc.get("embedding", [])
-        # Optionally, strip chunk-specific metadata if you don't want it stored
-        metadata_to_store = metadata.copy()
-        # metadata_to_store.pop("chunk_index", None)
-        # metadata_to_store.pop("chunk_count", None)
+        doc_id, content, metadata_to_store, embedding = self._document_row(doc)
 
         logger.info("Upserting document chunk into vector store", extra={"id": doc_id})
         with self.engine.begin() as conn:
@@ -68,56 +307,342 @@ class VectorStore:
             )
         logger.debug("Document chunk upserted", extra={"id": doc_id})
 
-    def add_documents(self, docs: List[Dict[str, Any]]) -> None:
+    def add_documents(self, docs: List[Dict[str, Any]], batch_size: int = UPSERT_BATCH_SIZE) -> int:
         """
-        Batch insert or update multiple document chunks.
+        Bulk insert or update multiple document chunks.
+
+        Each batch is one transaction on the psycopg 3 engine: the rows are
+        written with binary COPY into a temporary staging table and merged into
+        ``docs`` with a single ``INSERT ... SELECT ... ON CONFLICT`` statement.
+        Rows whose content, metadata and embedding are unchanged are not rewritten.
 
         Parameters
         ----------
         docs : List[Dict[str, Any]]
-            List of document dictionaries (chunks).
+            List of document dictionaries (chunks), as accepted by ``add_document``.
+        batch_size : int
+            Number of chunks per COPY + upsert transaction (at least 1).
+
+        Returns
+        -------
+        int
+            Number of rows inserted or updated.
+        """
+        # Last occurrence of an id wins, as with sequential upserts
+        # (ON CONFLICT cannot touch the same row twice in one statement)
+        rows = list({row[0]: row for row in map(self._document_row, docs)}.values())
+        batch_size = max(batch_size, 1)
+        logger.info("Batch upserting document chunks", extra={"count": len(rows), "batch_size": batch_size})
+        written = 0
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            with get_query_engine().begin() as conn:
+                with conn.connection.driver_connection.cursor() as cur:
+                    cur.execute(_STAGING_DDL)
+                    with cur.copy(_STAGING_COPY) as copy:
+                        copy.set_types(_STAGING_TYPES)
+                        for doc_id, content, metadata, embedding in batch:
+                            vector = _as_array(embedding) if len(embedding) else None
+                            copy.write_row((doc_id, content, metadata, vector))
+                    cur.execute(_STAGING_UPSERT)
+                    written += max(cur.rowcount, 0)
+        logger.debug("Batch upsert of chunks completed", extra={"count": len(rows), "written": written})
+        return written
+
+    def delete_stale(self, paths: Sequence[str], keep_ids: Sequence[str]) -> int:
+        """
+        Delete every chunk of *paths* whose id is not in *keep_ids*, in one statement.
+
+        Parameters
+        ----------
+        paths : Sequence[str]
+            Source paths (indexed ``doc_path`` column).
+        keep_ids : Sequence[str]
+            Ids of the chunks just written for those paths.
+
+        Returns
+        -------
+        int
+            Number of rows deleted.
         """
-        logger.info("Batch upserting document chunks", extra={"count": len(docs)})
+        if not paths:
+            return 0
         with self.engine.begin() as conn:
-            for doc in docs:
-                self.add_document(doc)
-        logger.debug("Batch upsert of chunks completed", extra={"count": len(docs)})
+            deleted = conn.execute(
+                text("DELETE FROM docs WHERE doc_path = ANY(:paths) AND NOT (id = ANY(:keep))"),
+                {"paths": list(paths), "keep": list(keep_ids)},
+            ).rowcount
+        logger.info("Stale document chunks deleted", extra={"paths": len(paths), "deleted": deleted})
+        return deleted
 
-    def query_similar(self, vector: List[float], k: int = 5) -> List[Dict[str, Any]]:
+    def query_similar(
+        self,
+        vector: List[float],
+        k: int = 5,
+        columns: Optional[Sequence[str]] = None,
+        ef_search: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
         """
         Query for the k most similar documents to the provided vector.
 
+        Runs on the psycopg 3 engine: the vector is sent once as a float32 numpy
+        array in pgvector's binary format and the statement is prepared on the
+        server, so repeated queries skip parsing and planning. With
+        ``VECTOR_QUANTIZATION`` enabled, the search walks the quantized index for
+        k * ``QUANTIZED_OVERSAMPLE`` candidates and re-ranks them by exact distance.
+
         Parameters
         ----------
         vector : List[float]
             Query embedding vector.
         k : int
             Number of similar documents to retrieve.
+        columns : Optional[Sequence[str]]
+            Columns to return, among 'id', 'content', 'metadata' and 'embedding'
+            (default: id, content, metadata).
+        ef_search : Optional[int]
+            HNSW candidate list size for this query (``SET LOCAL hnsw.ef_search``);
+            None keeps the server setting.
+        filters : Optional[Dict[str, Any]]
+            Metadata filters: 'file_name', 'path' and 'type' (a string or a list of
+            strings) and an inclusive 'page_from' / 'page_to' page range, e.g.
+            ``{"file_name": "plano_ouro.pdf", "type": "table"}``.
 
         Returns
         -------
         List[Dict[str, Any]]
-            List of dicts with keys: 'id', 'content', 'metadata', 'distance'.
-        """
-        logger.info("Querying similar documents", extra={"k": k})
-        with self.engine.connect() as conn:
-            sql = """
-            SELECT
-              id,
-              content,
-              metadata,
-              embedding <-> CAST(:vector AS vector) AS distance
-            FROM docs
-            ORDER BY embedding <-> CAST(:vector AS vector)
-            LIMIT :k
-            """
-            result = conn.execute(
-                text(sql),
-                {"vector": vector, "k": k},
-            )
-            rows = result.mappings().all()
+            List of dicts with the requested columns plus 'distance'.
+        """
+        logger.info("Querying similar documents", extra={"k": k, "ef_search": ef_search, "filters": filters})
+        where, params = _filter_sql(filters, _PSYCOPG)
+        sql = _similarity_sql(columns, "%(vector)b", "%(k)s", where)
+        params.update(vector=_as_array(vector), k=k)
+        rows = self._fetch_prepared(sql, params, _session_sql(ef_search, k, bool(where)))
+        logger.debug("Query returned rows", extra={"count": len(rows)})
+        return self._ordered(rows, bool(where))
+
+    async def aquery_similar(
+        self,
+        vector: List[float],
+        k: int = 5,
+        columns: Optional[Sequence[str]] = None,
+        ef_search: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Async counterpart of ``query_similar``, running on the asyncpg engine
+        (binary protocol and prepared statement cache are native to asyncpg).
+
+        Parameters
+        ----------
+        vector : List[float]
+            Query embedding vector.
+        k : int
+            Number of similar documents to retrieve.
+        columns : Optional[Sequence[str]]
+            Columns to return (see ``query_similar``).
+        ef_search : Optional[int]
+            HNSW candidate list size for this query (see ``query_similar``).
+        filters : Optional[Dict[str, Any]]
+            Metadata filters (see ``query_similar``).
+
+        Returns
+        -------
+        List[Dict[str, Any]]
+            List of dicts with the requested columns plus 'distance'.
+        """
+        logger.info("Querying similar documents (async)", extra={"k": k, "ef_search": ef_search, "filters": filters})
+        where, params = _filter_sql(filters, _SQLALCHEMY)
+        sql = _similarity_sql(columns, "CAST(:vector AS vector)", ":k", where)
+        params.update(vector=_as_array(vector), k=k)
+        rows = await self._afetch(sql, params, _session_sql(ef_search, k, bool(where)))
+        logger.debug("Query returned rows", extra={"count": len(rows)})
+        return self._ordered(rows, bool(where))
+
+    def query_similar_many(
+        self,
+        vectors: Sequence[List[float]],
+        k: int = 5,
+        columns: Optional[Sequence[str]] = None,
+        ef_search: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Run one top-k similarity search per vector in a single SQL statement.
+
+        The vectors travel as one binary ``vector[]`` parameter that is unnested
+        and LATERAL-joined to the HNSW search, so N searches cost one round trip.
+
+        Parameters
+        ----------
+        vectors : Sequence[List[float]]
+            Query embedding vectors.
+        k : int
+            Number of similar documents to retrieve per vector.
+        columns : Optional[Sequence[str]]
+            Columns to return (see ``query_similar``).
+        ef_search : Optional[int]
+            HNSW candidate list size (see ``query_similar``).
+        filters : Optional[Dict[str, Any]]
+            Metadata filters applied to every search (see ``query_similar``).
+
+        Returns
+        -------
+        List[List[Dict[str, Any]]]
+            One result list per input vector, in input order, each ordered by distance.
+        """
+        if not vectors:
+            return []
+        logger.info("Querying similar documents (batch)", extra={"queries": len(vectors), "k": k})
+        where, params = _filter_sql(filters, _PSYCOPG)
+        sql = _similarity_many_sql(columns, "%(vectors)b", "%(k)s", where)
+        params.update(vectors=[Vector(_as_array(v)) for v in vectors], k=k)
+        rows = self._fetch_prepared(sql, params, _session_sql(ef_search, k, bool(where)))
+        logger.debug("Query returned rows", extra={"count": len(rows)})
+        return _group_by_query(rows, len(vectors))
+
+    async def aquery_similar_many(
+        self,
+        vectors: Sequence[List[float]],
+        k: int = 5,
+        columns: Optional[Sequence[str]] = None,
+        ef_search: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Async counterpart of ``query_similar_many`` on the asyncpg engine.
+        """
+        if not vectors:
+            return []
+        logger.info("Querying similar documents (batch, async)", extra={"queries": len(vectors), "k": k})
+        where, params = _filter_sql(filters, _SQLALCHEMY)
+        sql = _similarity_many_sql(columns, ":vectors", ":k", where)
+        params.update(vectors=[Vector(_as_array(v)) for v in vectors], k=k)
+        rows = await self._afetch(sql, params, _session_sql(ef_search, k, bool(where)))
         logger.debug("Query returned rows", extra={"count": len(rows)})
-        return [dict(row) for row in rows]
+        return _group_by_query(rows, len(vectors))
+
+    def query_hybrid(
+        self,
+        query: str,
+        vector: List[float],
+        k: int = 5,
+        candidates: int = HYBRID_CANDIDATES,
+        rrf_k: int = HYBRID_RRF_K,
+        ef_search: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Hybrid lexical + vector search fused with Reciprocal Rank Fusion.
+
+        Parameters
+        ----------
+        query : str
+            Query text, matched against the Portuguese full-text index.
+        vector : List[float]
+            Query embedding vector.
+        k : int
+            Number of documents to return.
+        candidates : int
+            Depth of each ranking (lexical and vector) before fusion.
+        rrf_k : int
+            RRF smoothing constant.
+        ef_search : Optional[int]
+            HNSW candidate list size for the vector ranking (see ``query_similar``).
+        filters : Optional[Dict[str, Any]]
+            Metadata filters applied to both rankings (see ``query_similar``).
+        columns : Optional[Sequence[str]]
+            Columns to return (see ``query_similar``).
+
+        Returns
+        -------
+        List[Dict[str, Any]]
+            List of dicts with the requested columns plus 'score' (higher is better).
+        """
+        logger.info("Querying hybrid", extra={"k": k, "candidates": candidates, "filters": filters})
+        where, params = _filter_sql(filters, _PSYCOPG)
+        params.update(self._hybrid_params(query, vector, k, candidates, rrf_k))
+        rows = self._fetch_prepared(
+            _hybrid_sql(_PSYCOPG, "%(vector)b", where, columns),
+            params,
+            _session_sql(ef_search, params["candidates"], bool(where)),
+        )
+        logger.debug("Query returned rows", extra={"count": len(rows)})
+        return rows
+
+    async def aquery_hybrid(
+        self,
+        query: str,
+        vector: List[float],
+        k: int = 5,
+        candidates: int = HYBRID_CANDIDATES,
+        rrf_k: int = HYBRID_RRF_K,
+        ef_search: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Async counterpart of ``query_hybrid``.
+        """
+        logger.info("Querying hybrid (async)", extra={"k": k, "candidates": candidates, "filters": filters})
+        where, params = _filter_sql(filters, _SQLALCHEMY)
+        params.update(self._hybrid_params(query, vector, k, candidates, rrf_k))
+        rows = await self._afetch(
+            _hybrid_sql(_SQLALCHEMY, "CAST(:vector AS vector)", where, columns),
+            params,
+            _session_sql(ef_search, params["candidates"], bool(where)),
+        )
+        logger.debug("Query returned rows", extra={"count": len(rows)})
+        return rows
+
+    @staticmethod
+    def _hybrid_params(query: str, vector: List[float], k: int, candidates: int, rrf_k: int) -> Dict[str, Any]:
+        return {
+            "query": query,
+            "vector": _as_array(vector),
+            "k": k,
+            "candidates": max(candidates, k),
+            "rrf_k": rrf_k,
+        }
+
+    @staticmethod
+    def _ordered(rows: List[Dict[str, Any]], filtered: bool) -> List[Dict[str, Any]]:
+        # relaxed_order iterative scans may return rows slightly out of distance order
+        if filtered and HNSW_ITERATIVE_SCAN == "relaxed_order":
+            rows.sort(key=lambda row: row["distance"])
+        return rows
+
+    def _fetch_prepared(
+        self, sql: str, params: Dict[str, Any], setup: Sequence[str] = ()
+    ) -> List[Dict[str, Any]]:
+        # Raw psycopg 3 cursor: binary parameters/results and a server-side prepared statement.
+        # The connection is not in autocommit, so *setup* and the query share one transaction.
+        with get_query_engine().connect() as conn:
+            with conn.connection.driver_connection.cursor(row_factory=dict_row) as cur:
+                for statement in setup:
+                    cur.execute(statement)
+                cur.execute(sql, params, prepare=True, binary=True)
+                rows = cur.fetchall()
+        return [self._normalize_row(row) for row in rows]
+
+    async def _afetch(
+        self, sql: str, params: Dict[str, Any], setup: Sequence[str] = ()
+    ) -> List[Dict[str, Any]]:
+        async with get_async_engine().connect() as conn:
+            for statement in setup:
+                await conn.execute(text(statement))
+            rows = (await conn.execute(text(sql), params)).mappings().all()
+        return [self._normalize_row(row) for row in rows]
+
+    @staticmethod
+    def _normalize_row(row: Any) -> Dict[str, Any]:
+        # asyncpg returns JSONB as text; decode so both paths return the same shape
+        data = dict(row)
+        if isinstance(data.get("metadata"), str):
+            data["metadata"] = json.loads(data["metadata"])
+        return data
 
     def delete_document(self, doc_id: str) -> None:
         """
@@ -132,3 +657,18 @@ class VectorStore:
         with self.engine.begin() as conn:
             conn.execute(text("DELETE FROM docs WHERE id = :id"), {"id": doc_id})
         logger.debug("Document deleted", extra={"id": doc_id})
+
+
+def get_vector_store() -> Any:
+    """
+    Return the query backend selected by ``VECTOR_BACKEND``.
+
+    "pgvector" returns a ``VectorStore``; "mmap" returns the process-wide
+    ``MmapVectorStore`` over ``MMAP_INDEX_DIR`` (read-only, no DB round trip).
+    """
+    if VECTOR_BACKEND == "mmap":
+        from app.agents.health_plan_agent.tools.rag.vectorstore.mmap_store import get_mmap_store
+        return get_mmap_store(MMAP_INDEX_DIR)
+    if VECTOR_BACKEND != "pgvector":
+        raise ValueError(f"Unknown VECTOR_BACKEND '{VECTOR_BACKEND}'; expected 'pgvector' or 'mmap'")
+    return VectorStore()
@@ -38,7 +38,55 @@ OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
 ANTHROPIC_API_KEY: str = os.getenv("ANTHROPIC_API_KEY", "")
 GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
 
-EMBEDDING_DIM: str = os.getenv("EMBEDDING_DIM", 1536)
+# Modelo e dimensão dos embeddings
+# Os modelos text-embedding-3-* aceitam dimensões reduzidas (ex.: 256, 512, 768): a API devolve o
+# vetor truncado e renormalizado. Ao mudar EMBEDDING_DIM, o init_db migra a coluna docs.embedding
+# e scripts/reembed_docs.py gera os vetores que não puderem ser derivados dos atuais
+EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+EMBEDDING_DIM: int = int(os.getenv("EMBEDDING_DIM", "1536"))
+
+# Cache persistente de embeddings (LRU em memória + SQLite em disco)
+EMBEDDING_CACHE_ENABLED: bool = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() in ("true", "1", "yes")
+# Arquivo SQLite da camada persistente
+EMBEDDING_CACHE_PATH: str = os.getenv("EMBEDDING_CACHE_PATH", ".cache/embeddings.sqlite")
+# Número máximo de vetores na camada em memória
+EMBEDDING_CACHE_MEMORY_SIZE: int = int(os.getenv("EMBEDDING_CACHE_MEMORY_SIZE", "10000"))
+# Número máximo de vetores na camada em disco (os menos usados recentemente são removidos)
+EMBEDDING_CACHE_MAX_ROWS: int = int(os.getenv("EMBEDDING_CACHE_MAX_ROWS", "500000"))
+
+# Geração de embeddings em lote (ingestão)
+# Tokens máximos por requisição (a API aceita até 300k tokens e 2048 textos por requisição)
+EMBEDDING_BATCH_MAX_TOKENS: int = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", "100000"))
+# Textos máximos por requisição
+EMBEDDING_BATCH_MAX_TEXTS: int = int(os.getenv("EMBEDDING_BATCH_MAX_TEXTS", "1000"))
+# Número de lotes enviados em paralelo
+EMBEDDING_CONCURRENCY: int = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+
+# Gravação em lote na tabela docs: COPY binário para uma tabela temporária e um único
+# upsert por lote (uma transação por lote). Na ingestão em streaming, é também o número
+# de chunks embeddados e gravados de cada vez
+UPSERT_BATCH_SIZE: int = int(os.getenv("UPSERT_BATCH_SIZE", "1000"))
+# Ingestão em streaming: itens em espera entre dois estágios do pipeline (limita o pico de memória)
+INGEST_QUEUE_SIZE: int = int(os.getenv("INGEST_QUEUE_SIZE", "16"))
+# Descoberta de arquivos na ingestão: globs separados por vírgula, aplicados ao caminho relativo
+# ao DATA_DIR e ao nome do arquivo (ex.: "*.pdf,*.docx"; "*" = todos)
+INGEST_INCLUDE: tuple = tuple(g.strip() for g in os.getenv("INGEST_INCLUDE", "*").split(",") if g.strip())
+# Arquivos ignorados mesmo quando incluídos (ex.: "rascunhos/*,*.tmp")
+INGEST_EXCLUDE: tuple = tuple(g.strip() for g in os.getenv("INGEST_EXCLUDE", "").split(",") if g.strip())
+# Tamanho máximo por arquivo em MB (0 = sem limite); arquivos maiores são ignorados
+INGEST_MAX_FILE_MB: float = float(os.getenv("INGEST_MAX_FILE_MB", "0"))
+# Processos usados na extração de PDFs (1 = extração serial no processo da ingestão)
+PDF_WORKERS: int = int(os.getenv("PDF_WORKERS", "1"))
+# Páginas por tarefa do pool: PDFs grandes são divididos em faixas desse tamanho
+PDF_PAGES_PER_TASK: int = int(os.getenv("PDF_PAGES_PER_TASK", "20"))
+# Motor de extração de tabelas: "tabula" (uma chamada à JVM por faixa de páginas),
+# "pymupdf" (page.find_tables, sem Java) ou "none" (desativa tabelas)
+PDF_TABLE_ENGINE: str = os.getenv("PDF_TABLE_ENGINE", "tabula").lower()
+# Imagens extraídas dos PDFs: armazenadas uma única vez por hash (SHA-256 do PNG) nesse diretório;
+# no pipeline circula apenas a referência
+IMAGE_STORE_DIR: str = os.getenv("IMAGE_STORE_DIR", ".cache/images")
+# Gera legendas das imagens com o LLM (LLM_PROVIDER) e as indexa como texto; desativado por padrão
+IMAGE_CAPTIONING: bool = os.getenv("IMAGE_CAPTIONING", "false").lower() in ("true", "1", "yes")
 
 # Nível de log padrão para a aplicação (ex.: "DEBUG", "INFO", "WARNING", "ERROR")
 LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
@@ -54,6 +102,73 @@ LANGSMITH_API_KEY: str = os.getenv("LANGSMITH_API_KEY", "")
 
 LANGSMITH_PROJECT: str = os.getenv("LANSMITH_PROJECT", "")
 
+# Backend de vetores: "pgvector" (Postgres) ou "mmap" (índice local mapeado em memória)
+VECTOR_BACKEND: str = os.getenv("VECTOR_BACKEND", "pgvector").lower()
+# Diretório do índice mmap exportado pela ingestão
+MMAP_INDEX_DIR: str = os.getenv("MMAP_INDEX_DIR", "data/index")
+# Precisão dos vetores no índice mmap: "float32" ou "float16"
+MMAP_INDEX_DTYPE: str = os.getenv("MMAP_INDEX_DTYPE", "float32").lower()
+
+# Índice HNSW do pgvector
+# Métrica de distância: "l2" (<->), "ip" (produto interno, <#>) ou "cosine" (<=>)
+# Os embeddings da OpenAI são normalizados, então "ip" e "cosine" dão o mesmo ranking que "l2"
+HNSW_DISTANCE: str = os.getenv("HNSW_DISTANCE", "l2").lower()
+# Número máximo de conexões por nó do grafo (maior = mais recall, mais memória)
+HNSW_M: int = int(os.getenv("HNSW_M", "16"))
+# Tamanho da lista de candidatos na construção do índice (maior = índice melhor, build mais lento)
+HNSW_EF_CONSTRUCTION: int = int(os.getenv("HNSW_EF_CONSTRUCTION", "64"))
+# Tamanho da lista de candidatos por consulta (hnsw.ef_search): troca recall por latência
+HNSW_EF_SEARCH: int = int(os.getenv("HNSW_EF_SEARCH", "40"))
+# Busca iterativa do HNSW em consultas com filtro de metadados (pgvector >= 0.8):
+# "off", "strict_order" ou "relaxed_order". Continua varrendo o grafo até obter k linhas
+# que satisfaçam o filtro, em vez de filtrar apenas os ef_search candidatos iniciais
+HNSW_ITERATIVE_SCAN: str = os.getenv("HNSW_ITERATIVE_SCAN", "off").lower()
+# Quantização do índice HNSW (pgvector >= 0.7): "none" (float32), "halfvec" (float16, metade
+# da memória) ou "binary" (1 bit por dimensão, distância de Hamming). O índice quantizado é um
+# índice de expressão sobre docs.embedding e substitui o índice float32; a coluna original é
+# mantida para reordenar os candidatos pela distância exata
+VECTOR_QUANTIZATION: str = os.getenv("VECTOR_QUANTIZATION", "none").lower()
+# Sobreamostragem da busca quantizada: k * QUANTIZED_OVERSAMPLE candidatos são reordenados
+QUANTIZED_OVERSAMPLE: int = int(os.getenv("QUANTIZED_OVERSAMPLE", "4"))
+
+# Recuperação de documentos
+# Modo padrão do Retriever: "vector" (apenas pgvector) ou "hybrid" (full-text + vetor com RRF)
+RETRIEVAL_MODE: str = os.getenv("RETRIEVAL_MODE", "vector").lower()
+# Constante k da Reciprocal Rank Fusion: score = Σ 1 / (k + posição)
+HYBRID_RRF_K: int = int(os.getenv("HYBRID_RRF_K", "60"))
+# Candidatos considerados de cada ranking (lexical e vetorial) antes da fusão
+HYBRID_CANDIDATES: int = int(os.getenv("HYBRID_CANDIDATES", "40"))
+# Multi-query: número de variações da pergunta geradas na reescrita (1 = desativado).
+# As variações são embeddadas num único lote, buscadas numa única consulta SQL
+# e os resultados são fundidos com RRF (usando HYBRID_RRF_K)
+MULTI_QUERY_COUNT: int = int(os.getenv("MULTI_QUERY_COUNT", "1"))
+
+# Pós-recuperação
+# Fator de sobreamostragem: busca k * MMR_OVERSAMPLE candidatos e seleciona k por MMR (1 = desativado)
+MMR_OVERSAMPLE: int = int(os.getenv("MMR_OVERSAMPLE", "4"))
+# Peso da relevância frente à diversidade no MMR (1.0 = só relevância)
+MMR_LAMBDA: float = float(os.getenv("MMR_LAMBDA", "0.7"))
+# Une chunks vizinhos (chunk_index consecutivo) do mesmo arquivo/página num só trecho, sem a sobreposição
+STITCH_ADJACENT_CHUNKS: bool = os.getenv("STITCH_ADJACENT_CHUNKS", "true").lower() in ("true", "1", "yes")
+# Orçamento de tokens do contexto enviado ao LLM de resposta (0 = sem limite).
+# Os trechos entram por ordem de relevância; o que não cabe é truncado em fim de frase
+CONTEXT_TOKEN_BUDGET: int = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+
+# Modo de roteamento das mensagens no fluxo principal
+# "single": uma chamada estruturada devolve intenção, relevância e consulta reescrita
+# "legacy": classify_intent → validate → rewrite em chamadas separadas
+ROUTING_MODE: str = os.getenv("ROUTING_MODE", "single").lower()
+
+# Cache semântico de respostas do pipeline RAG
+# Habilita o reaproveitamento de respostas para perguntas semanticamente equivalentes
+SEMANTIC_CACHE_ENABLED: bool = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() in ("true", "1", "yes")
+# Similaridade de cosseno mínima entre perguntas para considerar um acerto
+SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+# Número máximo de respostas mantidas (as menos usadas recentemente são descartadas)
+SEMANTIC_CACHE_MAX_SIZE: int = int(os.getenv("SEMANTIC_CACHE_MAX_SIZE", "1000"))
+# Intervalo (segundos) entre consultas à versão do corpus no banco
+SEMANTIC_CACHE_VERSION_TTL: float = float(os.getenv("SEMANTIC_CACHE_VERSION_TTL", "30"))
+
 class Settings:
     """
     Wrapper para acesso às configurações principais.
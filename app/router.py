@@ -0,0 +1,68 @@
+# app/router.py
+
+"""
+app.router
+
+Roteamento em uma única chamada estruturada ao LLM.
+
+Substitui a sequência classify_intent (app.py) → validate_query (agent_plano)
+→ rewrite (RAGPipeline) por uma só chamada que devolve, juntos, a intenção do
+usuário, a relevância para a base de planos de saúde e a consulta reescrita
+para recuperação de documentos.
+"""
+
+import logging
+from typing import Any, Literal, Optional
+
+from pydantic import BaseModel, Field
+from langchain_core.prompts import ChatPromptTemplate
+
+logger = logging.getLogger(__name__)
+
+
+class RouteDecision(BaseModel):
+    intent: Literal["plano", "agendamento", "sair", "desconhecido"] = Field(
+        description="Intenção do usuário."
+    )
+    is_relevant: bool = Field(
+        description="True se a pergunta for relevante para a base de documentos de planos de saúde."
+    )
+    rewritten_query: str = Field(
+        description="Pergunta reescrita para melhorar a recuperação de documentos (vazia se não for 'plano')."
+    )
+
+
+routing_prompt = ChatPromptTemplate.from_messages([
+    ("system",
+     "Você é o roteador de um assistente de plano de saúde. Para a mensagem do usuário, devolva:\n"
+     "- intent: 'plano' para dúvidas sobre o plano de saúde (carência, coberturas, serviços, ...); "
+     "'agendamento' para marcar, listar ou cancelar consultas e buscar médicos; "
+     "'sair' se ele quiser encerrar o chat; 'desconhecido' caso contrário.\n"
+     "- is_relevant: se a pergunta é relevante para um sistema de recuperação de informações sobre plano de saúde.\n"
+     "- rewritten_query: quando intent for 'plano', reescreva a pergunta para melhorar a recuperação de documentos; "
+     "caso contrário, deixe vazio."),
+    ("human", "{message}"),
+])
+
+
+def route_message(llm: Any, user_message: str) -> Optional[RouteDecision]:
+    """
+    Classifica a mensagem, valida a relevância e reescreve a consulta numa só chamada.
+
+    Retorna None se a chamada estruturada falhar, para que o chamador
+    possa recorrer ao fluxo antigo (classify_intent).
+    """
+    chain = routing_prompt | llm.with_structured_output(RouteDecision)
+    try:
+        decision = chain.invoke({"message": user_message})
+        # Sem tool call o modelo devolve None: trata como falha do roteamento
+        if not isinstance(decision, RouteDecision):
+            logger.warning("Roteamento estruturado sem resposta válida: %r", decision)
+            return None
+        logger.info(
+            "Roteamento: intenção=%s relevante=%s", decision.intent, decision.is_relevant
+        )
+    except Exception as e:
+        logger.error("Erro no roteamento estruturado: %s", e)
+        return None
+    return decision